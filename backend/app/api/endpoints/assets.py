@@ -0,0 +1,87 @@
+import os
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from app.services.asset_service import asset_service
+from app.services.storage_service import storage_service
+from app.core.http_cache import pick_encoding, etag_matches, parse_range, RangeNotSatisfiable
+
+router = APIRouter()
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+CHUNK_SIZE = 256 * 1024
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _serve(request: Request, rel_path: str, digest: str = None) -> Response:
+    path = asset_service.resolve_path(rel_path)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    storage_service.touch(path)
+    asset = asset_service.describe(path)
+    if digest is not None and digest != asset.digest:
+        # The file was rebuilt; an immutable URL must never serve different bytes
+        raise HTTPException(status_code=404, detail="Asset version not found")
+
+    encoding = pick_encoding(request.headers.get("accept-encoding"), asset_service.available_encodings(asset))
+    etag = f'"{asset.digest}"' if encoding == "identity" else f'"{asset.digest}-{encoding}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE if digest else REVALIDATE,
+        "Accept-Ranges": "bytes",
+    }
+    if asset_service.available_encodings(asset):
+        headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body_path, size, status = path, asset.size, 200
+    start = 0
+    if encoding != "identity":
+        body_path = asset_service.variant_path(asset, encoding)
+        size = os.path.getsize(body_path)
+        headers["Content-Encoding"] = encoding
+        headers.pop("Accept-Ranges")
+    else:
+        # A stale If-Range validator means the client's partial copy is outdated: send it all
+        if_range = request.headers.get("if-range")
+        if not if_range or if_range.strip() == etag:
+            try:
+                byte_range = parse_range(request.headers.get("range"), asset.size)
+            except RangeNotSatisfiable:
+                headers["Content-Range"] = f"bytes */{asset.size}"
+                return Response(status_code=416, headers=headers)
+            if byte_range:
+                start, end = byte_range
+                size = end - start + 1
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{asset.size}"
+
+    headers["Content-Length"] = str(size)
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type=asset.content_type)
+    return StreamingResponse(_iter_file(body_path, start, size), status_code=status,
+                             headers=headers, media_type=asset.content_type)
+
+
+@router.api_route("/a/{digest}/{rel_path:path}", methods=["GET", "HEAD"])
+def get_immutable_asset(digest: str, rel_path: str, request: Request):
+    """Content-addressed URL from asset_service.url_for: cacheable forever."""
+    return _serve(request, rel_path, digest)
+
+
+@router.api_route("/{rel_path:path}", methods=["GET", "HEAD"])
+def get_asset(rel_path: str, request: Request):
+    """Legacy path-based URL: revalidated on every use because the file may be replaced."""
+    return _serve(request, rel_path)
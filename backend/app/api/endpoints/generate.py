@@ -1,122 +1,168 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from app.services.rag_service import rag_service
-from app.core.prompts import TEACHER_SYSTEM_PROMPT
+import asyncio
 import uuid
 import json
-import os
-import time
 
 # Pre-load services
-from app.services.llm_service import llm_service
 from app.services.orchestrator_service import orchestrator_service
-from app.services.slide_service import slide_service
-from app.services.tts_service import tts_service
 from app.services.avatar_service import avatar_service
+from app.services.lecture_service import lecture_service
+from app.services.job_service import job_service, is_final_event
+from app.services.document_service import document_service
+from app.services.lecture_store import lecture_store
+from app.services.lecture_index import lecture_index
+from app.services.storage_service import storage_service
+from app.core.http_cache import pick_encoding, etag_matches
 
 router = APIRouter()
 
 class GenerateRequest(BaseModel):
     document_id: str = "latest" # For now we just use the latest indexed index
     target_minutes: int = 10
+    force: bool = False # Regenerate even if this document was already lectured with the same settings
 
-@router.post("/generate-lecture")
+def _run_lecture_job(params: dict, progress) -> dict:
+    # An upload acknowledged a moment ago may still be indexing
+    if document_service.has_pending_ingest():
+        progress("stage", stage="ingest")
+        document_service.wait_for_ingest(params.get("document_id", "latest"))
+    lecture = lecture_service.generate(params["lecture_id"], params.get("target_minutes", 10), progress)
+    # Index the lecture under the document it was actually built from. A newer upload may have
+    # replaced the requested one while this job queued; never file its content under the old hash.
+    source = document_service.get(lecture.get("document_id") or "")
+    if params.get("cache_key") and source and source.get("sha256"):
+        key = lecture_index.key(source["sha256"], params.get("target_minutes", 10))
+        if key == params["cache_key"]:
+            lecture_index.record(key, params["lecture_id"], lecture)
+        else:
+            print(f"⚠️ Lecture {params['lecture_id']} was built from document {source['document_id']}, "
+                  f"not the one requested; not adding it to the lecture index.")
+    return {"lecture_id": params["lecture_id"], "document_id": lecture.get("document_id")}
+
+job_service.register("lecture", _run_lecture_job)
+
+@router.post("/generate-lecture", status_code=202)
 async def generate_lecture(request: GenerateRequest):
+    """Queues lecture generation and returns immediately; follow it via /jobs/{job_id}.
+    An already generated lecture for the same document and settings comes back as 200 with cached=true."""
     print(f"Received generation request. Duration: {request.target_minutes}min")
-    
-    # In this simple MVP, we ignore document_id and use the active FAISS index
-    # We retrieve a general summary or context.
-    # Since we don't have a specific query, we might fetch top chunks or just a generic "Overview"
-    context_chunks = rag_service.search("Overview and key concepts", k=10)
-    retrieved_context = "\n\n".join(context_chunks)
-
-    if not retrieved_context:
-        # If RAG is empty (no PDF uploaded), we might fallback or error
-        # For now, let's allow it to proceed with empty context if that's the design, 
-        # but the prompt implies RAG is mandatory.
-        # Check if index is empty
-        if rag_service.index.ntotal == 0:
-             raise HTTPException(status_code=400, detail="No PDF uploaded/indexed. Please upload a PDF first.")
-
-    # 1. Generate Content (Dict)
-    try:
-        lecture_data = llm_service.generate_lecture_content(TEACHER_SYSTEM_PROMPT, retrieved_context)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM Generation Failed: {str(e)}")
-    
-    # Debug Storage
-    debug_dir = os.path.join(os.getcwd(), "data", "outputs", "scripts")
-    os.makedirs(debug_dir, exist_ok=True)
-    timestamp = int(time.time())
-    with open(os.path.join(debug_dir, f"generation_{timestamp}.txt"), "w", encoding="utf-8") as f:
-        f.write(json.dumps(lecture_data, indent=2))
-    
-    # 2. Pipeline Execution (Audio, Slides)
-    # This updates lecture_data with audio_urls etc.
-    # Note: execute_pipeline currently returns {pptx_url, scene_count, segments}
-    # It generates audio files but doesn't map them back to the lecture_data structure straightforwardly 
-    # unless we update orchestrator or logic here.
-    # The Frontend expects: "audio_url" inside each slide object.
-    
-    # Let's adjust logic:
-    # We need to run TTS for each slide and inject the URL into lecture_data['slides']
-    # The orchestrator currently composites video segments.
-    # The PROMPT says: "Frontend show.jsx... plays audio_url... avatar lip-syncs".
-    # And "NO video generation in backend." (Wait, "NO video generation in backend"?)
-    # "NO avatar logic in backend."
-    # BUT `orchestrator_service.py` was generating video segments!
-    # The PROMPT says: "The frontend will handle: avatar rendering, lip synchronization".
-    # So the backend should ONLY provide Audio + Slide + Data.
-    # I should bypass the `orchestrator_service.execute_pipeline` video generation part 
-    # and just do PPTX + TTS.
-    
-    # Refined Step 2:
-    lecture_id = str(uuid.uuid4())
-    slides = lecture_data.get("slides", [])
-    
+
+    # Fail fast on the one error the client can fix before queuing anything
+    # Off the event loop: in shared mode this may load a new index snapshot from disk
+    has_content = await run_in_threadpool(
+        lambda: lecture_service.has_indexed_content() or document_service.has_pending_ingest())
+    if not has_content:
+        raise HTTPException(status_code=400, detail="No PDF uploaded/indexed. Please upload a PDF first.")
+
+    document_id = document_service.latest_id() if request.document_id == "latest" else request.document_id
+    document = document_service.get(document_id) if document_id else None
+    cache_key = lecture_index.key(document["sha256"], request.target_minutes) if document and document.get("sha256") else None
+
+    # Same PDF, length, model, prompt and voice as an earlier lecture: hand that one back
+    if cache_key and not request.force:
+        lecture_id = await run_in_threadpool(lecture_index.lookup, cache_key)
+        if lecture_id:
+            print(f"♻️ Lecture index hit for document {document_id}: {lecture_id}")
+            return JSONResponse(status_code=200, content={"job_id": None, "lecture_id": lecture_id, "status": "done",
+                                                          "coalesced": False, "cached": True})
+
+    # Identical concurrent requests (double clicks, a whole class) share one pipeline run;
+    # a forced regeneration must not be handed a lecture that just finished
+    job = job_service.submit("lecture", {
+        "lecture_id": str(uuid.uuid4()), # assigned up front so clients can link to it while it renders
+        "document_id": request.document_id,
+        "target_minutes": request.target_minutes,
+        "cache_key": cache_key,
+    }, dedupe_key=None if request.force else cache_key)
+    return {"job_id": job["job_id"], "lecture_id": job["params"]["lecture_id"], "status": job["status"],
+            "coalesced": job["coalesced"], "cached": False}
+
+@router.get("/lecture-index")
+async def lecture_index_stats():
+    return await run_in_threadpool(lecture_index.stats)
+
+@router.delete("/lecture-index")
+async def invalidate_lecture_index(document_id: str = None, lecture_id: str = None, all: bool = False):
+    """Forgets indexed lectures for a document and/or lecture (`all=true` for everything) so the next request regenerates."""
+    document_id, lecture_id = document_id or None, lecture_id or None # "?document_id=" must not match everything
+    if document_id is None and lecture_id is None and not all:
+        raise HTTPException(status_code=400, detail="Pass document_id, lecture_id, or all=true.")
+    removed = await run_in_threadpool(lecture_index.invalidate, document_id, lecture_id)
+    for key in removed:
+        job_service.forget_key(key)
+    return {"invalidated": len(removed)}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-Sent Events: stage changes, per-slide readiness, and the final status."""
+    if job_service.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
     try:
-        # Generate PPTX
-        slide_service.generate_presentation(lecture_data.get("lecture_title", "Lecture"), slides)
-    except Exception as e:
-        print(f"⚠️ PPTX Generation Failed: {e}. Skipping (Lecture will still work on web).")
-    
-    # Generate Audio for each slide
-    for i, slide in enumerate(slides):
-        script = slide.get("script", "")
-        if script:
-            audio_filename = f"{lecture_id}_slide_{i+1}.mp3"
-            # tts_service returns (path, duration)
-            try:
-                path, duration = tts_service.generate_audio(script, audio_filename)
-                # URL accessible via static mount
-                slide["audio_url"] = f"/files/audio/{audio_filename}"
-                slide["duration_seconds"] = duration
-                slide["slide_id"] = i + 1
-            except Exception as e:
-                print(f"TTS failed for slide {i}: {e}. using fallback.")
-                # Fallback to existing sample or silence
-                slide["audio_url"] = "/sample.mp3" # Ensure this file exists in frontend/public or backend static
-                slide["duration_seconds"] = 5
-                slide["slide_id"] = i + 1
-                slide["tts_error"] = str(e)
-
-    # Save finalized lecture JSON
-    lectures_dir = os.path.join(os.getcwd(), "data", "lectures")
-    os.makedirs(lectures_dir, exist_ok=True)
-    lecture_file = os.path.join(lectures_dir, f"{lecture_id}.json")
-    
-    with open(lecture_file, "w", encoding="utf-8") as f:
-        json.dump(lecture_data, f, indent=2)
-        
-    return {"lecture_id": lecture_id}
+        after_seq = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        after_seq = 0
+
+    def format_event(message: dict) -> str:
+        return f"id: {message['seq']}\nevent: {message['event']}\ndata: {json.dumps(message)}\n\n"
+
+    async def stream():
+        if not job_service.is_local(job_id):
+            # Run by another worker process, or finished and evicted: follow its job file
+            async for message in job_service.follow_file(job_id):
+                yield format_event(message) if message else ": keep-alive\n\n"
+            return
+        history, queue, entry, finished = job_service.subscribe(job_id, after_seq)
+        try:
+            for message in history:
+                yield format_event(message)
+            if finished:
+                return
+            # End on the final status event itself; polling the job's status could stop
+            # between the status change and that event reaching the queue
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message["seq"] > after_seq:
+                    yield format_event(message)
+                if is_final_event(message):
+                    return
+        finally:
+            job_service.unsubscribe(job_id, entry)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.get("/lecture/{lecture_id}")
-async def get_lecture(lecture_id: str):
-    lecture_file = os.path.join(os.getcwd(), "data", "lectures", f"{lecture_id}.json")
-    if not os.path.exists(lecture_file):
+async def get_lecture(lecture_id: str, request: Request):
+    # Hot path: serve pre-serialized bytes from memory; disk only on a cache miss
+    entry = lecture_store.get_cached(lecture_id) or await run_in_threadpool(lecture_store.load, lecture_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Lecture not found")
-        
-    with open(lecture_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        
-    return data
+    storage_service.touch_lecture(lecture_id)
+
+    encoding = pick_encoding(request.headers.get("accept-encoding"),
+                             ["br", "gzip"] if entry.brotli is not None else ["gzip"])
+    headers = {
+        "ETag": entry.etag_for(encoding),
+        "Cache-Control": "no-cache",  # always revalidate; a 304 costs almost nothing
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=entry.variant(encoding), media_type="application/json", headers=headers)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.services.storage_service import storage_service
+
+router = APIRouter()
+
+@router.get("/storage")
+async def storage_stats():
+    """`du`-style usage of data/outputs by category and lecture, quotas, and the last compaction."""
+    return await run_in_threadpool(storage_service.stats)
+
+@router.post("/storage/compact")
+async def storage_compact(dry_run: bool = True):
+    """Runs compaction now; defaults to a dry run that only reports what would be evicted."""
+    if not dry_run and not storage_service.try_acquire_compactor():
+        raise HTTPException(status_code=409, detail="Compaction runs in another worker process; retry or use dry_run")
+    return await run_in_threadpool(storage_service.compact, dry_run)
@@ -1,36 +1,34 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.rag_service import rag_service
-import shutil
-import os
-import tempfile
+from fastapi import APIRouter, HTTPException, Request
+from app.services.document_service import document_service, UploadRejected
 
 router = APIRouter()
 
-@router.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...)):
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
-    
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
-
+@router.post("/upload-pdf", status_code=202)
+async def upload_pdf(request: Request):
+    """
+    Streams the PDF (multipart field `file`) to disk and returns once it is stored.
+    Indexing continues in the background; poll /documents/{document_id} for status.
+    """
     try:
-        # Extract and Index
-        text = rag_service.extract_text_from_pdf(tmp_path)
-        chunks = rag_service.create_chunks(text)
-        rag_service.clear_index() # Clear previous for a fresh start (optional based on use case)
-        rag_service.add_to_index(chunks)
-        rag_service.save_index() # Persist the new index
-        
-        return {
-            "filename": file.filename, 
-            "status": "Processed", 
-            "chunks_count": len(chunks),
-            "message": "PDF successfully ingested into RAG system."
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        os.remove(tmp_path)
+        doc = await document_service.receive_pdf(
+            request.headers.get("content-type"),
+            request.headers.get("content-length"),
+            request.stream(),
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return {
+        **doc,
+        "status_url": f"/api/documents/{doc['document_id']}",
+        "message": "PDF stored. Indexing in the background.",
+    }
+
+@router.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    if document_id == "latest":
+        document_id = document_service.latest_id() or ""
+    doc = document_service.get(document_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return doc
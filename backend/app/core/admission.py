@@ -0,0 +1,215 @@
+"""
+Admission control and process-wide concurrency limits.
+
+Two kinds of limits keep bursts from thrashing the box:
+
+- `AdmissionQueue`: bounded count of outstanding work accepted at the HTTP edge
+  (lecture jobs, PDF ingests). When full, the request is refused up front with
+  429 and a Retry-After estimate instead of being queued without bound.
+
+- `StageLimiter`: a semaphore per pipeline stage (llm, tts, render, encode)
+  shared by every lecture in the process. Callers beyond the limit
+  wait in a bounded queue; a full queue or a wait past the stage timeout
+  raises `OverloadedError` (503).
+
+    @limited("tts")
+    def synthesize(...): ...
+
+Limits come from ADMISSION_<STAGE>_LIMIT / _QUEUE / _TIMEOUT. In-use slots,
+queue depth, wait times and rejections are exported on /metrics.
+"""
+import os
+import time
+import functools
+import contextlib
+import threading
+from typing import Dict
+
+from app.core.metrics import registry
+
+# Seconds; waits range from none to minutes behind a slow stage.
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+registry.describe("admission_wait_seconds", "histogram", "Time spent waiting for a stage slot.")
+registry.describe("admission_rejected_total", "counter", "Work refused by admission control.")
+
+
+class OverloadedError(Exception):
+    """Refused for lack of capacity; maps to `status_code` with a Retry-After header."""
+
+    def __init__(self, stage: str, message: str, retry_after: float = 5.0, status_code: int = 503):
+        self.stage = stage
+        self.message = message
+        self.retry_after = max(1, int(round(retry_after)))
+        self.status_code = status_code
+        super().__init__(message)
+
+
+def _setting(stage: str, name: str, default: float) -> float:
+    return float(os.getenv(f"ADMISSION_{stage.upper()}_{name}", str(default)))
+
+
+class _HoldTime:
+    """EWMA of how long a slot is held; basis for Retry-After estimates."""
+
+    def __init__(self, initial: float, alpha: float = 0.2):
+        self.value = initial
+        self.alpha = alpha
+
+    def update(self, seconds: float):
+        self.value += self.alpha * (seconds - self.value)
+
+
+class StageLimiter:
+    """At most `limit` concurrent holders; at most `max_queue` waiters, each for up to `timeout` seconds."""
+
+    def __init__(self, stage: str, limit: int, max_queue: int, timeout: float):
+        self.stage = stage
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_use = 0
+        self.waiting = 0
+        self.hold_time = _HoldTime(initial=5.0)
+        self._cond = threading.Condition()
+
+    def retry_after(self) -> float:
+        return self.hold_time.value * (self.waiting + 1) / self.limit
+
+    def acquire(self, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        with self._cond:
+            if self.in_use >= self.limit:
+                if self.waiting >= self.max_queue:
+                    registry.inc("admission_rejected_total", stage=self.stage, reason="queue_full")
+                    raise OverloadedError(self.stage, f"Too much {self.stage} work queued "
+                                          f"({self.waiting} waiting, {self.in_use} running)",
+                                          retry_after=self.retry_after())
+                self.waiting += 1
+                try:
+                    deadline = time.monotonic() + timeout
+                    while self.in_use >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            registry.inc("admission_rejected_total", stage=self.stage, reason="timeout")
+                            raise OverloadedError(self.stage, f"Timed out after {timeout:.0f}s waiting "
+                                                  f"for a {self.stage} slot", retry_after=self.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_use += 1
+        registry.observe("admission_wait_seconds", time.perf_counter() - started, buckets=WAIT_BUCKETS,
+                         stage=self.stage)
+
+    def release(self, held_for: float = None):
+        with self._cond:
+            self.in_use -= 1
+            if held_for is not None:
+                self.hold_time.update(held_for)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def slot(self):
+        self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        return {"limit": self.limit, "in_use": self.in_use, "waiting": self.waiting,
+                "max_queue": self.max_queue, "timeout_s": self.timeout,
+                "mean_hold_s": round(self.hold_time.value, 3)}
+
+
+class AdmissionQueue:
+    """Non-blocking bound on accepted-but-unfinished work (running + queued)."""
+
+    def __init__(self, name: str, capacity: int, workers: int = 1, initial_duration: float = 30.0):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.workers = max(1, workers)
+        self.outstanding = 0
+        self.duration = _HoldTime(initial=initial_duration)
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        # Roughly when the first slot frees up if everything ahead drains at the recent pace
+        return self.duration.value * max(1, self.outstanding - self.workers + 1) / self.workers
+
+    def try_enter(self, force: bool = False):
+        """Reserves a place or raises OverloadedError (429). `force` admits regardless (recovered work)."""
+        with self._lock:
+            if self.outstanding >= self.capacity and not force:
+                registry.inc("admission_rejected_total", stage=self.name, reason="queue_full")
+                raise OverloadedError(self.name, f"Too many {self.name} requests in progress "
+                                      f"({self.outstanding}/{self.capacity}). Please retry later.",
+                                      retry_after=self.retry_after(), status_code=429)
+            self.outstanding += 1
+
+    def leave(self, duration: float = None):
+        with self._lock:
+            self.outstanding = max(0, self.outstanding - 1)
+            if duration is not None:
+                self.duration.update(duration)
+
+    def snapshot(self) -> dict:
+        return {"capacity": self.capacity, "outstanding": self.outstanding, "workers": self.workers,
+                "mean_duration_s": round(self.duration.value, 3)}
+
+
+class AdmissionController:
+    """Registry of the process-wide stage limiters and edge queues."""
+
+    def __init__(self):
+        cpus = os.cpu_count() or 1
+        # (limit, queue) per stage; render/encode scale with the CPU count
+        defaults = {
+            "llm": (4, 32),
+            "tts": (8, 64),
+            "render": (cpus, 64),
+            "encode": (max(1, cpus // 2), 64),
+        }
+        timeout = float(os.getenv("ADMISSION_STAGE_TIMEOUT", "300"))
+        self.stages: Dict[str, StageLimiter] = {
+            stage: StageLimiter(stage,
+                                int(_setting(stage, "LIMIT", limit)),
+                                int(_setting(stage, "QUEUE", queue)),
+                                _setting(stage, "TIMEOUT", timeout))
+            for stage, (limit, queue) in defaults.items()
+        }
+        self.queues: Dict[str, AdmissionQueue] = {}
+        registry.register_gauge("admission_in_use", "Stage slots currently held.",
+                                lambda: {(("stage", s),): l.in_use for s, l in self.stages.items()})
+        registry.register_gauge("admission_waiting", "Callers waiting for a stage slot.",
+                                lambda: {(("stage", s),): l.waiting for s, l in self.stages.items()})
+        registry.register_gauge("admission_outstanding", "Accepted, unfinished work per edge queue.",
+                                lambda: {(("queue", n),): q.outstanding for n, q in self.queues.items()})
+
+    def stage(self, name: str) -> StageLimiter:
+        return self.stages[name]
+
+    def queue(self, name: str, capacity: int, workers: int = 1) -> AdmissionQueue:
+        if name not in self.queues:
+            self.queues[name] = AdmissionQueue(name, capacity, workers)
+        return self.queues[name]
+
+    def snapshot(self) -> dict:
+        return {"stages": {n: l.snapshot() for n, l in self.stages.items()},
+                "queues": {n: q.snapshot() for n, q in self.queues.items()}}
+
+
+admission = AdmissionController()
+
+
+def limited(stage: str):
+    """Decorator: run the call holding a `stage` slot."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with admission.stage(stage).slot():
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
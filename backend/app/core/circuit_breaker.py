@@ -0,0 +1,110 @@
+import time
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-provider health state.
+
+    - CLOSED: calls go through; `failure_threshold` consecutive failures open the circuit.
+    - OPEN: calls are skipped until `reset_timeout` seconds have passed.
+    - HALF_OPEN: a single probe call is let through; success closes, failure re-opens.
+
+    Also keeps latency/success stats so callers can order providers by health.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 2, reset_timeout: float = 60.0, ewma_alpha: float = 0.2):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.ewma_alpha = ewma_alpha
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.success_rate = 1.0  # EWMA of outcomes (1 = success)
+        self.latency_ewma = None
+        self.latency_min = None
+        self.latency_max = None
+        self.last_error = None
+
+    def allow_request(self) -> bool:
+        """Returns True if a call may be attempted now (claims the probe slot when half-open)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.calls += 1
+            self.successes += 1
+            self._update_stats(1.0, latency)
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self, latency: float, error: Exception = None):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self._update_stats(0.0, latency)
+            self.last_error = str(error) if error else None
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"⛔ Circuit OPEN for '{self.name}' (retry in {self.reset_timeout:.0f}s)")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def _update_stats(self, outcome: float, latency: float):
+        a = self.ewma_alpha
+        self.success_rate = (1 - a) * self.success_rate + a * outcome
+        self.latency_ewma = latency if self.latency_ewma is None else (1 - a) * self.latency_ewma + a * latency
+        self.latency_min = latency if self.latency_min is None else min(self.latency_min, latency)
+        self.latency_max = latency if self.latency_max is None else max(self.latency_max, latency)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "skipped": self.skipped,
+                "success_rate": round(self.success_rate, 3),
+                "latency_ewma_s": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                "latency_min_s": round(self.latency_min, 3) if self.latency_min is not None else None,
+                "latency_max_s": round(self.latency_max, 3) if self.latency_max is not None else None,
+                "last_error": self.last_error,
+            }
+
+
+def order_by_health(breakers: list, min_success_rate: float = 0.5) -> list:
+    """
+    Orders breakers (given in preference order) so the ones most likely to succeed come first.
+    Providers whose recent success rate fell below `min_success_rate` are demoted behind
+    healthy ones but keep their relative priority. Open circuits stay in the order: callers
+    check `allow_request`, which skips them and counts the skip.
+    """
+    ranked = sorted(enumerate(breakers), key=lambda item: (item[1].success_rate < min_success_rate, item[0]))
+    return [b for _, b in ranked]
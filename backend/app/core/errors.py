@@ -4,6 +4,8 @@ from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 import traceback
 import logging
 
+from app.core.admission import OverloadedError
+
 # Setup Logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AI_Guruji_Backend")
@@ -24,6 +26,19 @@ class RAGError(BaseServiceError):
 class AssetGenerationError(BaseServiceError):
     pass
 
+async def overloaded_exception_handler(request: Request, exc: OverloadedError):
+    """Admission control refusals: 429/503 with Retry-After so clients back off instead of piling on."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "status": "overloaded",
+            "stage": exc.stage,
+            "message": exc.message,
+            "retry_after_seconds": exc.retry_after,
+        }
+    )
+
 async def global_exception_handler(request: Request, exc: Exception):
     """
     Catches all unhandled exceptions to prevent server crash.
@@ -0,0 +1,269 @@
+"""
+Lightweight in-process instrumentation: counters, gauges, histograms and spans,
+exposed in Prometheus text format on /metrics.
+
+    with span("tts.synthesize", provider="edge-tts"):
+        ...
+    @timed("rag.search")
+    def search(...): ...
+    inc("render_cache_lookups_total", stage="tts", result="hit")
+
+A span records its duration in `aiguruji_stage_duration_seconds{stage=...}`,
+tracks `aiguruji_stage_in_flight`, counts failures, and, inside
+`trace(lecture_id)`, is added to that lecture's trace (saved as JSON).
+"""
+import os
+import json
+import time
+import asyncio
+import bisect
+import functools
+import threading
+import contextlib
+import contextvars
+from typing import Callable, Dict, Optional, Tuple
+
+PREFIX = "aiguruji_"
+# Seconds; spans range from sub-millisecond cache hits to multi-minute renders.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[LabelKey, float]]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def gauge_add(self, name: str, amount: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def gauge_set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def register_gauge(self, name: str, help_text: str, fn: Callable[[], Dict[tuple, float]]):
+        """Gauge computed at scrape time; `fn` returns {((label, value), ...): number}."""
+        self.describe(name, "gauge", help_text)
+        self._collectors[name] = fn
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        lines = []
+
+        def header(name, default_kind):
+            kind, help_text = self._help.get(name, (default_kind, ""))
+            if help_text:
+                lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            gauges = {n: dict(s) for n, s in self._gauges.items()}
+            histograms = {n: {k: (list(h.counts), h.sum, h.count, h.buckets) for k, h in s.items()}
+                          for n, s in self._histograms.items()}
+        for name, fn in self._collectors.items():
+            try:
+                gauges[name] = {_label_key(dict(k)): v for k, v in fn().items()}
+            except Exception as e:
+                print(f"⚠️ Metrics collector {name} failed: {e}")
+
+        for name, series in sorted(counters.items()):
+            header(name, "counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{PREFIX}{name}{_format_labels(key)} {value:g}")
+        for name, series in sorted(gauges.items()):
+            header(name, "gauge")
+            for key, value in sorted(series.items()):
+                lines.append(f"{PREFIX}{name}{_format_labels(key)} {value:g}")
+        for name, series in sorted(histograms.items()):
+            header(name, "histogram")
+            for key, (counts, total, count, buckets) in sorted(series.items()):
+                cumulative = 0
+                for bound, c in zip(buckets, counts):
+                    cumulative += c
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("stage_duration_seconds", "histogram", "Wall time of instrumented pipeline stages.")
+registry.describe("stage_in_flight", "gauge", "Stage executions currently running.")
+registry.describe("stage_errors_total", "counter", "Stage executions that raised.")
+registry.describe("event_loop_lag_seconds", "histogram", "Delay of a periodic event-loop timer past its deadline.")
+registry.describe("event_loop_lag_last_seconds", "gauge", "Most recent event-loop timer delay.")
+
+
+def inc(name: str, amount: float = 1.0, **labels):
+    registry.inc(name, amount, **labels)
+
+
+# ---------------------------------------------------------------- traces
+
+class Trace:
+    """Spans of one lecture build, relative to the trace start."""
+
+    def __init__(self, trace_id: str, **attributes):
+        self.trace_id = trace_id
+        self.attributes = attributes
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, start: float, duration: float, labels: dict, error: Optional[str]):
+        entry = {"stage": stage, "start_s": round(start - self._t0, 4), "duration_s": round(duration, 4),
+                 "thread": threading.current_thread().name, **({"labels": labels} if labels else {})}
+        if error:
+            entry["error"] = error
+        with self._lock:
+            self.spans.append(entry)
+
+    def summary(self) -> dict:
+        by_stage = {}
+        for s in self.spans:
+            agg = by_stage.setdefault(s["stage"], {"count": 0, "total_s": 0.0})
+            agg["count"] += 1
+            agg["total_s"] = round(agg["total_s"] + s["duration_s"], 4)
+        return by_stage
+
+    def to_dict(self) -> dict:
+        return {"trace_id": self.trace_id, "started_at": self.started_at,
+                "wall_s": round(time.perf_counter() - self._t0, 4), **self.attributes,
+                "by_stage": self.summary(), "spans": sorted(self.spans, key=lambda s: s["start_s"])}
+
+    def save(self, directory: str = None) -> str:
+        directory = directory or os.path.join(os.getcwd(), "data", "traces")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.trace_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("aiguruji_trace", default=None)
+
+
+@contextlib.contextmanager
+def trace(trace_id: str, save: bool = None, **attributes):
+    """Collects spans from this context (and tasks/threads that copy it); saved when LECTURE_TRACES=1."""
+    t = Trace(trace_id, **attributes)
+    token = _current_trace.set(t)
+    try:
+        yield t
+    finally:
+        _current_trace.reset(token)
+        if save if save is not None else os.getenv("LECTURE_TRACES", "0") == "1":
+            try:
+                t.save()
+            except OSError as e:
+                print(f"⚠️ Could not write trace {trace_id}: {e}")
+
+
+# ---------------------------------------------------------------- spans
+
+@contextlib.contextmanager
+def span(stage: str, **labels):
+    registry.gauge_add("stage_in_flight", 1, stage=stage)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        registry.inc("stage_errors_total", stage=stage)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        registry.gauge_add("stage_in_flight", -1, stage=stage)
+        registry.observe("stage_duration_seconds", duration, stage=stage, **labels)
+        t = _current_trace.get()
+        if t is not None:
+            t.add(stage, start, duration, labels, error)
+
+
+def timed(stage: str):
+    """Decorator form of `span` for service methods."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------------------------------------------------------------- event loop
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+async def monitor_event_loop_lag(interval: float = 0.1):
+    """Samples how late the loop wakes a timer; sustained lag means blocking work on the event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        registry.observe("event_loop_lag_seconds", lag, buckets=LAG_BUCKETS)
+        registry.gauge_set("event_loop_lag_last_seconds", lag)
@@ -1,3 +1,7 @@
+# Bump when the prompt (or how its output is used) changes, so identical generation
+# requests made under the previous version are not coalesced with new ones.
+PROMPT_VERSION = "1"
+
 TEACHER_SYSTEM_PROMPT = """
 You are an expert educator with over 10 years of classroom experience
 and a senior AI systems architect designing a professional AI teaching system.
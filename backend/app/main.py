@@ -1,15 +1,24 @@
 from fastapi import FastAPI, Request
-from app.api.endpoints import upload, generate
+from fastapi.responses import PlainTextResponse
+from app.api.endpoints import upload, generate, assets, storage
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from app.core.errors import global_exception_handler
+from app.core.errors import global_exception_handler, overloaded_exception_handler
+from app.core.admission import OverloadedError
+from app.core.metrics import registry, monitor_event_loop_lag
+from app.services.job_service import job_service
+from app.services.document_service import document_service
+from app.services.storage_service import storage_service
+from app.services.lecture_index import lecture_index
+from app.services.slide_service import slide_service
 import os
 import shutil
+import asyncio
 
 app = FastAPI(title="AI Guruji Backend", version="1.0.0")
 
 # Register Global Exception Handler
 app.add_exception_handler(Exception, global_exception_handler)
+app.add_exception_handler(OverloadedError, overloaded_exception_handler)
 
 # Configure CORS for frontend
 app.add_middleware(
@@ -18,15 +27,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"], # not CORS-safelisted; the frontend backs off on it
 )
 
 app.include_router(upload.router, prefix="/api", tags=["Upload"])
 app.include_router(generate.router, prefix="/api", tags=["Generate"])
+app.include_router(storage.router, prefix="/api", tags=["Storage"])
 
-# Serve generated files (Slides, Audio, Avatar)
-output_dir = os.path.join(os.getcwd(), "data", "outputs")
-os.makedirs(output_dir, exist_ok=True)
-app.mount("/files", StaticFiles(directory=output_dir), name="files")
+# Serve generated files (Slides, Audio, Avatar): immutable /files/a/<digest>/... URLs
+# plus the plain /files/... paths, both with byte-range support
+app.include_router(assets.router, prefix="/files", tags=["Files"])
 
 @app.on_event("startup")
 async def startup_check():
@@ -39,10 +49,36 @@ async def startup_check():
     else:
          print("✅ FFmpeg Check Passed.")
          
+    # Rebuild the index for the latest upload and pick up lecture jobs interrupted by the last
+    # shutdown; with several workers only the ingest owner re-queues them, or each would run N times
+    document_service.resume(on_owner=job_service.resume)
 
+    # Background quota enforcement for data/outputs
+    storage_service.start()
+
+    # Event-loop lag histogram on /metrics (0 disables)
+    lag_interval_ms = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_MS", "100"))
+    if lag_interval_ms > 0:
+        app.state.lag_monitor = asyncio.create_task(monitor_event_loop_lag(lag_interval_ms / 1000.0))
          
     print("✅ System Ready.")
 
+@app.on_event("shutdown")
+async def shutdown_jobs():
+    lag_monitor = getattr(app.state, "lag_monitor", None)
+    if lag_monitor is not None:
+        lag_monitor.cancel()
+    job_service.shutdown()
+    document_service.shutdown()
+    storage_service.shutdown()
+    slide_service.shutdown()
+    lecture_index.flush()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint (per-stage latency histograms, fallbacks, cache hits, in-flight work)."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def read_root():
     return {"message": "AI Guruji Teacher System API is ready."}
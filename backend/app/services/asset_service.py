@@ -0,0 +1,117 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+from typing import NamedTuple, Optional
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# Text-like outputs worth storing precompressed; media is already compressed.
+COMPRESSIBLE_TYPES = {"application/json", "text/plain", "text/vtt", "image/svg+xml", "text/html", "text/css"}
+MIN_COMPRESS_BYTES = 1024
+
+
+class Asset(NamedTuple):
+    path: str
+    rel_path: str
+    digest: str
+    size: int
+    mtime_ns: int
+    content_type: str
+
+
+class AssetService:
+    """
+    Maps generated files under data/outputs to cache-friendly URLs.
+
+    `url_for(path)` returns /files/a/<digest>/<rel_path>, where digest is a
+    content hash, so the URL changes whenever the bytes do and can be cached
+    forever. Digests are cached per (path, mtime, size). Text assets get gzip
+    (and brotli, when installed) variants written next to a hidden cache dir.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = os.path.realpath(root or os.path.join(os.getcwd(), "data", "outputs"))
+        self.variants_dir = os.path.join(self.root, ".precompressed")
+        os.makedirs(self.variants_dir, exist_ok=True)
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------ lookups
+
+    def resolve_path(self, rel_path: str) -> Optional[str]:
+        """Absolute path for a URL path under the outputs root, refusing traversal and hidden files."""
+        path = os.path.realpath(os.path.join(self.root, rel_path))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        if any(part.startswith(".") for part in os.path.relpath(path, self.root).split(os.sep)):
+            return None
+        return path
+
+    def describe(self, path: str) -> Asset:
+        """Asset metadata, hashing the file only when it changed since the last call."""
+        st = os.stat(path)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+            return cached
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(block)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        asset = Asset(path, os.path.relpath(path, self.root).replace(os.sep, "/"),
+                      sha.hexdigest()[:20], st.st_size, st.st_mtime_ns, content_type)
+        with self._lock:
+            self._digests[path] = asset
+        return asset
+
+    def url_for(self, path: str) -> Optional[str]:
+        """Immutable URL for a file under data/outputs (plain /files URL if it cannot be hashed)."""
+        if not path:
+            return None
+        path = os.path.realpath(path)
+        rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+        if rel.startswith(".."):
+            return None
+        try:
+            return f"/files/a/{self.describe(path).digest}/{rel}"
+        except OSError:
+            return f"/files/{rel}"
+
+    def forget(self, path: str):
+        """Drops cached metadata for a deleted file."""
+        with self._lock:
+            self._digests.pop(os.path.realpath(path), None)
+
+    # ------------------------------------------------------------ variants
+
+    def compressible(self, asset: Asset) -> bool:
+        return asset.content_type in COMPRESSIBLE_TYPES and asset.size >= MIN_COMPRESS_BYTES
+
+    def available_encodings(self, asset: Asset) -> list:
+        if not self.compressible(asset):
+            return []
+        return ["br", "gzip"] if HAS_BROTLI else ["gzip"]
+
+    def variant_path(self, asset: Asset, encoding: str) -> str:
+        """Path of the precompressed variant, building it on first use (blocking)."""
+        suffix = {"gzip": "gz", "br": "br"}[encoding]
+        out = os.path.join(self.variants_dir, f"{asset.digest}.{suffix}")
+        if not os.path.exists(out):
+            with open(asset.path, "rb") as f:
+                data = f.read()
+            payload = gzip.compress(data, compresslevel=9, mtime=0) if encoding == "gzip" else brotli.compress(data, quality=11)
+            tmp = f"{out}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, out)
+        return out
+
+
+asset_service = AssetService()
@@ -1,6 +1,10 @@
 import os
 import subprocess
 import shutil
+import threading
+
+from app.services.avatar_worker import AvatarWorkerClient, AvatarQueueFull, AvatarWorkerUnavailable
+from app.core.metrics import timed
 
 class AvatarService:
     def __init__(self):
@@ -9,12 +13,45 @@ class AvatarService:
         self.eunoic_path = os.path.join(os.getcwd(), "Eunoic") 
         os.makedirs(self.output_dir, exist_ok=True)
 
+        # "worker": one persistent process keeps the model loaded (see avatar_worker.py)
+        # "subprocess": launch inference.py per scene (original behaviour, also the fallback)
+        self.mode = os.getenv("AVATAR_MODE", "subprocess").lower()
+        self.worker_backend = os.getenv("AVATAR_WORKER_BACKEND", "eunoic")
+        self.job_timeout = float(os.getenv("AVATAR_JOB_TIMEOUT", "600"))
+        self.queue_depth = int(os.getenv("AVATAR_QUEUE_DEPTH", "8"))
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def _get_worker(self):
+        """Starts the persistent worker on first use; None if it cannot start (use subprocess mode)."""
+        with self._worker_lock:
+            if self._worker is None and self.mode == "worker":
+                worker = AvatarWorkerClient(
+                    backend=self.worker_backend,
+                    eunoic_path=self.eunoic_path,
+                    job_timeout=self.job_timeout,
+                    max_queue=self.queue_depth,
+                )
+                try:
+                    worker.start()
+                    self._worker = worker
+                except Exception as e:
+                    print(f"⚠️ Avatar worker unavailable ({e}). Falling back to subprocess mode.")
+                    self.mode = "subprocess"
+            return self._worker
+
+    def shutdown(self):
+        if self._worker is not None:
+            self._worker.stop()
+            self._worker = None
+
     def check_eunoic(self) -> bool:
         """Checks if Eunoic repository is present."""
         if os.path.exists(self.eunoic_path) and os.path.isdir(self.eunoic_path):
             return True
         return False
 
+    @timed("avatar.generate")
     def generate_avatar_video(self, audio_path: str, slide_image_path: str = None) -> str:
         """
         Generates avatar video using Eunoic.
@@ -27,6 +64,30 @@ class AvatarService:
         Returns:
             Path to the generated video file.
         """
+        voice_name = os.path.basename(audio_path).split('.')[0]
+        output_filename = f"avatar_{voice_name}.mp4"
+        output_path = os.path.join(self.output_dir, output_filename)
+        
+        # Base avatar video (the 'teacher') - Optional check
+        base_video_path = os.path.join(os.getcwd(), "data", "avatar", "teacher_base.mp4")
+        if not os.path.exists(base_video_path):
+            base_video_path = None
+
+        worker = self._get_worker()
+        if worker is not None:
+            try:
+                return worker.submit(audio_path, output_path, base_video_path)
+            except AvatarQueueFull as e:
+                # Shed load instead of piling up; the task fails and the scene is retried next run
+                raise RuntimeError(f"Avatar worker busy: {e}")
+            except AvatarWorkerUnavailable as e:
+                print(f"⚠️ {e}. Falling back to subprocess mode for this job.")
+            except TimeoutError:
+                raise
+            except RuntimeError as e:
+                print(f"❌ Avatar worker job failed: {e}")
+                return None
+
         if not self.check_eunoic():
              print(f"CRITICAL: Eunoic repository not found at {self.eunoic_path}.")
              # Try one level up?
@@ -48,13 +109,6 @@ class AvatarService:
                  print("➡️ Skipping Avatar Generation (Fallback to Slides Only).")
                  return None 
 
-        voice_name = os.path.basename(audio_path).split('.')[0]
-        output_filename = f"avatar_{voice_name}.mp4"
-        output_path = os.path.join(self.output_dir, output_filename)
-        
-        # Base avatar video (the 'teacher') - Optional check
-        base_video_path = os.path.join(os.getcwd(), "data", "avatar", "teacher_base.mp4")
-        
         # Construct Eunoic command
         cmd = [
             "python", inference_script,
@@ -62,14 +116,14 @@ class AvatarService:
             "--output", output_path,
         ]
         
-        if os.path.exists(base_video_path):
+        if base_video_path:
             cmd.extend(["--source_video", base_video_path]) 
 
         print(f"Running Eunoic Avatar Generation: {' '.join(cmd)}")
         
         try:
             # Run in the Eunoic directory to avoid path issues
-            subprocess.run(cmd, check=True, cwd=self.eunoic_path)
+            subprocess.run(cmd, check=True, cwd=self.eunoic_path, timeout=self.job_timeout)
             
             if not os.path.exists(output_path):
                  print("⚠️ Eunoic ran but generated no output file.")
@@ -80,6 +134,8 @@ class AvatarService:
         except subprocess.CalledProcessError as e:
             print(f"❌ Eunoic Execution Failed: {e}")
             return None # Fallback safely
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"Eunoic inference timed out after {self.job_timeout}s")
 
 
 avatar_service = AvatarService()
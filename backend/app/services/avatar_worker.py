@@ -0,0 +1,252 @@
+"""
+Long-lived avatar inference worker.
+
+The worker loads the avatar model once and then serves jobs over stdin/stdout,
+one JSON object per line:
+
+    -> {"event": "ready", "pid": 1234}                                (after model load)
+    <- {"id": 1, "audio": "...wav", "output": "...mp4", "source_video": null}
+    -> {"id": 1, "ok": true, "output": "...mp4"}  |  {"id": 1, "ok": false, "error": "..."}
+
+Run with:  python -m app.services.avatar_worker --backend eunoic --eunoic-path ./Eunoic
+           python -m app.services.avatar_worker --backend stub   (stand-in for tests)
+"""
+import os
+import sys
+import json
+import atexit
+import time
+import shutil
+import argparse
+import itertools
+import threading
+import subprocess
+import concurrent.futures
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+
+
+class AvatarQueueFull(RuntimeError):
+    pass
+
+
+class AvatarWorkerUnavailable(RuntimeError):
+    """The worker could not be (re)started or written to; callers fall back to subprocess mode."""
+
+
+# ---------------------------------------------------------------- worker side
+
+class StubAvatarBackend:
+    """Stand-in model: renders a plain placeholder clip carrying the job's audio."""
+
+    def __init__(self, load_delay: float = 0.0, job_delay: float = 0.0):
+        time.sleep(load_delay)  # simulated model load
+        self.job_delay = job_delay
+        if not shutil.which("ffmpeg"):
+            raise RuntimeError("Stub avatar backend needs ffmpeg in PATH")
+
+    def infer(self, audio: str, output: str, source_video: str = None) -> str:
+        time.sleep(self.job_delay)
+        subprocess.run([
+            "ffmpeg", "-y", "-f", "lavfi", "-i", "color=c=gray:s=500x700:r=25",
+            "-i", audio, "-map", "0:v", "-map", "1:a",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", output
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        return output
+
+
+class EunoicAvatarBackend:
+    """
+    Imports Eunoic's inference module once. The module must expose
+    `load_model()` and `infer(model, audio, output, source_video)`; scripts that
+    only work as a CLI should keep using AVATAR_MODE=subprocess.
+    """
+
+    def __init__(self, eunoic_path: str):
+        import importlib.util
+        script = os.path.join(eunoic_path, "inference.py")
+        if not os.path.exists(script):
+            raise RuntimeError(f"inference.py not found in {eunoic_path}")
+        os.chdir(eunoic_path)
+        sys.path.insert(0, eunoic_path)
+        spec = importlib.util.spec_from_file_location("eunoic_inference", script)
+        self.module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.module)
+        if not (hasattr(self.module, "load_model") and hasattr(self.module, "infer")):
+            raise RuntimeError("Eunoic inference.py does not expose load_model()/infer()")
+        self.model = self.module.load_model()
+
+    def infer(self, audio: str, output: str, source_video: str = None) -> str:
+        self.module.infer(self.model, audio, output, source_video)
+        return output
+
+
+def _serve(args):
+    # Keep the protocol channel clean: anything the model prints goes to stderr.
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1, encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def send(message: dict):
+        protocol.write(json.dumps(message) + "\n")
+        protocol.flush()
+
+    try:
+        if args.backend == "stub":
+            backend = StubAvatarBackend(args.load_delay, args.job_delay)
+        else:
+            backend = EunoicAvatarBackend(args.eunoic_path)
+    except Exception as e:
+        send({"event": "error", "error": f"{type(e).__name__}: {e}"})
+        return 1
+    send({"event": "ready", "pid": os.getpid()})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        try:
+            output = backend.infer(job["audio"], job["output"], job.get("source_video"))
+            send({"id": job["id"], "ok": True, "output": output})
+        except Exception as e:
+            send({"id": job["id"], "ok": False, "error": f"{type(e).__name__}: {e}"})
+    return 0
+
+
+# ---------------------------------------------------------------- client side
+
+class AvatarWorkerClient:
+    """
+    Parent-side handle on one persistent worker process.
+
+    Jobs run one at a time (the model is not shared across jobs); up to
+    `max_queue` callers may be waiting or running, beyond that `submit` raises
+    AvatarQueueFull immediately. A job exceeding `job_timeout` kills the worker,
+    which is restarted (and the model reloaded) on the next job.
+    """
+
+    def __init__(self, backend: str = "eunoic", eunoic_path: str = None,
+                 job_timeout: float = 600.0, max_queue: int = 8, startup_timeout: float = 300.0,
+                 extra_args: list = None):
+        self.backend = backend
+        self.eunoic_path = eunoic_path
+        self.job_timeout = job_timeout
+        self.max_queue = max_queue
+        self.startup_timeout = startup_timeout
+        self.extra_args = extra_args or []
+
+        self._proc = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._ready = None
+        self._job_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._depth = 0
+        atexit.register(self.stop)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    def start(self):
+        cmd = [sys.executable, "-m", "app.services.avatar_worker", "--backend", self.backend]
+        if self.eunoic_path:
+            cmd += ["--eunoic-path", self.eunoic_path]
+        cmd += self.extra_args
+
+        # Each process gets its own ready future and pending map: the reader of a killed
+        # worker may still be draining and must not touch its replacement's state
+        ready, pending = concurrent.futures.Future(), {}
+        self._ready, self._pending = ready, pending
+        self._proc = subprocess.Popen(cmd, cwd=str(BACKEND_ROOT), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      text=True, encoding="utf-8", bufsize=1)
+        threading.Thread(target=self._read_loop, args=(self._proc, ready, pending),
+                         name="avatar-worker-reader", daemon=True).start()
+        try:
+            pid = ready.result(timeout=self.startup_timeout)
+        except Exception:
+            self.stop()
+            raise
+        print(f"✅ Avatar worker ready (backend={self.backend}, pid={pid})")
+
+    def _read_loop(self, proc, ready: concurrent.futures.Future, pending: dict):
+        for line in proc.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get("event") == "ready":
+                ready.set_result(message.get("pid"))
+            elif message.get("event") == "error":
+                ready.set_exception(RuntimeError(message.get("error")))
+            else:
+                future = pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    if message.get("ok"):
+                        future.set_result(message.get("output"))
+                    else:
+                        future.set_exception(RuntimeError(message.get("error")))
+        # Worker exited: fail whatever was waiting on this process
+        if not ready.done():
+            ready.set_exception(RuntimeError("Avatar worker exited during startup"))
+        for future in list(pending.values()):
+            if not future.done():
+                future.set_exception(RuntimeError("Avatar worker exited"))
+        pending.clear()
+
+    def submit(self, audio: str, output: str, source_video: str = None) -> str:
+        with self._state_lock:
+            if self._depth >= self.max_queue:
+                raise AvatarQueueFull(f"Avatar queue full ({self._depth}/{self.max_queue})")
+            self._depth += 1
+        try:
+            with self._job_lock:
+                job_id = next(self._ids)
+                future = concurrent.futures.Future()
+                request = {"id": job_id, "audio": audio, "output": output, "source_video": source_video}
+                self._send(job_id, future, json.dumps(request) + "\n")
+                try:
+                    return future.result(timeout=self.job_timeout)
+                except concurrent.futures.TimeoutError:
+                    print(f"⏱️ Avatar job {job_id} exceeded {self.job_timeout}s; restarting worker.")
+                    self.stop()
+                    raise TimeoutError(f"Avatar job timed out after {self.job_timeout}s")
+        finally:
+            with self._state_lock:
+                self._depth -= 1
+
+    def _send(self, job_id: int, future: concurrent.futures.Future, line: str):
+        """
+        Writes a job to the worker (call with _job_lock held). A worker that exits
+        between the liveness check and the write (broken pipe) is restarted once;
+        raises AvatarWorkerUnavailable if that fails too.
+        """
+        for attempt in range(2):
+            try:
+                if self._proc is None or self._proc.poll() is not None:
+                    self.start()
+                self._pending[job_id] = future
+                self._proc.stdin.write(line)
+                self._proc.stdin.flush()
+                return
+            except (OSError, RuntimeError, TimeoutError, concurrent.futures.TimeoutError) as e:
+                self._pending.pop(job_id, None)
+                self.stop()
+                if attempt:
+                    raise AvatarWorkerUnavailable(f"Avatar worker unavailable: {e}") from e
+                print(f"⚠️ Avatar worker lost ({e}); restarting it.")
+
+    def stop(self):
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent avatar inference worker")
+    parser.add_argument("--backend", choices=["eunoic", "stub"], default="eunoic")
+    parser.add_argument("--eunoic-path", default=os.path.join(os.getcwd(), "Eunoic"))
+    parser.add_argument("--load-delay", type=float, default=0.0, help="stub: simulated model load seconds")
+    parser.add_argument("--job-delay", type=float, default=0.0, help="stub: simulated inference seconds")
+    sys.exit(_serve(parser.parse_args()))
@@ -0,0 +1,411 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import concurrent.futures
+from typing import AsyncIterator, Callable, Optional
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.services.rag_service import rag_service
+from app.core.admission import admission
+
+PDF_MAGIC = b"%PDF-"
+# PDF readers accept the header anywhere in the first 1 KiB
+SNIFF_BYTES = 1024
+# Upload data is buffered in memory and written to disk off the event loop in batches this size
+WRITE_BATCH_BYTES = 1024 * 1024
+
+
+class UploadRejected(Exception):
+    """The upload was refused; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(detail)
+
+
+class _PdfPartWriter:
+    """
+    multipart callbacks that stream the `file` part to disk, hashing as it goes,
+    sniffing the PDF header and enforcing the size cap mid-stream. The callbacks
+    only buffer; `drain` and `finish` do the file I/O and run in a thread.
+    """
+
+    def __init__(self, tmp_path: str, max_bytes: int):
+        self.tmp_path = tmp_path
+        self.max_bytes = max_bytes
+        self.filename = None
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self._file = None
+        self._buffer = []
+        self.buffered = 0
+        self._head = b""
+        self._sniffed = False
+        self._in_file_part = False
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": lambda data, start, end: self._append("_header_field", data[start:end]),
+            "on_header_value": lambda data, start, end: self._append("_header_value", data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _append(self, attr: str, chunk: bytes):
+        setattr(self, attr, getattr(self, attr) + chunk)
+
+    def _part_begin(self):
+        self._headers = {}
+        self._in_file_part = False
+
+    def _header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name") == b"file" and self.filename is None:
+            self.filename = options.get(b"filename", b"upload.pdf").decode("utf-8", "replace")
+            if not self.filename.lower().endswith(".pdf"):
+                raise UploadRejected(400, "File must be a PDF")
+            self._in_file_part = True
+
+    def _part_data(self, data: bytes, start: int, end: int):
+        if not self._in_file_part:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadRejected(413, f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+        if not self._sniffed:
+            self._head += chunk[:SNIFF_BYTES]
+            if PDF_MAGIC in self._head:
+                self._sniffed = True
+            elif len(self._head) >= SNIFF_BYTES:
+                raise UploadRejected(415, "File content is not a PDF")
+        self.sha256.update(chunk)
+        self._buffer.append(chunk)
+        self.buffered += len(chunk)
+
+    def _part_end(self):
+        if self._in_file_part:
+            self._in_file_part = False
+            if not self._sniffed:
+                raise UploadRejected(415, "File content is not a PDF")
+
+    def drain(self):
+        """Writes the buffered data (blocking)."""
+        if self._file is None:
+            self._file = open(self.tmp_path, "wb")
+        buffer, self._buffer, self.buffered = self._buffer, [], 0
+        self._file.write(b"".join(buffer))
+
+    def finish(self):
+        """Writes what is left, then fsyncs so the upload is durable before we acknowledge it."""
+        self.drain()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def abort(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class DocumentService:
+    """
+    Stores uploaded PDFs and indexes them into the RAG service off the event loop.
+
+    Documents are content-addressed (document_id = sha256 prefix) and tracked in
+    data/documents/<id>.json with status stored -> indexing -> indexed | failed.
+    Ingest runs on a single background thread because the RAG index is shared.
+    With RAG_INDEX_MODE=shared only the worker holding the ingest lock indexes;
+    the others leave uploads "stored" for it and follow the status file.
+    """
+
+    def __init__(self):
+        self.uploads_dir = os.path.join(os.getcwd(), "data", "uploads")
+        self.documents_dir = os.path.join(os.getcwd(), "data", "documents")
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        os.makedirs(self.documents_dir, exist_ok=True)
+        self.max_upload_bytes = int(float(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024)
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+        # Uploads beyond this many unfinished ingests are refused with 429
+        self._admission = admission.queue("ingest", int(os.getenv("ADMISSION_INGEST_QUEUE", "8")), workers=1)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------ upload
+
+    async def receive_pdf(self, content_type: str, content_length: Optional[str],
+                          body: AsyncIterator[bytes]) -> dict:
+        """Streams a multipart/form-data body (field `file`) to disk and queues ingest."""
+        if content_length and content_length.isdigit() and int(content_length) > self.max_upload_bytes + 64 * 1024:
+            raise UploadRejected(413, f"File exceeds the {self.max_upload_bytes // (1024 * 1024)} MB upload limit")
+        ctype, options = parse_options_header(content_type or "")
+        boundary = options.get(b"boundary")
+        if ctype != b"multipart/form-data" or not boundary:
+            raise UploadRejected(400, "Expected multipart/form-data with a 'file' field")
+
+        # Refuse before reading the body if the ingest backlog is full
+        self._admission.try_enter()
+        try:
+            doc = await self._receive(boundary, body)
+        except BaseException:
+            self._admission.leave()
+            raise
+        if doc["status"] != "stored":
+            self._admission.leave()
+            return doc
+        self.ingest(doc["document_id"], admitted=True)
+        return doc
+
+    async def _receive(self, boundary: bytes, body: AsyncIterator[bytes]) -> dict:
+        tmp_path = os.path.join(self.uploads_dir, f".incoming_{threading.get_ident()}_{time.time_ns()}.pdf")
+        writer = _PdfPartWriter(tmp_path, self.max_upload_bytes)
+        parser = MultipartParser(boundary, writer.callbacks())
+        loop = asyncio.get_running_loop()
+        try:
+            async for chunk in body:
+                parser.write(chunk)
+                if writer.buffered >= WRITE_BATCH_BYTES:
+                    await loop.run_in_executor(None, writer.drain)
+            parser.finalize()
+            if writer.filename is None:
+                raise UploadRejected(400, "No 'file' field in upload")
+            # Disk writes and the fsync stay off the event loop
+            await loop.run_in_executor(None, writer.finish)
+        except Exception:
+            writer.abort()
+            raise
+
+        sha256 = writer.sha256.hexdigest()
+        document_id = sha256[:16]
+        os.replace(tmp_path, self.pdf_path(document_id))
+
+        existing = self.get(document_id)
+        if existing and existing["status"] in ("indexing", "indexed") and existing["document_id"] == self.latest_id():
+            return existing
+
+        doc = {
+            "document_id": document_id,
+            "filename": writer.filename,
+            "size_bytes": writer.size,
+            "sha256": sha256,
+            "status": "stored",
+            "chunks_count": None,
+            "error": None,
+            "uploaded_at": time.time(),
+        }
+        self._save(doc)
+        self._write_latest(document_id)
+        return doc
+
+    # ------------------------------------------------------------ ingest
+
+    def ingest(self, document_id: str, admitted: bool = False) -> Optional[concurrent.futures.Future]:
+        """Queues ingest; `admitted` means the caller already holds an ingest admission slot."""
+        if not admitted:
+            self._admission.try_enter(force=True)
+        if rag_service.mode == "shared" and not rag_service.store.try_acquire_owner():
+            # Another worker owns ingest; its watcher picks up documents left in "stored"
+            self._admission.leave()
+            return None
+        with self._lock:
+            future = self._executor.submit(self._ingest, document_id)
+            self._futures[document_id] = future
+        # Outside the lock: the callback runs right here if the ingest already finished
+        future.add_done_callback(lambda f: self._forget_future(document_id, f))
+        return future
+
+    def _forget_future(self, document_id: str, future: concurrent.futures.Future):
+        # The record on disk carries the outcome; keep only unfinished ingests in memory
+        with self._lock:
+            if self._futures.get(document_id) is future:
+                del self._futures[document_id]
+
+    def _ingest(self, document_id: str):
+        started = time.perf_counter()
+        try:
+            doc = self.get(document_id)
+            doc["status"] = "indexing"
+            self._save(doc)
+            doc = self._index(doc, self.pdf_path(document_id), publish=True)
+            self._save(doc)
+            return doc
+        finally:
+            self._admission.leave(time.perf_counter() - started)
+
+    def _index(self, doc: dict, pdf_path: str, publish: bool) -> dict:
+        started = time.perf_counter()
+        try:
+            text = rag_service.extract_text_from_pdf(pdf_path)
+            chunks = rag_service.create_chunks(text)
+            rag_service.clear_index() # Clear previous for a fresh start (optional based on use case)
+            rag_service.add_to_index(chunks)
+            rag_service.document_id = doc["document_id"]
+            if publish:
+                rag_service.save_index() # Publish a new snapshot version
+            doc.update(status="indexed", chunks_count=len(chunks), error=None)
+        except Exception as e:
+            print(f"❌ Ingest failed for {doc['document_id']}: {e}")
+            doc.update(status="failed", error=str(e))
+        doc["ingest_seconds"] = round(time.perf_counter() - started, 3)
+        return doc
+
+    def ingest_file(self, path: str) -> dict:
+        """
+        Synchronous ingest of a local PDF for offline batch builds (build_course.py).
+
+        Indexes straight from `path` into this process's in-memory index and returns
+        the document record without touching the server's state: no upload copy, no
+        data/documents record, no snapshot, LATEST left alone. The caller keeps the
+        record (build_course.py stores it in its result files).
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+                size += len(chunk)
+        sha256 = sha256.hexdigest()
+        doc = {
+            "document_id": sha256[:16],
+            "filename": os.path.basename(path),
+            "size_bytes": size,
+            "sha256": sha256,
+            "status": "indexing",
+            "chunks_count": None,
+            "error": None,
+            "uploaded_at": time.time(),
+        }
+        return self._index(doc, path, publish=False)
+
+    def resume(self, on_owner: Callable[[], None] = None):
+        """
+        Restores the index from its latest snapshot, or re-ingests the latest document if there is none.
+
+        `on_owner` runs once in the one process responsible for recovering interrupted
+        work: this one in memory mode, the ingest owner in shared mode (possibly later,
+        when it takes over from a worker that died).
+        """
+        if rag_service.mode == "shared":
+            # Every worker watches for ownership; the first to get the lock ingests for all of them
+            threading.Thread(target=self._watch_pending, args=(on_owner,), name="ingest-watcher", daemon=True).start()
+            return
+        latest = self.get(self.latest_id() or "")
+        restored = latest and latest["status"] == "indexed" and rag_service.load_latest()
+        if latest and not restored and latest["status"] != "failed":
+            self.ingest(latest["document_id"])
+        # After ingest is queued, so resumed jobs wait for it
+        if on_owner:
+            on_owner()
+
+    def _watch_pending(self, on_owner: Callable[[], None] = None):
+        interval = float(os.getenv("INGEST_POLL_SECONDS", "1"))
+        recovered = False
+        while True:
+            if rag_service.store.try_acquire_owner():
+                if not recovered and on_owner:
+                    try:
+                        on_owner()
+                    except Exception as e:
+                        print(f"⚠️ Recovery after taking ingest ownership failed: {e}")
+                latest_id = self.latest_id()
+                for name in sorted(os.listdir(self.documents_dir)):
+                    if not name.endswith(".json"):
+                        continue
+                    doc = self.get(name[:-5])
+                    if not doc or doc["document_id"] in self._futures:
+                        continue
+                    # "indexing" without a local future means the previous owner died mid-ingest
+                    stale = not recovered and doc["status"] == "indexing"
+                    if doc["status"] == "stored" or stale:
+                        if doc["document_id"] == latest_id:
+                            self.ingest(doc["document_id"])
+                        else:
+                            doc["status"] = "superseded"
+                            self._save(doc)
+                recovered = True
+            time.sleep(interval)
+
+    def wait_for_ingest(self, document_id: str = "latest", timeout: float = None) -> Optional[dict]:
+        """Blocks until the document's pending ingest (if any) finishes; returns its record."""
+        if document_id == "latest":
+            document_id = self.latest_id()
+        if not document_id:
+            return None
+        future = self._futures.get(document_id)
+        if future is not None:
+            future.result(timeout=timeout)
+            return self.get(document_id)
+        # Ingest may be running in another worker process: follow the status file
+        deadline = time.monotonic() + timeout if timeout else None
+        doc = self.get(document_id)
+        while doc and doc["status"] in ("stored", "indexing"):
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError(f"Ingest of {document_id} still {doc['status']}")
+            time.sleep(0.5)
+            doc = self.get(document_id)
+        if rag_service.mode == "shared":
+            rag_service.current_snapshot()
+        return doc
+
+    def has_pending_ingest(self) -> bool:
+        if any(not f.done() for f in list(self._futures.values())):
+            return True
+        latest = self.get(self.latest_id() or "")
+        return bool(latest) and latest["status"] in ("stored", "indexing")
+
+    # ------------------------------------------------------------ records
+
+    def pdf_path(self, document_id: str) -> str:
+        return os.path.join(self.uploads_dir, f"{os.path.basename(document_id)}.pdf")
+
+    def get(self, document_id: str) -> Optional[dict]:
+        path = os.path.join(self.documents_dir, f"{os.path.basename(document_id)}.json")
+        if not document_id or not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def latest_id(self) -> Optional[str]:
+        path = os.path.join(self.documents_dir, "LATEST")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+
+    def _write_latest(self, document_id: str):
+        path = os.path.join(self.documents_dir, "LATEST")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(document_id)
+        os.replace(tmp, path)
+
+    def _save(self, doc: dict):
+        path = os.path.join(self.documents_dir, f"{doc['document_id']}.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        os.replace(tmp, path)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+document_service = DocumentService()
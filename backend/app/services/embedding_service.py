@@ -0,0 +1,338 @@
+"""
+Shared text embedding with dynamic cross-request batching.
+
+Requests from any thread are queued; a single batching thread waits up to
+EMBEDDING_MAX_WAIT_MS after the first request for more (up to
+EMBEDDING_MAX_BATCH texts), encodes them in one forward pass and fans the rows
+back out.
+
+EMBEDDING_MODE=local (default) runs the batcher in-process. For several API
+workers, start one server per host and point the workers at it so they share
+one model copy and one batch queue:
+
+    python -m app.services.embedding_service --port 8790          # server
+    EMBEDDING_MODE=remote EMBEDDING_SERVER=127.0.0.1:8790         # API workers
+    python -m app.services.embedding_service --stats              # throughput
+
+Batch sizes and text/batch counts go to /metrics (embedding_*) of the process
+running the batcher; for a shared server, --stats reads them.
+
+EMBEDDING_BACKEND=hashing swaps the transformer for a deterministic, model-free
+stand-in (tests, load tests).
+"""
+import os
+import re
+import sys
+import json
+import time
+import queue
+import socket
+import struct
+import asyncio
+import hashlib
+import argparse
+import threading
+import concurrent.futures
+from typing import List
+
+import numpy as np
+
+from app.core.metrics import registry, inc
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+registry.describe("embedding_batch_texts", "histogram", "Texts per embedding forward pass (cross-request batch size).")
+registry.describe("embedding_texts_total", "counter", "Texts embedded by the micro-batcher.")
+registry.describe("embedding_batches_total", "counter", "Batches run by the micro-batcher.")
+
+
+# ---------------------------------------------------------------- backends
+
+class SentenceTransformerBackend:
+    def __init__(self, model_name: str, encode_batch: int = 64):
+        from sentence_transformers import SentenceTransformer
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        # Forward-pass size cap: a whole-document ingest must not become one giant activation
+        self.encode_batch = max(1, encode_batch)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=max(1, min(len(texts), self.encode_batch))),
+                          dtype=np.float32)
+
+
+class HashingBackend:
+    """Signed feature hashing of lowercase word tokens, L2-normalised. No model, fully deterministic."""
+
+    def __init__(self, dimension: int = 384):
+        self.name = f"hashing-{dimension}"
+        self.dimension = dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dimension] += 1.0 if (h >> 63) else -1.0
+            norm = np.linalg.norm(out[row])
+            if norm:
+                out[row] /= norm
+        return out
+
+
+# ---------------------------------------------------------------- batching
+
+class _Request:
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future = concurrent.futures.Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Collects encode requests for up to `max_wait_ms` (or until `max_batch`
+    texts are waiting) and runs them as one backend call. A single request
+    larger than `max_batch` is encoded on its own.
+    """
+
+    def __init__(self, backend, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.backend = backend
+        self.name = backend.name
+        self.dimension = backend.dimension
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"requests": 0, "texts": 0, "batches": 0, "max_batch_texts": 0,
+                         "encode_seconds": 0.0, "queue_wait_seconds": 0.0}
+        self._started_at = time.time()
+        threading.Thread(target=self._loop, name="embedding-batcher", daemon=True).start()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def submit(self, texts: List[str]) -> concurrent.futures.Future:
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, self.dimension), dtype=np.float32))
+        else:
+            self._queue.put(request)
+        return request.future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            count = len(batch[0].texts)
+            deadline = time.perf_counter() + self.max_wait
+            while count < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                count += len(request.texts)
+            self._run(batch)
+
+    def _run(self, batch: List[_Request]):
+        texts = [t for request in batch for t in request.texts]
+        started = time.perf_counter()
+        try:
+            vectors = self.backend.encode(texts)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - started
+
+        offset = 0
+        for request in batch:
+            n = len(request.texts)
+            request.future.set_result(vectors[offset:offset + n])
+            offset += n
+
+        # /metrics of this process (an API worker in local mode, the embedding server otherwise)
+        registry.observe("embedding_batch_texts", len(texts), buckets=BATCH_SIZE_BUCKETS)
+        inc("embedding_texts_total", len(texts))
+        inc("embedding_batches_total")
+        with self._metrics_lock:
+            m = self._metrics
+            m["requests"] += len(batch)
+            m["texts"] += len(texts)
+            m["batches"] += 1
+            m["max_batch_texts"] = max(m["max_batch_texts"], len(texts))
+            m["encode_seconds"] += elapsed
+            m["queue_wait_seconds"] += sum(started - r.enqueued_at for r in batch)
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            m = dict(self._metrics)
+        return {
+            "backend": self.name,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            **{k: round(v, 4) if isinstance(v, float) else v for k, v in m.items()},
+            "mean_batch_texts": round(m["texts"] / m["batches"], 2) if m["batches"] else 0.0,
+            "mean_queue_wait_ms": round(m["queue_wait_seconds"] / m["requests"] * 1000, 3) if m["requests"] else 0.0,
+            "embeddings_per_encode_second": round(m["texts"] / m["encode_seconds"], 1) if m["encode_seconds"] else 0.0,
+            "uptime_s": round(time.time() - self._started_at, 1),
+        }
+
+
+# ---------------------------------------------------------------- local server
+# Frames are a 4-byte big-endian length followed by the payload. A request is a
+# JSON frame {"op": "encode", "texts": [...]} or {"op": "stats"}; an encode reply
+# is a JSON frame {"ok": true, "shape": [n, d]} followed by the float32 rows.
+
+def _send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Embedding server closed the connection")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (length,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return _recv_exact(sock, length)
+
+
+async def _serve_connection(batcher: MicroBatcher, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            (length,) = struct.unpack(">I", await reader.readexactly(4))
+            message = json.loads(await reader.readexactly(length))
+            if message.get("op") == "stats":
+                frames = [json.dumps({"ok": True, "stats": batcher.stats()}).encode()]
+            else:
+                try:
+                    vectors = await asyncio.wrap_future(batcher.submit(message.get("texts", [])))
+                    frames = [json.dumps({"ok": True, "shape": list(vectors.shape)}).encode(),
+                              np.ascontiguousarray(vectors, dtype=np.float32).tobytes()]
+                except Exception as e:
+                    frames = [json.dumps({"ok": False, "error": f"{type(e).__name__}: {e}"}).encode()]
+            for frame in frames:
+                writer.write(struct.pack(">I", len(frame)) + frame)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(batcher: MicroBatcher, host: str, port: int):
+    server = await asyncio.start_server(lambda r, w: _serve_connection(batcher, r, w), host, port)
+    print(f"✅ Embedding server ({batcher.name}, dim {batcher.dimension}) listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+class RemoteEmbedder:
+    """
+    Client for the local embedding server; one persistent connection per calling thread.
+    Large requests (whole-document ingests) go out `request_texts` at a time, so each
+    call stays well inside the timeout and a retry resends only one slice.
+    """
+
+    def __init__(self, address: str, timeout: float = 30.0, request_texts: int = 256):
+        host, _, port = address.rpartition(":")
+        self.host, self.port = host or "127.0.0.1", int(port)
+        self.timeout = timeout
+        self.request_texts = max(1, request_texts)
+        self._local = threading.local()
+        self.name = f"remote:{address}"
+        self.dimension = self.encode(["dimension probe"]).shape[1]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _call(self, message: dict) -> list:
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self._local.sock = sock
+                _send_frame(sock, json.dumps(message).encode())
+                header = json.loads(_recv_frame(sock))
+                if not header.get("ok"):
+                    raise RuntimeError(header.get("error"))
+                if "shape" not in header:
+                    return [header]
+                return [header, _recv_frame(sock)]
+            except (OSError, ConnectionError):
+                # Stale connection (server restarted): reconnect once
+                self._local.sock = None
+                if sock is not None:
+                    sock.close()
+                if attempt:
+                    raise
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        parts = []
+        for start in range(0, max(1, len(texts)), self.request_texts):
+            header, body = self._call({"op": "encode", "texts": texts[start:start + self.request_texts]})
+            parts.append(np.frombuffer(body, dtype=np.float32).reshape(header["shape"]))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def stats(self) -> dict:
+        return self._call({"op": "stats"})[0]["stats"]
+
+
+# ---------------------------------------------------------------- factory
+
+def create_backend(model_name: str):
+    if os.getenv("EMBEDDING_BACKEND", "sentence-transformers").lower() == "hashing":
+        return HashingBackend(int(os.getenv("EMBEDDING_HASHING_DIM", "384")))
+    return SentenceTransformerBackend(model_name, int(os.getenv("EMBEDDING_ENCODE_BATCH", "64")))
+
+
+def create_batcher(model_name: str) -> MicroBatcher:
+    return MicroBatcher(
+        create_backend(model_name),
+        max_batch=int(os.getenv("EMBEDDING_MAX_BATCH", "64")),
+        max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5")),
+    )
+
+
+def create_embedder(model_name: str):
+    """Embedder for RagService: the shared server in remote mode, otherwise an in-process batcher."""
+    if os.getenv("EMBEDDING_MODE", "local").lower() == "remote":
+        address = os.getenv("EMBEDDING_SERVER", "127.0.0.1:8790")
+        try:
+            return RemoteEmbedder(address, request_texts=int(os.getenv("EMBEDDING_REMOTE_REQUEST_TEXTS", "256")))
+        except Exception as e:
+            print(f"⚠️ Embedding server at {address} unavailable ({e}). Loading the model in-process.")
+    return create_batcher(model_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared embedding server with dynamic batching")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--stats", action="store_true", help="Print a running server's metrics and exit")
+    args = parser.parse_args()
+
+    if args.stats:
+        print(json.dumps(RemoteEmbedder(f"{args.host}:{args.port}").stats(), indent=2))
+        sys.exit(0)
+    asyncio.run(serve(create_batcher(args.model), args.host, args.port))
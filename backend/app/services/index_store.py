@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+from typing import List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class IndexSnapshot(NamedTuple):
+    version: int
+    embeddings: np.ndarray  # float32 [n, dim], memory-mapped read-only
+    norms: np.ndarray       # float32 [n], squared L2 norms of the rows
+    chunks: List[str]
+    meta: dict
+
+    def search(self, query: np.ndarray, k: int) -> List[int]:
+        """Exact L2 nearest neighbours (same ranking as faiss.IndexFlatL2)."""
+        n = len(self.chunks)
+        if n == 0:
+            return []
+        k = min(k, n)
+        # ||e - q||^2 = ||e||^2 - 2 e.q + ||q||^2; the last term does not change the order
+        distances = self.norms - 2.0 * (self.embeddings @ query.astype(np.float32))
+        top = np.argpartition(distances, k - 1)[:k]
+        return [int(i) for i in top[np.argsort(distances[top])]]
+
+
+class IndexSnapshotStore:
+    """
+    Versioned, immutable retrieval snapshots shared by all API worker processes.
+
+    Layout under data/vector_store:
+        v000007/embeddings.npy, norms.npy, chunks.json, meta.json
+        CURRENT        -> "7"   (replaced atomically after a version is complete)
+        ingest.lock    -> flock held by the single ingest owner
+
+    Readers memory-map the arrays read-only, so N workers share one copy in
+    the page cache, and pick up a new version by re-reading CURRENT.
+    """
+
+    def __init__(self, root: str = None, keep_versions: int = 3):
+        self.root = root or os.path.join(os.getcwd(), "data", "vector_store")
+        os.makedirs(self.root, exist_ok=True)
+        # At least the previous version, so a reader that just saw the old CURRENT can still load it
+        self.keep_versions = max(2, keep_versions)
+        self._lock_file = None
+
+    # ------------------------------------------------------------ ownership
+
+    def try_acquire_owner(self) -> bool:
+        """Non-blocking; True if this process is (now) the ingest owner. Released when the process exits."""
+        if self._lock_file is not None:
+            return True
+        f = open(os.path.join(self.root, "ingest.lock"), "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._lock_file = f
+        return True
+
+    @property
+    def is_owner(self) -> bool:
+        return self._lock_file is not None
+
+    # ------------------------------------------------------------ versions
+
+    def current_version(self) -> int:
+        try:
+            with open(os.path.join(self.root, "CURRENT"), "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _version_dir(self, version: int) -> str:
+        return os.path.join(self.root, f"v{version:06d}")
+
+    def publish(self, embeddings: np.ndarray, chunks: List[str], meta: dict = None) -> int:
+        """Writes a complete new version, then flips CURRENT to it. Owner only."""
+        if not self.is_owner:
+            raise RuntimeError("Only the ingest owner may publish index snapshots")
+        if chunks:
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(chunks), -1)
+        else:
+            embeddings = np.zeros((0, (meta or {}).get("dim", 0)), dtype=np.float32)
+        version = self.current_version() + 1
+        tmp_dir = self._version_dir(version) + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        np.save(os.path.join(tmp_dir, "embeddings.npy"), embeddings)
+        np.save(os.path.join(tmp_dir, "norms.npy"), (embeddings * embeddings).sum(axis=1).astype(np.float32))
+        with open(os.path.join(tmp_dir, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(chunks, f)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({**(meta or {}), "version": version, "count": len(chunks),
+                       "dim": int(embeddings.shape[1]), "created_at": time.time()}, f)
+        for name in os.listdir(tmp_dir):
+            with open(os.path.join(tmp_dir, name), "rb") as f:
+                os.fsync(f.fileno())
+        os.replace(tmp_dir, self._version_dir(version))
+
+        current = os.path.join(self.root, "CURRENT")
+        with open(current + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(version))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current + ".tmp", current)
+
+        self._prune(version)
+        return version
+
+    def _prune(self, version: int):
+        # Old versions stay readable by anyone who has them mapped; only the directory entries go
+        for v in range(version - self.keep_versions, 0, -1):
+            path = self._version_dir(v)
+            if not os.path.isdir(path):
+                break
+            shutil.rmtree(path, ignore_errors=True)
+
+    def load(self, version: int = None) -> Optional[IndexSnapshot]:
+        version = self.current_version() if version is None else version
+        path = self._version_dir(version)
+        if version == 0 or not os.path.isdir(path):
+            return None
+        try:
+            with open(os.path.join(path, "chunks.json"), "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if not chunks:
+                empty = np.zeros((0, meta.get("dim", 0)), dtype=np.float32)
+                return IndexSnapshot(version, empty, np.zeros(0, dtype=np.float32), chunks, meta)
+            embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+            norms = np.load(os.path.join(path, "norms.npy"), mmap_mode="r")
+        except FileNotFoundError:
+            # Pruned by the owner while we were loading; the caller keeps what it has
+            return None
+        return IndexSnapshot(version, embeddings, norms, chunks, meta)
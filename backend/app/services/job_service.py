@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+import concurrent.futures
+from typing import Callable, Dict, Optional
+
+from app.core.metrics import registry, inc
+from app.core.admission import admission
+
+# Statuses a job can be in; QUEUED/RUNNING jobs are re-queued after a restart.
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+def is_final_event(message: dict) -> bool:
+    """The status event that ends a job's event stream."""
+    return message["event"] == "status" and message.get("status") in (DONE, FAILED)
+
+
+class JobService:
+    """
+    Runs long pipelines (lecture generation) off the request path.
+
+    Jobs execute on a bounded thread pool (LECTURE_JOB_WORKERS), so at most that
+    many pipelines run at once and the rest wait in order. Each job's record is
+    persisted to data/jobs/<job_id>.json on every state change; `resume()`
+    re-queues jobs that were queued or running when the process stopped.
+
+    Progress events are kept per job (with increasing `seq`) and pushed to
+    asyncio subscribers, which back the SSE endpoint. Finished jobs are dropped
+    from memory after LECTURE_JOB_RETENTION_SECONDS; their files remain.
+    """
+
+    def __init__(self):
+        self.jobs_dir = os.path.join(os.getcwd(), "data", "jobs")
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.max_workers = int(os.getenv("LECTURE_JOB_WORKERS", "2"))
+        self.max_events = int(os.getenv("LECTURE_JOB_EVENT_HISTORY", "500"))
+        # Running + waiting jobs; submissions beyond this are refused with 429 and Retry-After
+        self.max_queued = int(os.getenv("LECTURE_JOB_QUEUE_DEPTH", "8"))
+        self._admission = admission.queue("lecture", self.max_workers + self.max_queued, workers=self.max_workers)
+        # Identical submissions (same dedupe key) attach to the in-flight job, or reuse
+        # its result for this many seconds after it finishes
+        self.coalesce_ttl = float(os.getenv("LECTURE_COALESCE_TTL_SECONDS", "120"))
+        self._keys: Dict[str, str] = {}
+        # Never shorter than the coalescing window, which reads finished jobs from memory
+        self.retention = max(self.coalesce_ttl, float(os.getenv("LECTURE_JOB_RETENTION_SECONDS", "900")))
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="lecture-job"
+        )
+        self._runners: Dict[str, Callable] = {}
+        self._jobs: Dict[str, dict] = {}
+        self._events: Dict[str, list] = {}
+        self._subscribers: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._resumed = False
+        registry.register_gauge("jobs", "Lecture jobs by status.", self._status_counts)
+
+    def _status_counts(self) -> dict:
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        for job in list(self._jobs.values()):
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {(("status", status),): n for status, n in counts.items()}
+
+    def register(self, kind: str, runner: Callable[[dict, Callable[..., None]], dict]):
+        """`runner(params, progress)` does the work and returns a small result dict."""
+        self._runners[kind] = runner
+
+    # ------------------------------------------------------------ lifecycle
+
+    def submit(self, kind: str, params: dict, job_id: str = None, dedupe_key: str = None) -> dict:
+        """
+        Queues a job; raises OverloadedError when the queue is full.
+
+        With `dedupe_key`, a matching job that is still active (or finished
+        successfully within the coalescing TTL) is returned instead, marked
+        `coalesced`, and nothing new is queued.
+        """
+        if kind not in self._runners:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+        job = {
+            "job_id": job_id or str(uuid.uuid4()),
+            "kind": kind,
+            "params": params,
+            "status": QUEUED,
+            "stage": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "dedupe_key": dedupe_key,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._evict_finished()
+        # Check and register under one lock so two identical requests cannot both start a job
+        with self._lock:
+            existing = self._coalesce_target(dedupe_key) if dedupe_key else None
+            if existing is None:
+                self._admission.try_enter()
+                self._jobs[job["job_id"]] = job
+                self._events[job["job_id"]] = []
+                if dedupe_key:
+                    self._keys[dedupe_key] = job["job_id"]
+        if existing is not None:
+            inc("jobs_coalesced_total", kind=kind, result="inflight" if existing["status"] in ACTIVE_STATUSES else "memo")
+            return dict(existing, coalesced=True)
+        self._save(job)
+        self._emit(job["job_id"], "status", status=QUEUED)
+        snapshot = dict(job, coalesced=False)
+        self._executor.submit(self._run, job["job_id"])
+        return snapshot
+
+    def resume(self):
+        """Re-queues persisted jobs that never finished (call in one process only; see DocumentService.resume)."""
+        if self._resumed:
+            return
+        self._resumed = True
+        requeued = 0
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable job file {name}: {e}")
+                continue
+            # Finished jobs stay on disk; `get` reads them from there
+            if job.get("job_id") in self._jobs or job["status"] not in ACTIVE_STATUSES:
+                continue
+            if job.get("kind") in self._runners:
+                with self._lock:
+                    self._jobs[job["job_id"]] = job
+                    self._events[job["job_id"]] = []
+                job["status"] = QUEUED
+                self._save(job)
+                self._emit(job["job_id"], "status", status=QUEUED, resumed=True)
+                self._admission.try_enter(force=True)
+                if job.get("dedupe_key"):
+                    self._keys[job["dedupe_key"]] = job["job_id"]
+                self._executor.submit(self._run, job["job_id"])
+                requeued += 1
+        if requeued:
+            print(f"🔁 Re-queued {requeued} unfinished job(s).")
+
+    def _run(self, job_id: str):
+        job = self._jobs[job_id]
+        job["status"] = RUNNING
+        job["attempts"] = job.get("attempts", 0) + 1
+        job["started_at"] = time.time()
+        self._save(job)
+        self._emit(job_id, "status", status=RUNNING)
+        registry.observe("job_queue_wait_seconds", max(0.0, job["started_at"] - job["created_at"]), kind=job["kind"])
+
+        def progress(event: str, **data):
+            if event == "stage":
+                job["stage"] = data.get("stage")
+            if "slides_total" in data:
+                job["progress"]["slides_total"] = data["slides_total"]
+            if event == "slide_ready":
+                job["progress"]["slides_ready"] = data["index"] + 1
+            self._save(job)
+            self._emit(job_id, event, **data)
+
+        started = time.perf_counter()
+        try:
+            job["result"] = self._runners[job["kind"]](job["params"], progress)
+            job["status"] = DONE
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            job["status"] = FAILED
+            job["error"] = str(e)
+        finally:
+            self._admission.leave(time.perf_counter() - started)
+        job["finished_at"] = time.time()
+        if job["status"] == FAILED and job.get("dedupe_key"):
+            # Let the next identical request retry instead of inheriting the failure
+            with self._lock:
+                if self._keys.get(job["dedupe_key"]) == job_id:
+                    del self._keys[job["dedupe_key"]]
+        self._save(job)
+        self._emit(job_id, "status", status=job["status"], result=job["result"], error=job["error"])
+
+    def _coalesce_target(self, key: str) -> Optional[dict]:
+        """Active or recently finished job for `key` (call with the lock held)."""
+        job = self._jobs.get(self._keys.get(key))
+        if job is not None:
+            if job["status"] in ACTIVE_STATUSES:
+                return job
+            if job["status"] == DONE and time.time() - job.get("finished_at", 0) <= self.coalesce_ttl:
+                return job
+        self._keys.pop(key, None)
+        return None
+
+    def _evict_finished(self):
+        """Drops finished jobs past the retention window (nobody subscribed) from memory."""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["status"] not in ACTIVE_STATUSES
+                       and job.get("finished_at", job.get("updated_at", 0)) < cutoff
+                       and not self._subscribers.get(job_id)]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._events.pop(job_id, None)
+                self._subscribers.pop(job_id, None)
+
+    def forget_key(self, key: str):
+        """Stops coalescing onto whatever job last ran for `key` (its result was invalidated)."""
+        with self._lock:
+            job = self._jobs.get(self._keys.get(key))
+            if job is not None and job["status"] not in ACTIVE_STATUSES:
+                del self._keys[key]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------ queries
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            path = self._job_path(job_id)
+            if not os.path.exists(path):
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return dict(job, queue_position=self._queue_position(job_id))
+
+    def _queue_position(self, job_id: str) -> Optional[int]:
+        if self._jobs[job_id]["status"] != QUEUED:
+            return None
+        queued = sorted((j for j in self._jobs.values() if j["status"] == QUEUED), key=lambda j: j["created_at"])
+        return next(i for i, j in enumerate(queued) if j["job_id"] == job_id) + 1
+
+    def is_finished(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id) or self.get(job_id)
+        return job is None or job["status"] not in ACTIVE_STATUSES
+
+    def is_local(self, job_id: str) -> bool:
+        """True if this process holds the job (and so emits its events)."""
+        return job_id in self._jobs
+
+    # ------------------------------------------------------------ events
+
+    def _emit(self, job_id: str, event: str, **data):
+        with self._lock:
+            events = self._events.setdefault(job_id, [])
+            job = self._jobs.get(job_id, {})
+            # seq survives restarts (via the job file) so Last-Event-ID stays meaningful
+            seq = job.get("last_seq", 0) + 1
+            job["last_seq"] = seq
+            message = {"seq": seq, "event": event, "ts": time.time(), **data}
+            events.append(message)
+            if len(events) > self.max_events:
+                del events[: len(events) - self.max_events]
+            subscribers = list(self._subscribers.get(job_id, []))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    def subscribe(self, job_id: str, after_seq: int = 0):
+        """
+        Returns (history, queue, entry, finished): events with seq > after_seq so far,
+        an asyncio.Queue receiving later ones, the handle for `unsubscribe`, and
+        whether the final status event has already been emitted (so nothing more
+        will arrive on the queue).
+        """
+        queue = asyncio.Queue()
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            events = self._events.get(job_id, [])
+            history = [e for e in events if e["seq"] > after_seq]
+            # Evicted since the caller checked is_local: nothing more will be emitted here
+            finished = job_id not in self._jobs or any(is_final_event(e) for e in events)
+            self._subscribers.setdefault(job_id, []).append(entry)
+        return history, queue, entry, finished
+
+    def unsubscribe(self, job_id: str, entry):
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, [])
+            if entry in subscribers:
+                subscribers.remove(entry)
+
+    async def follow_file(self, job_id: str, interval: float = 1.0, keep_alive: float = 15.0):
+        """
+        Events for a job this process does not hold (run by another worker, or
+        finished and evicted), derived from changes to its job file. Yields None
+        as a keep-alive; ends after the final status.
+        """
+        loop = asyncio.get_running_loop()
+        state = {}
+        quiet_since = time.monotonic()
+        while True:
+            job = await loop.run_in_executor(None, self.get, job_id)
+            if job is None:
+                return
+            seq = job.get("last_seq", 0) + 1
+            progress = job.get("progress") or {}
+            messages = []
+            if job.get("stage") and job["stage"] != state.get("stage"):
+                messages.append({"event": "stage", "stage": job["stage"]})
+            ready = progress.get("slides_ready")
+            if ready and ready != state.get("slides_ready"):
+                messages.append({"event": "slide_ready", "index": ready - 1, "slides_total": progress.get("slides_total")})
+            if job["status"] != state.get("status"):
+                messages.append({"event": "status", "status": job["status"],
+                                 "result": job.get("result"), "error": job.get("error")})
+            state.update(stage=job.get("stage"), slides_ready=ready, status=job["status"])
+            for message in messages:
+                yield {"seq": seq, "ts": job.get("updated_at"), **message}
+            if job["status"] not in ACTIVE_STATUSES:
+                return
+            if messages:
+                quiet_since = time.monotonic()
+            elif time.monotonic() - quiet_since >= keep_alive:
+                quiet_since = time.monotonic()
+                yield None
+            await asyncio.sleep(interval)
+
+    # ------------------------------------------------------------ persistence
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{os.path.basename(job_id)}.json")
+
+    def _save(self, job: dict):
+        job["updated_at"] = time.time()
+        path = self._job_path(job["job_id"])
+        tmp = path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(job, f, indent=2)
+            os.replace(tmp, path)
+
+
+job_service = JobService()
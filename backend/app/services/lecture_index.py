@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import threading
+import contextlib
+from typing import Dict, List, Optional
+
+from app.core.metrics import registry, inc
+from app.core.prompts import PROMPT_VERSION
+from app.services.llm_service import llm_service
+from app.services.tts_service import tts_service
+from app.services.lecture_store import lecture_store
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+registry.describe("lecture_index_lookups_total", "counter", "Finished-lecture index lookups by result.")
+
+
+def has_placeholder_audio(lecture: dict) -> bool:
+    """True if any slide fell back to the sample clip or silence instead of real narration."""
+    return any(slide.get("tts_error") or slide.get("tts_provider") == "silent"
+               or ".silent." in (slide.get("audio_url") or "")
+               for slide in lecture.get("slides", []))
+
+
+class LectureIndex:
+    """
+    Maps everything that determines a generated lecture - PDF content hash,
+    target_minutes, LLM model chain, prompt version and TTS voice - to the
+    lecture already produced for it, so re-uploading the same document (next
+    semester, another browser) returns that lecture instead of regenerating.
+
+    Persisted as data/lecture_index.json and re-read when another worker
+    changes it; updates hold a file lock so concurrent workers and batch
+    processes (build_course.py) never drop each other's entries. Lookups only
+    read: hit counts accumulate in memory and are flushed every
+    LECTURE_INDEX_FLUSH_SECONDS. Entries whose lecture file is gone are
+    dropped on lookup; lectures with any placeholder audio (the sample clip
+    or the silent fallback) are never recorded.
+    Changing the model, voice or PROMPT_VERSION changes the key, so old
+    entries simply stop matching; `invalidate` removes them explicitly.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(os.getcwd(), "data", "lecture_index.json")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock_path = self.path + ".lock"
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._entries: Dict[str, dict] = {}
+        self._pending_hits: Dict[str, tuple] = {} # key -> (count, last_hit_at) not yet on disk
+        self.flush_interval = float(os.getenv("LECTURE_INDEX_FLUSH_SECONDS", "60"))
+        self._flushed_at = time.monotonic()
+
+    def key(self, document_sha256: str, target_minutes: int) -> str:
+        return "|".join([document_sha256, str(target_minutes), llm_service.model_signature,
+                         PROMPT_VERSION, tts_service.voice])
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Lecture id for `key` if it is indexed and still on disk."""
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(key)
+        if entry is None:
+            inc("lecture_index_lookups_total", result="miss")
+            return None
+        if not os.path.exists(lecture_store.path(entry["lecture_id"])):
+            with self._locked():
+                self._reload()
+                if self._entries.get(key, {}).get("lecture_id") == entry["lecture_id"]:
+                    del self._entries[key]
+                    self._save()
+            inc("lecture_index_lookups_total", result="stale")
+            return None
+        with self._lock:
+            count, _ = self._pending_hits.get(key, (0, 0.0))
+            self._pending_hits[key] = (count + 1, time.time())
+        inc("lecture_index_lookups_total", result="hit")
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        return entry["lecture_id"]
+
+    def flush(self):
+        """Writes accumulated hit counts to disk."""
+        self._flushed_at = time.monotonic()
+        with self._locked():
+            if not self._pending_hits:
+                return
+            self._reload()
+            for key, (count, last_hit_at) in self._pending_hits.items():
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["hits"] = entry.get("hits", 0) + count
+                    entry["last_hit_at"] = max(last_hit_at, entry.get("last_hit_at", 0.0))
+            self._pending_hits = {}
+            self._save()
+
+    def record(self, key: str, lecture_id: str, lecture: dict):
+        if has_placeholder_audio(lecture):
+            print(f"⚠️ Lecture {lecture_id} has placeholder audio; not adding it to the lecture index.")
+            return
+        document_sha256, target_minutes, model, prompt_version, voice = key.split("|", 4)
+        with self._locked():
+            self._reload()
+            self._entries[key] = {
+                "lecture_id": lecture_id,
+                "document_id": document_sha256[:16],
+                "document_sha256": document_sha256,
+                "target_minutes": int(target_minutes),
+                "model": model,
+                "prompt_version": prompt_version,
+                "voice": voice,
+                "created_at": time.time(),
+                "hits": 0,
+            }
+            self._save()
+
+    def invalidate(self, document_id: str = None, lecture_id: str = None) -> List[str]:
+        """Drops entries for a document (id or full sha256), a lecture, or everything; returns the removed keys."""
+        document_id, lecture_id = document_id or None, lecture_id or None
+        with self._locked():
+            self._reload()
+            removed = [key for key, entry in self._entries.items()
+                       if (document_id is None or entry["document_sha256"].startswith(document_id))
+                       and (lecture_id is None or entry["lecture_id"] == lecture_id)]
+            for key in removed:
+                del self._entries[key]
+            if removed:
+                self._save()
+        return removed
+
+    def last_used(self) -> Dict[str, float]:
+        """lecture_id -> when it was last recorded or served from the index."""
+        self.flush()
+        with self._lock:
+            self._reload()
+            entries = list(self._entries.values())
+        used: Dict[str, float] = {}
+        for e in entries:
+            used[e["lecture_id"]] = max(used.get(e["lecture_id"], 0.0), e.get("last_hit_at", 0.0), e["created_at"])
+        return used
+
+    def stats(self) -> dict:
+        self.flush()
+        with self._lock:
+            self._reload()
+            entries = list(self._entries.values())
+        return {"entries": len(entries),
+                "documents": len({e["document_sha256"] for e in entries}),
+                "hits": sum(e.get("hits", 0) for e in entries),
+                "current": {"model": llm_service.model_signature, "prompt_version": PROMPT_VERSION,
+                            "voice": tts_service.voice}}
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Thread lock plus an exclusive lock on the index file shared with other processes."""
+        with self._lock, open(self.lock_path, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _reload(self):
+        # Another process may have written since we last looked (call with the lock held)
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read lecture index: {e}")
+
+    def _save(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+
+lecture_index = LectureIndex()
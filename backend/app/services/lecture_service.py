@@ -0,0 +1,121 @@
+import os
+import json
+import time
+from typing import Callable, Optional
+
+from app.core.prompts import TEACHER_SYSTEM_PROMPT
+from app.core.admission import OverloadedError
+from app.services.rag_service import rag_service
+from app.services.llm_service import llm_service
+from app.services.slide_service import slide_service
+from app.services.tts_service import tts_service
+from app.services.viseme_service import viseme_service
+from app.services.lecture_store import lecture_store
+from app.services.asset_service import asset_service
+from app.core.metrics import trace
+
+
+class LectureGenerationError(RuntimeError):
+    pass
+
+
+class LectureService:
+    """
+    Builds a web lecture (script, PPTX, per-slide narration) from the indexed document.
+
+    Runs synchronously; callers that must not block (the HTTP layer) run it
+    through job_service. Progress is reported as `progress(event, **data)`.
+    """
+
+    def __init__(self):
+        self.debug_dir = os.path.join(os.getcwd(), "data", "outputs", "scripts")
+
+    def has_indexed_content(self) -> bool:
+        return rag_service.size > 0
+
+    def generate(self, lecture_id: str, target_minutes: int = 10,
+                 progress: Optional[Callable[..., None]] = None) -> dict:
+        progress = progress or (lambda event, **data: None)
+        # Per-lecture span breakdown; written to data/traces/ when LECTURE_TRACES=1
+        with trace(lecture_id, kind="lecture", target_minutes=target_minutes):
+            return self._generate(lecture_id, progress)
+
+    def _generate(self, lecture_id: str, progress: Callable[..., None]) -> dict:
+
+        # In this simple MVP, we ignore document_id and use the active FAISS index
+        progress("stage", stage="retrieve")
+        document_id = rag_service.active_document_id()
+        context_chunks = rag_service.search("Overview and key concepts", k=10)
+        if rag_service.active_document_id() != document_id:
+            document_id = None # index swapped mid-search: source unknown
+        retrieved_context = "\n\n".join(context_chunks)
+        if not retrieved_context and not self.has_indexed_content():
+            raise LectureGenerationError("No PDF uploaded/indexed. Please upload a PDF first.")
+
+        # 1. Generate Content (Dict)
+        progress("stage", stage="script")
+        try:
+            lecture_data = llm_service.generate_lecture_content(TEACHER_SYSTEM_PROMPT, retrieved_context)
+        except OverloadedError:
+            raise
+        except Exception as e:
+            raise LectureGenerationError(f"LLM Generation Failed: {str(e)}")
+
+        # Which document the content came from (None if unknown); callers key caches on it
+        lecture_data["document_id"] = document_id
+
+        # Debug Storage
+        os.makedirs(self.debug_dir, exist_ok=True)
+        timestamp = int(time.time())
+        with open(os.path.join(self.debug_dir, f"generation_{timestamp}.txt"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(lecture_data, indent=2))
+
+        # 2. PPTX + per-slide audio. The frontend handles avatar rendering and
+        # lip sync, so the web lecture needs only Audio + Slide + Data.
+        slides = lecture_data.get("slides", [])
+
+        progress("stage", stage="pptx", slides_total=len(slides))
+        try:
+            slide_service.generate_presentation(lecture_data.get("lecture_title", "Lecture"), slides)
+        except Exception as e:
+            print(f"⚠️ PPTX Generation Failed: {e}. Skipping (Lecture will still work on web).")
+
+        progress("stage", stage="audio", slides_total=len(slides))
+        for i, slide in enumerate(slides):
+            script = slide.get("script", "")
+            if script:
+                audio_filename = f"{lecture_id}_slide_{i+1}.mp3"
+                # tts_service returns (path, duration)
+                try:
+                    path, duration, provider = tts_service.synthesize(script, audio_filename)
+                    # Content-hashed URL: browsers and the CDN may cache it indefinitely
+                    slide["audio_url"] = asset_service.url_for(path)
+                    slide["duration_seconds"] = duration
+                    slide["slide_id"] = i + 1
+                    slide["tts_provider"] = provider # "silent" when every provider failed
+                    try:
+                        # Precomputed lip-sync timeline (avatar falls back to live analysis without it)
+                        slide["viseme_timeline"] = viseme_service.compute_timeline(path)
+                    except Exception as e:
+                        print(f"⚠️ Viseme timeline failed for slide {i}: {e}")
+                except OverloadedError:
+                    # No TTS slot in time: fail the job visibly rather than ship placeholder audio
+                    raise
+                except Exception as e:
+                    print(f"TTS failed for slide {i}: {e}. using fallback.")
+                    # Fallback to existing sample or silence
+                    slide["audio_url"] = "/sample.mp3" # Ensure this file exists in frontend/public or backend static
+                    slide["duration_seconds"] = 5
+                    slide["slide_id"] = i + 1
+                    slide["tts_error"] = str(e)
+            progress("slide_ready", index=i, slides_total=len(slides),
+                     audio_url=slide.get("audio_url"), duration_seconds=slide.get("duration_seconds"))
+
+        # Save finalized lecture JSON (also refreshes the read cache)
+        progress("stage", stage="save")
+        lecture_store.save(lecture_id, lecture_data)
+
+        return lecture_data
+
+
+lecture_service = LectureService()
@@ -0,0 +1,136 @@
+import os
+import json
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.metrics import inc
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+
+def dumps_compact(data) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(raw: bytes):
+    return orjson.loads(raw) if HAS_ORJSON else json.loads(raw)
+
+
+class CachedLecture:
+    """
+    One lecture serialized once, with its strong ETag and compressed variants.
+
+    Every variant is built here, in `LectureStore.save`/`load` (job threads and
+    the threadpool), so serving a cached entry never compresses on the event loop.
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.gzip = gzip.compress(body, compresslevel=6, mtime=0)
+        self.brotli: Optional[bytes] = brotli.compress(body, quality=9) if HAS_BROTLI else None
+
+    def variant(self, encoding: str) -> bytes:
+        if encoding == "br":
+            return self.brotli
+        if encoding == "gzip":
+            return self.gzip
+        return self.body
+
+    def etag_for(self, encoding: str) -> str:
+        # Each representation has its own strong validator
+        suffix = {"br": "-br", "gzip": "-gz"}.get(encoding, "")
+        return f'"{self.etag}{suffix}"'
+
+
+class LectureStore:
+    """
+    Lecture JSON on disk (data/lectures/<id>.json) fronted by an LRU of
+    pre-serialized bytes.
+
+    Writes go through `save`, which replaces the file atomically and refreshes
+    the cache entry, so readers never see a stale lecture from this process.
+    """
+
+    def __init__(self, lectures_dir: str = None, max_entries: int = None):
+        self.lectures_dir = lectures_dir or os.path.join(os.getcwd(), "data", "lectures")
+        os.makedirs(self.lectures_dir, exist_ok=True)
+        self.max_entries = max_entries or int(os.getenv("LECTURE_CACHE_SIZE", "64"))
+        self._cache: "OrderedDict[str, CachedLecture]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, lecture_id: str) -> str:
+        return os.path.join(self.lectures_dir, f"{os.path.basename(lecture_id)}.json")
+
+    def save(self, lecture_id: str, data: dict) -> CachedLecture:
+        path = self.path(lecture_id)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+        entry = CachedLecture(dumps_compact(data))
+        self._put(lecture_id, entry)
+        return entry
+
+    def invalidate(self, lecture_id: str):
+        with self._lock:
+            self._cache.pop(lecture_id, None)
+
+    def get_cached(self, lecture_id: str) -> Optional[CachedLecture]:
+        """Memory-only lookup; safe to call from the event loop."""
+        with self._lock:
+            entry = self._cache.get(lecture_id)
+            if entry is not None:
+                self._cache.move_to_end(lecture_id)
+                self.hits += 1
+                inc("lecture_cache_lookups_total", result="hit")
+            return entry
+
+    def load(self, lecture_id: str) -> Optional[CachedLecture]:
+        """Cache lookup falling back to disk (blocking; run off the event loop)."""
+        entry = self.get_cached(lecture_id)
+        if entry is not None:
+            return entry
+        path = self.path(lecture_id)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        self.misses += 1
+        inc("lecture_cache_lookups_total", result="miss")
+        entry = CachedLecture(dumps_compact(loads(raw)))
+        self._put(lecture_id, entry)
+        return entry
+
+    def _put(self, lecture_id: str, entry: CachedLecture):
+        with self._lock:
+            self._cache[lecture_id] = entry
+            self._cache.move_to_end(lecture_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses,
+                "orjson": HAS_ORJSON, "brotli": HAS_BROTLI}
+
+
+lecture_store = LectureStore()
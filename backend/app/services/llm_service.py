@@ -4,6 +4,9 @@ import ast
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from app.core.metrics import timed, inc
+from app.core.admission import limited
+
 # Optional OpenAI Import
 try:
     from openai import OpenAI
@@ -13,6 +16,9 @@ except ImportError:
     print("⚠️ OpenAI library not found. OpenAI fallback disabled.")
 
 class LLMService:
+    # Tried in order by _generate_gemini_robust (based on check_models.py output)
+    GEMINI_MODELS = ['gemini-2.5-flash', 'gemini-2.0-flash', 'gemini-flash-latest']
+
     def __init__(self):
         # --- HARDCODE SECTION ---
         # Paste your key inside the quotes below to bypass .env issues
@@ -26,6 +32,10 @@ class LLMService:
         # 2. Load Keys (Prioritize Hardcoded if set)
         self.gemini_api_key = self.HARDCODED_GEMINI_KEY or os.getenv("GEMINI_API_KEY")
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        # Alternate endpoints (OpenAI-compatible servers, local stand-ins for load tests)
+        self.openai_base_url = os.getenv("OPENAI_BASE_URL") or None
+        self.openai_model = os.getenv("OPENAI_MODEL", "gpt-4o")
+        self.gemini_endpoint = os.getenv("GEMINI_API_ENDPOINT") or None
 
         # --- DEBUGGING BLOCK ---
         print("--- KEY DIAGNOSTICS ---")
@@ -47,9 +57,9 @@ class LLMService:
         # 1. Initialize OpenAI (Primary for now if key exists, or Fallback)
         if HAS_OPENAI_LIB and self.openai_api_key:
             try:
-                self.openai_client = OpenAI(api_key=self.openai_api_key)
+                self.openai_client = OpenAI(api_key=self.openai_api_key, base_url=self.openai_base_url)
                 self.providers.append("openai")
-                print("✅ OpenAI LLM Initialized.")
+                print(f"✅ OpenAI LLM Initialized{f' ({self.openai_base_url})' if self.openai_base_url else ''}.")
             except Exception as e:
                 print(f"❌ Failed to configure OpenAI: {e}")
         else:
@@ -58,7 +68,13 @@ class LLMService:
         # 2. Smart Gemini Initialization (Try latest, fallback to older)
         if self.gemini_api_key:
             try:
-                genai.configure(api_key=self.gemini_api_key)
+                if self.gemini_endpoint:
+                    # REST transport honours http:// endpoints (e.g. loadtest/stub_providers.py)
+                    genai.configure(api_key=self.gemini_api_key, transport="rest",
+                                    client_options={"api_endpoint": self.gemini_endpoint})
+                    print(f"✅ Gemini endpoint: {self.gemini_endpoint}")
+                else:
+                    genai.configure(api_key=self.gemini_api_key)
                 # List of models to try in order of preference
                 candidate_models = ['gemini-pro', 'gemini-1.5-flash', 'gemini-1.0-pro']
                 self.gemini_model = None # Placeholder
@@ -76,6 +92,17 @@ class LLMService:
         if not self.providers:
             print("❌ CRITICAL: No LLM providers available.")
 
+    @property
+    def model_signature(self) -> str:
+        """
+        The provider/model fallback chain actually tried, e.g.
+        "openai:gpt-4o,gemini:gemini-2.5-flash/gemini-2.0-flash/gemini-flash-latest".
+        """
+        models = {"openai": self.openai_model, "gemini": "/".join(self.GEMINI_MODELS)}
+        return ",".join(f"{p}:{models[p]}" for p in self.providers) or "none"
+
+    @limited("llm")
+    @timed("llm.generate")
     def generate_lecture_content(self, system_prompt: str, user_context: str) -> dict:
         """
         Generates lecture content trying providers in sequence (OpenAI -> Gemini).
@@ -107,10 +134,15 @@ class LLMService:
             print(f"🔄 Generating with {provider.upper()}...")
             try:
                 if provider == "gemini":
-                    return self._generate_gemini_robust(full_prompt)
+                    result = self._generate_gemini_robust(full_prompt)
                 elif provider == "openai":
-                    return self._generate_openai(full_prompt)
+                    result = self._generate_openai(full_prompt)
+                else:
+                    continue
+                inc("llm_requests_total", provider=provider, outcome="ok", fallback=str(bool(errors)).lower())
+                return result
             except Exception as e:
+                inc("llm_requests_total", provider=provider, outcome="error", fallback=str(bool(errors)).lower())
                 error_msg = f"{provider} failed: {e}"
                 print(f"❌ {error_msg}")
                 errors.append(error_msg)
@@ -124,15 +156,9 @@ class LLMService:
         """
         Tries multiple Gemini models in sequence to handle 404/Deprecation errors.
         """
-        # PRIORITIZE AVAILABLE MODELS (Based on check_models.py output)
-        candidate_models = [
-            'gemini-2.5-flash', 
-            'gemini-2.0-flash',
-            'gemini-flash-latest' # Fallback alias
-        ]
         last_error = None
         
-        for model_name in candidate_models:
+        for model_name in self.GEMINI_MODELS:
             try:
                 # print(f"   👉 Trying Gemini Model: {model_name}...")
                 model = genai.GenerativeModel(model_name)
@@ -153,7 +179,7 @@ class LLMService:
     def _generate_openai(self, prompt: str) -> dict:
         # Simplified Client usage
         response = self.openai_client.chat.completions.create(
-            model="gpt-4o", # Or gpt-3.5-turbo depending on budget/availability
+            model=self.openai_model, # gpt-4o by default; OPENAI_MODEL for gpt-3.5-turbo etc.
             messages=[
                 {"role": "system", "content": "You are a helpful AI teacher helper. output JSON only."},
                 {"role": "user", "content": prompt}
@@ -1,11 +1,63 @@
 import re
-import asyncio
+import json
 import os
 import concurrent.futures
 import subprocess
 from typing import List, Dict
 
+from app.services.scene_scheduler import SceneScheduler
+from app.services.render_manifest import RenderManifest, content_key
+from app.services.asset_service import asset_service
+from app.core.metrics import timed, trace
+from app.core.admission import limited
+
+# Segments that share an encode profile are encoded with identical stream parameters,
+# so the final lecture can be joined with the concat demuxer and stream copy.
+#  - "standard": 25 fps, libx264 defaults (avatar / moving content)
+#  - "still": static slide + audio; low frame rate, long GOP, fast preset, stillimage tune
+SEGMENT_COMMON_VIDEO_ARGS = ["-c:v", "libx264", "-profile:v", "high", "-pix_fmt", "yuv420p",
+                             "-video_track_timescale", "12800"]
+SEGMENT_FRAME_FILTER = "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1"
+STANDARD_FPS = 25
+
+
+def segment_video_args(profile: str, still_fps: int = 5) -> List[str]:
+    if profile == "still":
+        return SEGMENT_COMMON_VIDEO_ARGS + [
+            "-r", str(still_fps),
+            "-preset", "veryfast", "-tune", "stillimage",
+            # One keyframe every ~10s: identical frames compress to almost nothing
+            "-g", str(still_fps * 10), "-keyint_min", str(still_fps * 10), "-sc_threshold", "0",
+        ]
+    return SEGMENT_COMMON_VIDEO_ARGS + ["-r", str(STANDARD_FPS)]
+
+
+def segment_audio_args(mode: str) -> List[str]:
+    if mode == "copy":
+        return ["-c:a", "copy"]
+    return ["-c:a", "aac", "-b:a", "64k", "-ar", "44100", "-ac", "1"]
+
+
 class OrchestratorService:
+    def __init__(self):
+        # "thread": render slides on the pipeline thread pool; "process": rasterize
+        # them in SlideService's process pool (Pillow holds the GIL).
+        self.slide_render_mode = os.getenv("SLIDE_RENDER_MODE", "thread")
+
+        # Encode profile for static (no-avatar) segments and audio handling ("aac" | "copy")
+        self.still_profile = os.getenv("SEGMENT_STILL_PROFILE", "still")
+        self.still_fps = int(os.getenv("SEGMENT_STILL_FPS", "5"))
+        self.audio_mode = os.getenv("SEGMENT_AUDIO_MODE", "aac")
+
+        # Concurrency slots per resource class for the scene DAG
+        cpus = os.cpu_count() or 1
+        self.resource_limits = {
+            "cpu": int(os.getenv("PIPELINE_CPU_SLOTS", str(cpus))),
+            "tts": int(os.getenv("PIPELINE_TTS_SLOTS", "4")),
+            "avatar": int(os.getenv("PIPELINE_AVATAR_SLOTS", "1")),
+            "encode": int(os.getenv("PIPELINE_ENCODE_SLOTS", str(max(1, cpus // 2)))),
+        }
+
     def parse_llm_output(self, llm_data: dict) -> List[Dict]:
         """
         Parses JSON output from LLM Service.
@@ -48,89 +100,194 @@ class OrchestratorService:
             print(f"Error parsing LLM JSON: {e}")
             return []
 
-    async def execute_pipeline(self, 
+    async def execute_pipeline(self, llm_data: dict, slide_service, tts_service, avatar_service,
+                               lecture_key: str = None) -> Dict:
+        """See `_execute_pipeline`; runs it inside a per-lecture metrics trace."""
+        trace_id = f"render_{re.sub(r'[^A-Za-z0-9_.-]', '_', lecture_key or llm_data.get('lecture_title', 'lecture'))}"
+        with trace(trace_id, kind="render"):
+            return await self._execute_pipeline(llm_data, slide_service, tts_service, avatar_service, lecture_key)
+
+    async def _execute_pipeline(self, 
                                llm_data: dict, 
                                slide_service, 
                                tts_service, 
-                               avatar_service) -> Dict:
-        
+                               avatar_service,
+                               lecture_key: str = None) -> Dict:
+        """
+        Renders every scene and assembles the lecture video.
+
+        Stage outputs are content-addressed by the hash of their inputs and tracked in a
+        per-lecture manifest, so re-running after an edit only rebuilds the stages whose
+        inputs changed. Pass a stable `lecture_key` (e.g. the lecture id) to get that across
+        edits; the default is the title plus a hash of the content, which only matches an
+        identical lecture but never collides with a different lecture of the same title.
+        """
         scenes = self.parse_llm_output(llm_data)
         
         # Extract title from JSON
         lecture_title = llm_data.get("lecture_title", "AI_Guruji_Lecture").replace(" ", "_")
+        manifest = RenderManifest(lecture_key or f"{lecture_title}_{content_key('lecture', llm_data)[:12]}")
+        outputs_dir = os.path.join(os.getcwd(), "data", "outputs")
+        segments_dir = os.path.join(outputs_dir, "segments")
+        os.makedirs(segments_dir, exist_ok=True)
+        encode_settings = (self.still_profile, self.still_fps, self.audio_mode)
 
-        # 1. Generate PPTX (For Download)
-        print("Step 1: Generating PPTX...")
-        pptx_path = ""
-        try:
-             pptx_path = slide_service.generate_presentation(lecture_title, scenes)
-        except Exception as e:
-             print(f"PPTX Generation failed: {e}")
+        print(f"Scheduling {len(scenes)} scenes (DAG, limits: {self.resource_limits})...")
+        scheduler = SceneScheduler(self.resource_limits)
+        results = {}
+        theme = slide_service.renderer.theme_name
 
-        # 2. Process Scenes
-        print("Step 2: Processing Scenes (Audio/Video)...")
-        loop = asyncio.get_running_loop()
-        final_segments = []
-        
-        with concurrent.futures.ThreadPoolExecutor() as pool:
-            for scene in scenes:
-                print(f"Processing Scene {scene['scene_id']}...")
-                
-                # A. Generate Slide Image
-                slide_img = await loop.run_in_executor(pool, slide_service.generate_slide_image, scene, scene['scene_id'])
-                
-                # B. Generate TTS
-                audio_filename = f"scene_{scene['scene_id']}.wav"
-                try:
-                    audio_path, duration = await loop.run_in_executor(
-                        pool, tts_service.generate_audio, scene["script"], audio_filename
-                    )
-                except Exception as e:
-                    import traceback
-                    traceback.print_exc()
-                    print(f"Skipping Scene {scene['scene_id']} due to TTS error: {e}")
-                    continue
+        # 1. PPTX (For Download) - independent of every scene
+        pptx_key = content_key("pptx", lecture_title, scenes)
+        cached = manifest.lookup("lecture", "pptx", pptx_key)
+        if cached:
+            results["pptx"] = cached["path"]
+        else:
+            def build_pptx(results):
+                path = slide_service.generate_presentation(lecture_title, scenes, filename=f"{lecture_title}_{pptx_key}.pptx")
+                if path:
+                    manifest.record("lecture", "pptx", pptx_key, path)
+                return path
+            scheduler.add("pptx", "pptx", "cpu", build_pptx, allow_failure=True)
+
+        # 2. Per-scene chain: image + tts -> avatar (needs tts) -> composite (needs all three)
+        for scene in scenes:
+            sid = scene['scene_id']
+            scope = f"scene_{sid}"
+            # Content only (no scene id): a scene shifted by an inserted or deleted slide keeps its outputs
+            image_key = content_key("image", theme, scene["heading"], scene["summary"],
+                                    scene["important_points"], scene["code"])
+            tts_key = content_key("tts", scene["script"], getattr(tts_service, "voice", None))
+            avatar_key = content_key("avatar", tts_key)
+            segment_key = content_key("segment", image_key, tts_key, avatar_key, encode_settings)
 
-                # C. Generate Avatar (Eunoic)
-                avatar_video = None
+            # Unchanged scene: reuse the finished segment and schedule nothing
+            cached = manifest.lookup(scope, "segment", segment_key)
+            if cached:
+                results[f"segment_{sid}"] = (cached["path"], cached["profile"])
+                continue
+
+            def render_image(results, scene=scene, image_key=image_key, scope=scope):
+                filename = f"slide_{image_key}.png"
+                if self.slide_render_mode == "process":
+                    path = slide_service.render_slides_parallel([scene], filenames=[filename])[0]
+                else:
+                    path = slide_service.generate_slide_image(scene, scene['scene_id'], filename=filename)
+                if path:
+                    manifest.record(scope, "image", image_key, path)
+                return path
+
+            def synthesize(results, scene=scene, tts_key=tts_key, scope=scope):
+                path, duration, provider = tts_service.synthesize(scene["script"], f"tts_{tts_key}.mp3")
+                # Never cache the silent failsafe; retry real providers next run
+                if provider != "silent":
+                    manifest.record(scope, "tts", tts_key, path, duration=duration, provider=provider)
+                return path, duration
+
+            def make_avatar(results, sid=sid, avatar_key=avatar_key, scope=scope):
+                audio_path, _ = results[f"tts_{sid}"]
+                path = avatar_service.generate_avatar_video(audio_path)
+                if path:
+                    manifest.record(scope, "avatar", avatar_key, path)
+                return path
+
+            def composite(results, sid=sid, segment_key=segment_key, scope=scope):
+                audio_path, _ = results[f"tts_{sid}"]
+                output_segment = os.path.join(segments_dir, f"segment_{segment_key}.mp4")
+                profile = self._composite_scene(results[f"image_{sid}"], results[f"avatar_{sid}"], audio_path, output_segment)
+                if not profile or not os.path.exists(output_segment):
+                    return None
+                if self._scene_cacheable(manifest, scheduler, scope, results, sid):
+                    manifest.record(scope, "segment", segment_key, output_segment, profile=profile)
+                return output_segment, profile
+
+            image = manifest.lookup(scope, "image", image_key)
+            if image:
+                results[f"image_{sid}"] = image["path"]
+            else:
+                scheduler.add(f"image_{sid}", "render", "cpu", render_image)
+
+            tts = manifest.lookup(scope, "tts", tts_key)
+            if tts:
+                results[f"tts_{sid}"] = (tts["path"], tts["duration"])
+            else:
+                scheduler.add(f"tts_{sid}", "tts", "tts", synthesize)
+
+            avatar = manifest.lookup(scope, "avatar", avatar_key)
+            if avatar:
+                results[f"avatar_{sid}"] = avatar["path"]
+            else:
+                # Avatar is optional: on failure the scene continues as Audio + Slide only
+                scheduler.add(f"avatar_{sid}", "avatar", "avatar", make_avatar,
+                              deps=[f"tts_{sid}"] if not tts else [], allow_failure=True)
+
+            scheduler.add(f"segment_{sid}", "encode", "encode", composite,
+                          deps=[d for d in (f"image_{sid}", f"tts_{sid}", f"avatar_{sid}") if d in scheduler.tasks])
+
+        print(f"Render cache: {manifest.hits} hits, {len(scheduler.tasks)} task(s) to run.")
+        manifest.retain({"lecture"} | {f"scene_{s['scene_id']}" for s in scenes})
+        scheduler.results.update(results)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=sum(self.resource_limits.values())) as pool:
+            scheduler.executor = pool
+            results = await scheduler.run()
+
+        pptx_path = results.get("pptx") or ""
+        final_segments = [results[f"segment_{s['scene_id']}"][0] for s in scenes if results.get(f"segment_{s['scene_id']}")]
+        timings = scheduler.report()
+        print(f"Pipeline finished in {timings['wall_s']}s; critical path by stage: {timings['critical_path_by_stage']}")
+
+        # 3. Concatenate (concat demuxer + stream copy)
+        print("Step 3: Assembling Final Video...")
+        video_path, chapters = None, []
+        if final_segments:
+            titles = {s['scene_id']: s['heading'] for s in scenes}
+            ordered = [(sid, titles[sid], *results[f"segment_{sid}"])
+                       for sid in titles if results.get(f"segment_{sid}")]
+            videos_dir = os.path.join(outputs_dir, "videos")
+            os.makedirs(videos_dir, exist_ok=True)
+            video_key = content_key("video", llm_data.get("lecture_title"), [(sid, title, path) for sid, title, path, _ in ordered])
+            cached = manifest.lookup("lecture", "video", video_key)
+            if cached:
+                video_path, chapters = cached["path"], cached["chapters"]
+            else:
+                video_path = os.path.join(videos_dir, f"{lecture_title}_{video_key}.mp4")
                 try:
-                    avatar_video = await loop.run_in_executor(
-                        pool, avatar_service.generate_avatar_video, audio_path
-                    )
+                    chapters = self._assemble_lecture(ordered, video_path, llm_data.get("lecture_title", lecture_title))
+                    manifest.record("lecture", "video", video_key, video_path, chapters=chapters)
                 except Exception as e:
-                    import traceback
-                    print(f"Avatar error for Scene {scene['scene_id']} (Safe to ignore if intentional): {e}")
-                    # Continue without avatar (Audio + Slide only)
+                    print(f"Final assembly failed: {e}. Returning segments only.")
+                    video_path = None
 
-                # D. Composite Scene
-                output_segment = os.path.join(os.getcwd(), "data", "outputs", "segments", f"segment_{scene['scene_id']}.mp4")
-                os.makedirs(os.path.dirname(output_segment), exist_ok=True)
-                
-                self._composite_scene(slide_img, avatar_video, audio_path, output_segment)
-                if os.path.exists(output_segment):
-                    final_segments.append(output_segment)
-        
-        # 3. Concatenate
-        print("Step 3: Assembling Final Video...")
-        # ... logic to concat segments using ffmpeg ...
-        # For now return segment URLs so frontend can play them sequentially or we concat later
-        
-        segment_urls = []
-        for path in final_segments:
-            # path is d:\...\data\outputs\segments\seg.mp4
-            # rel path from data/outputs: segments\seg.mp4
-            filename = os.path.basename(path)
-            segment_urls.append(f"/files/segments/{filename}")
+        # Content-hashed URLs (/files/a/<digest>/...) so clients can cache media indefinitely
+        segment_urls = [asset_service.url_for(path) for path in final_segments]
 
         return {
-            "pptx_url": f"/files/slides/{os.path.basename(pptx_path)}" if pptx_path else None,
+            "pptx_url": asset_service.url_for(pptx_path) if pptx_path else None,
             "scene_count": len(scenes),
-            "segments": segment_urls
+            "segments": segment_urls,
+            "video_url": asset_service.url_for(video_path) if video_path else None,
+            "chapters": chapters,
+            "timings": timings
         }
 
+    def _scene_cacheable(self, manifest: RenderManifest, scheduler: SceneScheduler, scope: str, results: dict, sid) -> bool:
+        """
+        A segment is only cached if its inputs were: no silent TTS, no failed image, and no
+        avatar error (an avatar that is simply unavailable is a stable result).
+        """
+        entries = manifest.entries.get(scope, {})
+        tts_path = results.get(f"tts_{sid}", (None,))[0]
+        avatar_task = scheduler.tasks.get(f"avatar_{sid}")
+        return (entries.get("image", {}).get("path") == results.get(f"image_{sid}")
+                and entries.get("tts", {}).get("path") == tts_path
+                and not (avatar_task and avatar_task.status == "failed"))
+
+    @limited("encode")
+    @timed("ffmpeg.composite")
     def _composite_scene(self, slide_img, avatar_video, audio_path, output_path):
         """
         Uses ffmpeg to composite Slide (Left) + Avatar (Right).
+        Returns the encode profile key of the written segment, or None on failure.
         """
         try:
             if avatar_video and os.path.exists(avatar_video):
@@ -162,28 +319,127 @@ class OrchestratorService:
                     "[bg2][avatar]overlay=1420:(H-h)/2[v]",
                     "-map", "[v]",
                     "-map", "1:a", # Use avatar's audio
-                    "-c:v", "libx264",
-                    "-c:a", "aac",
+                    *segment_video_args("standard"),
+                    *segment_audio_args("aac"),
                     "-shortest", # End when audio ends
                     output_path
                 ]
+                profile = "standard/aac"
             else:
                 # Static Image + Audio (No Avatar)
+                fps = self.still_fps if self.still_profile == "still" else STANDARD_FPS
                 cmd = [
                     "ffmpeg", "-y",
-                    "-loop", "1",
+                    "-loop", "1", "-framerate", str(fps),
                     "-i", slide_img,
                     "-i", audio_path,
-                    "-c:v", "libx264",
-                    "-c:a", "aac",
-                    "-tune", "stillimage",
+                    "-vf", SEGMENT_FRAME_FILTER,
+                    *segment_video_args(self.still_profile, self.still_fps),
+                    *segment_audio_args(self.audio_mode),
                     "-shortest",
                     output_path
                 ]
+                profile = f"{self.still_profile}/{self.audio_mode}"
             
             subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            return profile
             
         except Exception as e:
             print(f"Composition failed: {e}")
+            return None
+
+    @limited("encode")
+    @timed("ffmpeg.assemble")
+    def _assemble_lecture(self, segments: List[tuple], output_path: str, title: str) -> List[Dict]:
+        """
+        Joins normalized segments into one MP4 with the concat demuxer and stream copy.
+        `segments` is [(scene_id, heading, path, profile)] in playback order. Writes chapter
+        markers into the MP4 and an offset table to `<video>.chapters.json`; returns the table.
+
+        Video is stream-copied when all segments share an encode profile (otherwise it is
+        re-encoded to the standard profile); copied MP3 audio is always re-encoded to AAC
+        since TTS providers differ in sample rate.
+        """
+        chapters = []
+        offset = 0.0
+        for scene_id, heading, path, _ in segments:
+            duration = self._probe_duration(path)
+            chapters.append({
+                "scene_id": scene_id,
+                "title": heading,
+                "start": round(offset, 3),
+                "end": round(offset + duration, 3),
+                "segment": os.path.basename(path),
+            })
+            offset += duration
+
+        base = output_path.rsplit(".", 1)[0]
+        list_path = base + ".concat.txt"
+        meta_path = base + ".ffmeta.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for _, _, path, _ in segments:
+                escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        with open(meta_path, "w", encoding="utf-8") as f:
+            f.write(";FFMETADATA1\n")
+            f.write(f"title={self._ffmeta_escape(title)}\n")
+            for ch in chapters:
+                f.write("\n[CHAPTER]\nTIMEBASE=1/1000\n")
+                f.write(f"START={int(ch['start'] * 1000)}\nEND={int(ch['end'] * 1000)}\n")
+                f.write(f"title={self._ffmeta_escape(ch['title'])}\n")
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", meta_path,
+            "-map", "0", "-map_metadata", "1", "-map_chapters", "1",
+            *self._concat_codec_args([profile for *_, profile in segments]),
+            "-movflags", "+faststart",
+            output_path
+        ]
+        try:
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        finally:
+            for tmp in (list_path, meta_path):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+        with open(base + ".chapters.json", "w", encoding="utf-8") as f:
+            json.dump({"video": os.path.basename(output_path), "duration": round(offset, 3), "chapters": chapters}, f, indent=2)
+        print(f"✅ Lecture video assembled ({len(chapters)} segments, {offset:.1f}s): {output_path}")
+        return chapters
+
+    def _concat_codec_args(self, profiles: List[str]) -> List[str]:
+        video_profiles = {p.split("/")[0] for p in profiles}
+        audio_modes = {p.split("/")[1] for p in profiles}
+        if len(video_profiles) == 1:
+            video = ["-c:v", "copy"]
+        else:
+            print(f"⚠️ Mixed segment profiles {sorted(video_profiles)}: re-encoding video during assembly.")
+            video = segment_video_args("standard")
+        audio = ["-c:a", "copy"] if audio_modes == {"aac"} else segment_audio_args("aac")
+        return video + audio
+
+    def _probe_duration(self, path: str) -> float:
+        """Container duration in seconds via ffprobe (falls back to parsing `ffmpeg -i`)."""
+        try:
+            out = subprocess.run(
+                ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+            return float(out)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            info = subprocess.run(["ffmpeg", "-i", path], capture_output=True, text=True).stderr
+            match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", info)
+            if not match:
+                raise RuntimeError(f"Could not determine duration of {path}")
+            h, m, sec = match.groups()
+            return int(h) * 3600 + int(m) * 60 + float(sec)
+
+    @staticmethod
+    def _ffmeta_escape(value: str) -> str:
+        for ch in ("\\", "=", ";", "#", "\n"):
+            value = value.replace(ch, "\\" + ch)
+        return value
 
 orchestrator_service = OrchestratorService()
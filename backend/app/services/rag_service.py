@@ -1,27 +1,45 @@
 import os
+import time
+import threading
 import fitz  # PyMuPDF
 import faiss
 import numpy as np
 from typing import List
-from sentence_transformers import SentenceTransformer
+
+from app.services.index_store import IndexSnapshotStore
+from app.services.embedding_service import create_embedder
+from app.core.metrics import timed
 
 class RagService:
     def __init__(self):
         self.embedding_model_name = 'all-MiniLM-L6-v2'
         try:
             print(f"Loading Sentence Transformer model: {self.embedding_model_name}...")
-            self.model = SentenceTransformer(self.embedding_model_name)
+            # Batches concurrent encode calls (in-process, or via the shared embedding server)
+            self.model = create_embedder(self.embedding_model_name)
             self.dimension = self.model.get_sentence_embedding_dimension()
-            print(f"✅ RAG Service initialized with {self.embedding_model_name} (Dim: {self.dimension})")
+            print(f"✅ RAG Service initialized with {self.model.name} (Dim: {self.dimension})")
         except Exception as e:
             print(f"❌ Failed to load Sentence Transformer: {e}")
             raise e
 
         self.index = faiss.IndexFlatL2(self.dimension)
         self.chunks = [] 
+        self.document_id = None # document the in-memory index was built from
         self.storage_dir = os.path.join(os.getcwd(), "data", "vector_store")
         os.makedirs(self.storage_dir, exist_ok=True)
 
+        # "memory": this process's FAISS index (single worker).
+        # "shared": searches read the current on-disk snapshot (memory-mapped, shared by
+        # all uvicorn workers); only the ingest owner builds and publishes new versions.
+        self.mode = os.getenv("RAG_INDEX_MODE", "memory").lower()
+        self.store = IndexSnapshotStore(self.storage_dir)
+        self.refresh_interval = float(os.getenv("RAG_INDEX_REFRESH_SECONDS", "1"))
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._swap_lock = threading.Lock()
+
+    @timed("rag.extract")
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """Extracts full text from a PDF file."""
         try:
@@ -43,6 +61,7 @@ class RagService:
             chunks.append(chunk)
         return chunks
 
+    @timed("rag.embed_index")
     def add_to_index(self, chunks: List[str]):
         """Embeds chunks and adds them to the FAISS index."""
         if not chunks:
@@ -56,8 +75,12 @@ class RagService:
         except Exception as e:
             print(f"Error adding to index: {e}")
 
+    @timed("rag.search")
     def search(self, query: str, k: int = 5) -> List[str]:
         """Searches the index for the most relevant chunks."""
+        if self.mode == "shared":
+            return self._search_snapshot(query, k)
+
         if self.index.ntotal == 0:
             return []
         
@@ -74,13 +97,75 @@ class RagService:
             print(f"Error during search: {e}")
             return []
 
+    def _search_snapshot(self, query: str, k: int) -> List[str]:
+        snapshot = self.current_snapshot()
+        if snapshot is None or not snapshot.chunks:
+            return []
+        try:
+            query_vector = np.asarray(self.model.encode([query]), dtype=np.float32)[0]
+            return [snapshot.chunks[i] for i in snapshot.search(query_vector, k)]
+        except Exception as e:
+            print(f"Error during search: {e}")
+            return []
+
+    def current_snapshot(self):
+        """The newest published snapshot; re-checks CURRENT at most every refresh_interval."""
+        now = time.monotonic()
+        if self._snapshot is None or now - self._checked_at >= self.refresh_interval:
+            with self._swap_lock:
+                self._checked_at = now
+                version = self.store.current_version()
+                if version and (self._snapshot is None or self._snapshot.version != version):
+                    snapshot = self.store.load(version)
+                    if snapshot is not None:
+                        # Hot swap: in-flight searches keep the snapshot they started with
+                        self._snapshot = snapshot
+                        print(f"🔄 RAG index v{version} loaded ({len(snapshot.chunks)} chunks).")
+        return self._snapshot
+
+    def active_document_id(self):
+        """Id of the document searches currently run against (None if unknown)."""
+        if self.mode == "shared":
+            snapshot = self.current_snapshot()
+            return snapshot.meta.get("document_id") if snapshot else None
+        return self.document_id
+
+    @property
+    def size(self) -> int:
+        """Number of searchable chunks."""
+        if self.mode == "shared":
+            snapshot = self.current_snapshot()
+            return len(snapshot.chunks) if snapshot else 0
+        return self.index.ntotal
+
     def clear_index(self):
         """Reset the index and chunks."""
         self.index = faiss.IndexFlatL2(self.dimension)
         self.chunks = []
+        self.document_id = None
         
     def save_index(self):
-        """Saves current index to disk (Mock implementation for now)."""
-        print(f"✅ Index saved with {len(self.chunks)} chunks.")
+        """Publishes the current index as a new on-disk snapshot version (ingest owner only)."""
+        if not self.store.try_acquire_owner():
+            print("⚠️ Not the ingest owner; index not saved.")
+            return
+        embeddings = self.index.reconstruct_n(0, self.index.ntotal) if self.index.ntotal else None
+        version = self.store.publish(embeddings, list(self.chunks),
+                                     {"model": self.embedding_model_name, "dim": self.dimension,
+                                      "document_id": self.document_id})
+        print(f"✅ Index saved with {len(self.chunks)} chunks (v{version}).")
+
+    def load_latest(self) -> bool:
+        """Restores this process's FAISS index from the newest snapshot (memory mode restart)."""
+        snapshot = self.store.load()
+        if snapshot is None:
+            return False
+        self.index = faiss.IndexFlatL2(self.dimension)
+        if snapshot.chunks:
+            self.index.add(np.array(snapshot.embeddings, dtype=np.float32))
+        self.chunks = list(snapshot.chunks)
+        self.document_id = snapshot.meta.get("document_id")
+        print(f"✅ RAG index restored from v{snapshot.version} ({len(self.chunks)} chunks).")
+        return True
 
 rag_service = RagService()
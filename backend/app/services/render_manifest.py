@@ -0,0 +1,89 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Optional
+
+from app.core.metrics import inc
+
+# Bump to invalidate every cached stage output (e.g. after changing how a stage renders).
+RENDER_VERSION = "1"
+
+
+def content_key(stage: str, *inputs) -> str:
+    """Stable hash of a stage's inputs; used as the output's file name."""
+    payload = json.dumps([stage, RENDER_VERSION, inputs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class RenderManifest:
+    """
+    Per-lecture record of content-addressed stage outputs.
+
+    Layout: {scope: {stage: {"key": ..., "path": ..., **extra}}}, where scope is
+    "lecture" or "scene_<id>". An entry is reusable only if its key matches the
+    key of the current inputs and the output file still exists. Keys hash
+    content only, so lookups fall back to every other scope: a scene that moved
+    to another slot (a slide inserted or deleted before it) reuses its outputs.
+    """
+
+    def __init__(self, lecture_key: str, manifests_dir: str = None):
+        self.manifests_dir = manifests_dir or os.path.join(os.getcwd(), "data", "manifests")
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        safe_key = re.sub(r"[^A-Za-z0-9_.-]", "_", lecture_key)
+        self.path = os.path.join(self.manifests_dir, f"{safe_key}.json")
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable render manifest {self.path}: {e}")
+
+    def lookup(self, scope: str, stage: str, key: str) -> Optional[dict]:
+        """Entry for `stage` with `key`, from `scope` or else any scope (then recorded under `scope` too)."""
+        with self._lock:
+            scopes = [scope] + [s for s in self.entries if s != scope]
+        for found_in in scopes:
+            entry = self.entries.get(found_in, {}).get(stage)
+            if not (entry and entry.get("key") == key and entry.get("path")):
+                continue
+            if os.path.exists(entry["path"]):
+                self.hits += 1
+                inc("render_cache_lookups_total", stage=stage, result="hit")
+                if found_in != scope:
+                    self.record(scope, stage, **entry)
+                return entry
+            # Output deleted (eviction, manual cleanup): forget it so whatever is written
+            # to that path next is never trusted without being recorded again
+            with self._lock:
+                if self.entries.get(found_in, {}).get(stage) is entry:
+                    del self.entries[found_in][stage]
+                    self._save()
+        self.misses += 1
+        inc("render_cache_lookups_total", stage=stage, result="miss")
+        return None
+
+    def record(self, scope: str, stage: str, key: str, path: str, **extra):
+        with self._lock:
+            self.entries.setdefault(scope, {})[stage] = {"key": key, "path": path, **extra}
+            self._save()
+
+    def retain(self, scopes: set):
+        """Drops every scope not in `scopes` (e.g. slots of scenes that no longer exist)."""
+        with self._lock:
+            stale = [scope for scope in self.entries if scope not in scopes]
+            for scope in stale:
+                del self.entries[scope]
+            if stale:
+                self._save()
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp, self.path)
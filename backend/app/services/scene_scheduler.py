@@ -0,0 +1,146 @@
+import asyncio
+import time
+import contextvars
+import concurrent.futures
+from typing import Callable, Dict, Iterable, Optional
+
+
+class SceneTask:
+    """A node in the pipeline DAG: a blocking function bound to a resource class."""
+
+    def __init__(self, name: str, stage: str, resource: str, fn: Callable[[dict], object],
+                 deps: Iterable[str] = (), allow_failure: bool = False):
+        self.name = name
+        self.stage = stage
+        self.resource = resource
+        self.fn = fn
+        self.deps = list(deps)
+        self.allow_failure = allow_failure
+
+        self.status = "pending"  # pending -> running -> done | failed | skipped
+        self.error: Optional[BaseException] = None
+        self.ready_at = None
+        self.started_at = None
+        self.finished_at = None
+
+
+class SceneScheduler:
+    """
+    Dependency-graph scheduler for per-scene pipeline work.
+
+    Every task starts as soon as its dependencies have finished and a slot for its
+    resource class (e.g. "cpu", "tts", "avatar", "encode") is free, so independent
+    work from different scenes overlaps instead of running scene by scene.
+
+    A task receives the dict of results so far. If it fails, its dependents are
+    skipped, unless it was added with `allow_failure=True`, in which case its
+    result is None and dependents still run.
+    """
+
+    def __init__(self, limits: Dict[str, int], executor: concurrent.futures.Executor = None):
+        self.limits = dict(limits)
+        self.executor = executor
+        self.tasks: Dict[str, SceneTask] = {}
+        self.results: Dict[str, object] = {}
+        self._semaphores = {}
+        self._events = {}
+        self._started_at = None
+        self._finished_at = None
+
+    def add(self, name: str, stage: str, resource: str, fn: Callable[[dict], object],
+            deps: Iterable[str] = (), allow_failure: bool = False) -> SceneTask:
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task name: {name}")
+        task = SceneTask(name, stage, resource, fn, deps, allow_failure)
+        self.tasks[name] = task
+        return task
+
+    async def run(self) -> Dict[str, object]:
+        for task in self.tasks.values():
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task '{task.name}' depends on unknown task '{dep}'")
+
+        self._semaphores = {
+            resource: asyncio.Semaphore(max(1, self.limits.get(resource, 1)))
+            for resource in {t.resource for t in self.tasks.values()}
+        }
+        self._events = {name: asyncio.Event() for name in self.tasks}
+        self._started_at = time.perf_counter()
+        await asyncio.gather(*(self._run_task(task) for task in self.tasks.values()))
+        self._finished_at = time.perf_counter()
+        return self.results
+
+    async def _run_task(self, task: SceneTask):
+        try:
+            for dep in task.deps:
+                await self._events[dep].wait()
+
+            blocked_by = [d for d in task.deps
+                          if self.tasks[d].status in ("failed", "skipped") and not self.tasks[d].allow_failure]
+            if blocked_by:
+                task.status = "skipped"
+                task.error = RuntimeError(f"Upstream task(s) failed: {', '.join(blocked_by)}")
+                return
+
+            task.ready_at = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            async with self._semaphores[task.resource]:
+                task.status = "running"
+                task.started_at = time.perf_counter()
+                try:
+                    # Copy the context so metrics spans inside the task join the caller's trace
+                    ctx = contextvars.copy_context()
+                    self.results[task.name] = await loop.run_in_executor(self.executor, ctx.run, task.fn, self.results)
+                    task.status = "done"
+                except Exception as e:
+                    task.status = "failed"
+                    task.error = e
+                    self.results[task.name] = None
+                    print(f"⚠️ Task '{task.name}' failed: {e}")
+                finally:
+                    task.finished_at = time.perf_counter()
+        finally:
+            self._events[task.name].set()
+
+    def critical_path(self) -> list:
+        """Chain of executed tasks ending at the last finisher, following the latest-finishing dependency."""
+        finished = [t for t in self.tasks.values() if t.finished_at is not None]
+        if not finished:
+            return []
+        path = []
+        task = max(finished, key=lambda t: t.finished_at)
+        while task is not None:
+            path.append(task)
+            deps = [self.tasks[d] for d in task.deps if self.tasks[d].finished_at is not None]
+            task = max(deps, key=lambda t: t.finished_at) if deps else None
+        return list(reversed(path))
+
+    def report(self) -> dict:
+        """Wall time, critical-path breakdown per stage, and total busy time per stage."""
+        wall = (self._finished_at or time.perf_counter()) - (self._started_at or time.perf_counter())
+        path = self.critical_path()
+
+        by_stage = {}
+        steps = []
+        for task in path:
+            wait = task.started_at - task.ready_at
+            run = task.finished_at - task.started_at
+            stage = by_stage.setdefault(task.stage, {"run_s": 0.0, "wait_s": 0.0})
+            stage["run_s"] += run
+            stage["wait_s"] += wait
+            steps.append({"task": task.name, "stage": task.stage, "wait_s": round(wait, 3), "run_s": round(run, 3)})
+
+        busy = {}
+        for task in self.tasks.values():
+            if task.started_at is not None and task.finished_at is not None:
+                busy[task.stage] = busy.get(task.stage, 0.0) + (task.finished_at - task.started_at)
+
+        return {
+            "wall_s": round(wall, 3),
+            "critical_path": steps,
+            "critical_path_by_stage": {k: {m: round(v, 3) for m, v in s.items()} for k, s in by_stage.items()},
+            "busy_by_stage_s": {k: round(v, 3) for k, v in busy.items()},
+            "failed": [t.name for t in self.tasks.values() if t.status == "failed"],
+            "skipped": [t.name for t in self.tasks.values() if t.status == "skipped"],
+        }
@@ -0,0 +1,145 @@
+from typing import List, NamedTuple, Optional
+
+
+class TextBlock(NamedTuple):
+    lines: List[str]
+    line_height: int
+    height: int
+
+
+class TextLayout:
+    """
+    Measured text layout for slide rendering.
+
+    Word widths come from `font.getlength` and are cached per (font, word), so
+    wrapping is a single linear pass that sums cached advances instead of
+    re-measuring (or estimating) the whole line after every word.
+    """
+
+    def __init__(self, max_cache_entries: int = 50000):
+        self._widths = {}
+        self._line_heights = {}
+        self.max_cache_entries = max_cache_entries
+
+    def measure(self, font, text: str) -> float:
+        key = (font, text)
+        width = self._widths.get(key)
+        if width is None:
+            if len(self._widths) >= self.max_cache_entries:
+                self._widths.clear()
+            width = font.getlength(text)
+            self._widths[key] = width
+        return width
+
+    def line_height(self, font, spacing: float = 1.25) -> int:
+        key = (font, spacing)
+        height = self._line_heights.get(key)
+        if height is None:
+            try:
+                ascent, descent = font.getmetrics()
+                base = ascent + descent
+            except AttributeError:
+                # Bitmap fonts have no metrics; use the ink box of tall glyphs
+                left, top, right, bottom = font.getbbox("Ag")
+                base = bottom - top
+            height = int(round(base * spacing))
+            self._line_heights[key] = height
+        return height
+
+    def wrap(self, text: str, font, max_width: float) -> List[str]:
+        """Greedy word wrap in linear time. Explicit newlines are kept as paragraph breaks."""
+        space = self.measure(font, " ")
+        lines = []
+        for paragraph in text.split("\n"):
+            words = paragraph.split()
+            if not words:
+                lines.append("")
+                continue
+            current = []
+            current_width = 0.0
+            for word in words:
+                width = self.measure(font, word)
+                if width > max_width:
+                    # Word longer than a whole line: flush, then hard-break it
+                    if current:
+                        lines.append(" ".join(current))
+                    pieces = self._break_word(word, font, max_width)
+                    lines.extend(pieces[:-1])
+                    current, current_width = [pieces[-1]], self.measure(font, pieces[-1])
+                elif not current:
+                    current, current_width = [word], width
+                elif current_width + space + width <= max_width:
+                    current.append(word)
+                    current_width += space + width
+                else:
+                    lines.append(" ".join(current))
+                    current, current_width = [word], width
+            lines.append(" ".join(current))
+        return lines
+
+    def _break_word(self, word: str, font, max_width: float) -> List[str]:
+        # One pass summing cached per-character advances (kerning across the cut is ignored)
+        pieces = []
+        start = 0
+        width = 0.0
+        for i, ch in enumerate(word):
+            advance = self.measure(font, ch)
+            if i > start and width + advance > max_width:
+                pieces.append(word[start:i])
+                start, width = i, 0.0
+            width += advance
+        pieces.append(word[start:])
+        return pieces
+
+    def layout(self, text: str, font, max_width: float, spacing: float = 1.25,
+               max_lines: Optional[int] = None, preserve_whitespace: bool = False) -> TextBlock:
+        """
+        Wraps `text` to `max_width` and returns the lines plus the real block height.
+        With `max_lines`, overflowing text is cut and the last line ends in an ellipsis.
+        `preserve_whitespace` keeps indentation (for code) and only breaks over-long lines.
+        """
+        if preserve_whitespace:
+            lines = []
+            for raw in text.expandtabs(4).split("\n"):
+                if self.measure(font, raw) <= max_width:
+                    lines.append(raw)
+                else:
+                    lines.extend(self._break_word(raw, font, max_width))
+        else:
+            lines = self.wrap(text, font, max_width)
+
+        if max_lines is not None and len(lines) > max_lines:
+            lines = lines[:max(max_lines, 0)]
+            if lines:
+                lines[-1] = self._ellipsize(lines[-1], font, max_width)
+
+        line_height = self.line_height(font, spacing)
+        return TextBlock(lines, line_height, line_height * len(lines))
+
+    def _ellipsize(self, line: str, font, max_width: float) -> str:
+        """Longest prefix that fits with " …", cut back to a word boundary unless it is one long word."""
+        line = line.rstrip()
+        budget = max_width - self.measure(font, " …")
+        width = 0.0
+        end = 0
+        for ch in line:
+            width += self.measure(font, ch)
+            if width > budget:
+                break
+            end += 1
+        if end < len(line) and line[end] != " ":
+            boundary = line.rfind(" ", 0, end)
+            if boundary > 0 and line[:boundary].strip():
+                end = boundary
+        return line[:end].rstrip() + " …"
+
+    def draw(self, draw, block: TextBlock, x: int, y: int, font, fill) -> int:
+        """Draws a laid-out block and returns the y coordinate just below it."""
+        for line in block.lines:
+            if line:
+                draw.text((x, y), line, font=font, fill=fill)
+            y += block.line_height
+        return y
+
+
+text_layout = TextLayout()
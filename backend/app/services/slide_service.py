@@ -1,5 +1,15 @@
+import io
 import os
 import uuid
+import functools
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+from app.services.slide_layout import text_layout
+from app.core.metrics import timed
+from app.core.admission import limited
 
 # Safety Wrapper for SlideService
 HAS_PPTX = False
@@ -20,12 +30,163 @@ try:
 except ImportError:
     print("⚠️ Pillow not found. Slide Image generation will fail.")
 
+# Visual themes for rendered slide images.
+THEMES = {
+    "dark": {
+        "background": "#1e1e1e",
+        "heading": "#60a5fa",
+        "divider": "#334155",
+        "body": "#e2e8f0",
+        "summary": "#ffffff",
+        "code_bg": "#0f172a",
+        "code_outline": "#334155",
+        "code_text": "#d1d5db",
+    },
+}
+
+# Font candidates per role, tried in order (Windows names first, then DejaVu on Linux).
+FONT_CANDIDATES = {
+    "title": (["arialbd.ttf", "DejaVuSans-Bold.ttf"], 70),
+    "body": (["arial.ttf", "DejaVuSans.ttf"], 40),
+    "code": (["consola.ttf", "DejaVuSansMono.ttf"], 30),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_font(role: str):
+    """Resolves a font for a role once per process; falls back to Pillow's default font."""
+    candidates, size = FONT_CANDIDATES[role]
+    for name in candidates:
+        try:
+            return ImageFont.truetype(name, size)
+        except IOError:
+            continue
+    return ImageFont.load_default()
+
+
+class SlideRenderer:
+    """
+    Renders slide images with fonts resolved once and a pre-rendered base
+    template (background + divider) per theme that is copied for every slide.
+    """
+    width, height = 1920, 1080
+    margin_x = 100
+    divider_y = 220
+
+    def __init__(self, theme: str = "dark"):
+        self.theme_name = theme
+        self.theme = THEMES[theme]
+        self.title_font = resolve_font("title")
+        self.body_font = resolve_font("body")
+        self.small_font = resolve_font("code")
+        self._template = None
+
+    @property
+    def template(self):
+        if self._template is None:
+            img = Image.new('RGB', (self.width, self.height), color=self.theme["background"])
+            draw = ImageDraw.Draw(img)
+            draw.line((self.margin_x, self.divider_y, self.width - self.margin_x, self.divider_y),
+                      fill=self.theme["divider"], width=4)
+            self._template = img
+        return self._template
+
+    def render(self, slide_data: dict, index: int):
+        """Returns a PIL image of the slide."""
+        theme = self.theme
+        width, height, margin_x = self.width, self.height, self.margin_x
+        img = self.template.copy()
+        draw = ImageDraw.Draw(img)
+
+        layout = text_layout
+        content_width = width - 2 * margin_x
+        bottom = height - 100
+
+        # 1. Heading
+        heading = slide_data.get("heading", f"Slide {index+1}")
+        block = layout.layout(heading, self.title_font, content_width, spacing=1.1, max_lines=1)
+        layout.draw(draw, block, margin_x, 100, self.title_font, theme["heading"])
+        current_y = self.divider_y + 60
+
+        # 2. Summary
+        summary = slide_data.get("summary", "")
+        if summary:
+            block = layout.layout(summary, self.body_font, content_width, max_lines=4)
+            current_y = layout.draw(draw, block, margin_x, current_y, self.body_font, theme["summary"]) + 30
+
+        # 3. Points (hanging indent after the bullet)
+        points = slide_data.get("important_points", [])
+        if isinstance(points, str): points = [points]
+
+        bullet = "• "
+        indent = int(layout.measure(self.body_font, bullet))
+        for point in points:
+            remaining = (bottom - current_y) // layout.line_height(self.body_font)
+            if remaining <= 0:
+                break
+            block = layout.layout(str(point), self.body_font, content_width - indent, max_lines=remaining)
+            draw.text((margin_x, current_y), bullet, font=self.body_font, fill=theme["body"])
+            current_y = layout.draw(draw, block, margin_x + indent, current_y, self.body_font, theme["body"]) + 10
+
+        # 4. Code (box sized to its wrapped content, clipped to the slide)
+        code = slide_data.get("code", "")
+        if code and bottom - current_y > 100:
+            current_y += 30
+            padding = 20
+            code_line_height = layout.line_height(self.small_font, 1.2)
+            max_lines = (bottom - current_y - 2 * padding) // code_line_height
+            block = layout.layout(code, self.small_font, content_width - 2 * padding, spacing=1.2,
+                                  max_lines=max_lines, preserve_whitespace=True)
+            box_bottom = min(bottom, current_y + block.height + 2 * padding)
+            draw.rectangle((margin_x, current_y, width - margin_x, box_bottom),
+                           fill=theme["code_bg"], outline=theme["code_outline"])
+            layout.draw(draw, block, margin_x + padding, current_y + padding, self.small_font, theme["code_text"])
+
+        return img
+
+
+# Per-process renderer used by the process-pool entry point below.
+_worker_renderer = None
+
+
+def _render_slide_job(job: tuple):
+    """
+    Process-pool entry point.
+    job = (slide_data, index, theme, output_path); returns output_path, or the
+    encoded PNG bytes when output_path is None.
+    """
+    global _worker_renderer
+    slide_data, index, theme, output_path = job
+    if _worker_renderer is None or _worker_renderer.theme_name != theme:
+        _worker_renderer = SlideRenderer(theme)
+    img = _worker_renderer.render(slide_data, index)
+    if output_path:
+        img.save(output_path)
+        return output_path
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
 class SlideService:
     def __init__(self):
         self.output_dir = os.path.join(os.getcwd(), "data", "outputs", "slides")
         os.makedirs(self.output_dir, exist_ok=True)
+        self._renderer = None
+        self._process_pool = None
+        self._pool_lock = threading.Lock()
+        self.render_workers = int(os.getenv("SLIDE_RENDER_WORKERS", "0")) or (os.cpu_count() or 1)
 
-    def generate_presentation(self, lecture_title: str, slides_data: list[dict]) -> str:
+    @property
+    def renderer(self) -> "SlideRenderer":
+        # Built lazily so fonts are only resolved when slide images are actually needed
+        if self._renderer is None:
+            self._renderer = SlideRenderer(os.getenv("SLIDE_THEME", "dark"))
+        return self._renderer
+
+    @limited("render")
+    @timed("slides.pptx")
+    def generate_presentation(self, lecture_title: str, slides_data: list[dict], filename: str = None) -> str:
         if not HAS_PPTX:
              print("❌ python-pptx missing. Skipping PPTX generation.")
              return ""
@@ -95,7 +256,7 @@ class SlideService:
                     print(f"Error creating slide {index}: {e}")
                     continue 
 
-            filename = f"{lecture_title.replace(' ', '_')}_{uuid.uuid4()}.pptx"
+            filename = filename or f"{lecture_title.replace(' ', '_')}_{uuid.uuid4()}.pptx"
             filepath = os.path.join(self.output_dir, filename)
             prs.save(filepath)
             print(f"Presentation saved to {filepath}")
@@ -105,7 +266,9 @@ class SlideService:
             print(f"Critical Error in generate_presentation: {e}")
             return ""
 
-    def generate_slide_image(self, slide_data: dict, index: int) -> str:
+    @limited("render")
+    @timed("slides.image")
+    def generate_slide_image(self, slide_data: dict, index: int, filename: str = None) -> str:
         """
         Generates an image of the slide using Pillow.
         If Pillow is missing, returns empty string.
@@ -115,59 +278,9 @@ class SlideService:
             return ""
 
         try:
-            width, height = 1920, 1080
-            img = Image.new('RGB', (width, height), color='#1e1e1e')
-            draw = ImageDraw.Draw(img)
-            
-            # Fonts
-            try:
-                title_font = ImageFont.truetype("arialbd.ttf", 70)
-                body_font = ImageFont.truetype("arial.ttf", 40)
-                small_font = ImageFont.truetype("consola.ttf", 30)
-            except IOError:
-                try:
-                     title_font = ImageFont.truetype("DejaVuSans-Bold.ttf", 70)
-                     body_font = ImageFont.truetype("DejaVuSans.ttf", 40)
-                     small_font = ImageFont.truetype("DejaVuSansMono.ttf", 30)
-                except:
-                     title_font = ImageFont.load_default()
-                     body_font = ImageFont.load_default()
-                     small_font = ImageFont.load_default()
-
-            margin_x = 100
-            current_y = 100
-            
-            # 1. Heading
-            heading = slide_data.get("heading", f"Slide {index+1}")
-            draw.text((margin_x, current_y), heading, font=title_font, fill="#60a5fa")
-            current_y += 120
-            
-            draw.line((margin_x, current_y, width - margin_x, current_y), fill="#334155", width=4)
-            current_y += 60
-            
-            # 2. Summary
-            summary = slide_data.get("summary", "")
-            if summary:
-                self._draw_text_wrapped(draw, summary, 20, body_font, margin_x, current_y, width - margin_x)
-                current_y += 150 
-            
-            # 3. Points
-            points = slide_data.get("important_points", [])
-            if isinstance(points, str): points = [points]
-                
-            for point in points:
-                text = f"• {point}"
-                draw.text((margin_x, current_y), text, font=body_font, fill="#e2e8f0")
-                current_y += 60
-                
-            # 4. Code
-            code = slide_data.get("code", "")
-            if code:
-                current_y += 40
-                draw.rectangle((margin_x, current_y, width - margin_x, height - 100), fill="#0f172a", outline="#334155")
-                draw.text((margin_x + 20, current_y + 20), code, font=small_font, fill="#d1d5db")
-
-            filename = f"slide_{index}_{uuid.uuid4()}.png"
+            img = self.renderer.render(slide_data, index)
+
+            filename = filename or f"slide_{index}_{uuid.uuid4()}.png"
             filepath = os.path.join(self.output_dir, filename)
             img.save(filepath)
             return filepath
@@ -176,22 +289,85 @@ class SlideService:
             print(f"Error drawing slide image: {e}")
             return ""
 
-    def _draw_text_wrapped(self, draw, text, char_width, font, x, y, max_width):
-        # ... logic consistent with previous ...
-        lines = []
-        words = text.split()
-        current_line = []
-        for word in words:
-            current_line.append(word)
-            if len(" ".join(current_line)) * char_width * 0.5 > max_width: 
-                current_line.pop()
-                lines.append(" ".join(current_line))
-                current_line = [word]
-        lines.append(" ".join(current_line))
-        
-        for line in lines:
-            draw.text((x, y), line, font=font, fill="#ffffff")
-            y += 50
-        return y
+    @limited("render")
+    @timed("slides.render_batch")
+    def render_slides_parallel(self, scenes: list[dict], as_bytes: bool = False, filenames: list[str] = None) -> list:
+        """
+        Rasterizes all scenes concurrently in a warm process pool (Pillow drawing holds
+        the GIL, so threads don't overlap). Returns PNG paths in scene order, or PNG
+        bytes when `as_bytes` is set. `filenames` optionally names each output.
+        Failed slides come back as "" / None.
+        """
+        if not HAS_PIL:
+            print("❌ Pillow missing. Cannot generate slide images.")
+            return [None if as_bytes else "" for _ in scenes]
+
+        theme = self.renderer.theme_name
+        jobs = []
+        for i, scene in enumerate(scenes):
+            index = scene.get("scene_id", i)
+            filename = filenames[i] if filenames else f"slide_{index}_{uuid.uuid4()}.png"
+            output_path = None if as_bytes else os.path.join(self.output_dir, filename)
+            jobs.append((scene, index, theme, output_path))
+
+        results = []
+        for outcome in self._run_in_pool(jobs):
+            if isinstance(outcome, Exception):
+                print(f"Error drawing slide image (process pool): {outcome}")
+                results.append(None if as_bytes else "")
+            else:
+                results.append(outcome)
+        return results
+
+    def _run_in_pool(self, jobs: list) -> list:
+        """
+        Result or exception per job. A worker crash breaks the whole pool, so it
+        is replaced and the jobs it took down are retried once on the new one.
+        """
+        outcomes = [None] * len(jobs)
+        todo = list(range(len(jobs)))
+        for attempt in range(2):
+            pool = self._get_process_pool()
+            futures = {}
+            for i in todo:
+                try:
+                    futures[i] = pool.submit(_render_slide_job, jobs[i])
+                except BrokenProcessPool as e:
+                    outcomes[i] = e
+            for i, future in futures.items():
+                try:
+                    outcomes[i] = future.result()
+                except Exception as e:
+                    outcomes[i] = e
+            todo = [i for i in todo if isinstance(outcomes[i], BrokenProcessPool)]
+            if not todo:
+                break
+            self._discard_process_pool(pool)
+            if attempt == 0:
+                print(f"⚠️ Slide render pool broke; restarting it and retrying {len(todo)} slide(s).")
+        return outcomes
+
+    def _get_process_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        # Spawned (not forked) so workers don't inherit the server's threads and models
+        with self._pool_lock:
+            if self._process_pool is None:
+                self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.render_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+
+    def _discard_process_pool(self, pool: concurrent.futures.ProcessPoolExecutor):
+        # Only the broken pool: a concurrent batch may already have replaced it
+        with self._pool_lock:
+            if self._process_pool is pool:
+                self._process_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
 
 slide_service = SlideService()
@@ -0,0 +1,458 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from app.core.metrics import registry, inc
+from app.services.asset_service import asset_service
+from app.services.lecture_store import lecture_store
+from app.services.lecture_index import lecture_index
+
+registry.describe("storage_evicted_bytes_total", "counter", "Bytes deleted from data/outputs by compaction.")
+registry.describe("storage_evicted_lectures_total", "counter", "Render caches (and, if enabled, lectures) deleted by compaction.")
+
+
+class StoredFile(NamedTuple):
+    rel_path: str
+    path: str
+    category: str
+    size: int
+    mtime: float
+    last_access: float
+
+
+class StoredLecture(NamedTuple):
+    owner: str          # lecture id, or "render:<manifest name>"
+    record_path: str    # data/lectures/<id>.json or data/manifests/<name>.json
+    files: Set[str]     # rel_paths it references
+    mtime: float
+    last_used: float
+
+
+class StorageService:
+    """
+    Keeps data/outputs bounded.
+
+    Every file is attributed to the lectures that reference it: web lectures
+    (data/lectures/*.json, via their /files URLs) and rendered lectures
+    (data/manifests/*.json, via their stage output paths). Unreferenced files
+    are deleted once unused for longer than the age quota (a shorter one for
+    debug scripts), and least-recently-used first whenever the directory
+    exceeds the size quota.
+
+    Referenced files go only with everything that references them. Render
+    manifests are derived caches: one is evicted (manifest plus every file no
+    one else references) once unused for longer than the lecture age quota,
+    or least-recently-used first when evicting unreferenced files alone cannot
+    bring usage under the size quota. Web lectures are the user's records and
+    their files are never evicted, unless STORAGE_EVICT_LECTURES opts them into
+    the same policy (then their JSON and lecture-index entry go too). A lecture
+    was last used when it was written, fetched (GET /lecture/{id}), served from
+    the lecture index, or when any of its files was read, whichever is latest.
+
+    Files and lectures younger than the grace period are left alone so
+    in-flight jobs never lose their outputs. Last access comes from /files
+    requests (`touch`) and lecture fetches (`touch_lecture`), falling back to
+    mtime, and is persisted to data/storage/access.json across restarts.
+    Compaction runs on a background thread every STORAGE_COMPACT_INTERVAL_SECONDS
+    in one process only: the worker holding data/storage/compactor.lock. The
+    others just save their access times.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = os.path.realpath(root or asset_service.root)
+        data_dir = os.path.join(os.getcwd(), "data")
+        self.lectures_dir = os.path.join(data_dir, "lectures")
+        self.manifests_dir = os.path.join(data_dir, "manifests")
+        self.state_dir = os.path.join(data_dir, "storage")
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.access_path = os.path.join(self.state_dir, "access.json")
+
+        self.max_bytes = int(float(os.getenv("STORAGE_MAX_GB", "20")) * 1024 ** 3)
+        self.low_watermark = float(os.getenv("STORAGE_LOW_WATERMARK", "0.9"))
+        self.max_age = float(os.getenv("STORAGE_MAX_AGE_DAYS", "30")) * 86400
+        self.scripts_max_age = float(os.getenv("STORAGE_SCRIPTS_MAX_AGE_DAYS", "7")) * 86400
+        self.lecture_max_age = float(os.getenv("STORAGE_LECTURE_MAX_AGE_DAYS", "90")) * 86400
+        self.evict_lectures = os.getenv("STORAGE_EVICT_LECTURES", "false").lower() in ("1", "true", "yes")
+        self.grace = float(os.getenv("STORAGE_GRACE_SECONDS", "3600"))
+        self.interval = float(os.getenv("STORAGE_COMPACT_INTERVAL_SECONDS", "600"))
+
+        self._access: Dict[str, float] = self._load_access()
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self._category_bytes: Dict[str, int] = {}
+        self.last_compaction: Optional[dict] = None
+        registry.register_gauge("storage_bytes", "Bytes under data/outputs by category (as of the last scan).",
+                                lambda: {(("category", c),): b for c, b in self._category_bytes.items()})
+
+    # ------------------------------------------------------------ access tracking
+
+    def touch(self, path: str):
+        """Records a read (cheap; called on every /files request)."""
+        rel = self._rel(path)
+        if rel is not None:
+            with self._lock:
+                self._access[rel] = time.time()
+
+    def touch_lecture(self, lecture_id: str):
+        """Records a lecture fetch (cheap; called on every GET /lecture/{id})."""
+        with self._lock:
+            self._access[f"lecture:{lecture_id}"] = time.time()
+
+    def _rel(self, path: str) -> Optional[str]:
+        rel = os.path.relpath(os.path.realpath(path), self.root).replace(os.sep, "/")
+        return None if rel.startswith("..") else rel
+
+    def _load_access(self) -> Dict[str, float]:
+        try:
+            with open(self.access_path, "r", encoding="utf-8") as f:
+                return {k: float(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_access(self, live: Set[str] = None):
+        # Merge with what other workers saved; keep the latest access per file
+        with self._lock:
+            merged = self._load_access()
+            for rel, ts in self._access.items():
+                merged[rel] = max(ts, merged.get(rel, 0.0))
+            if live is not None:
+                merged = {rel: ts for rel, ts in merged.items() if rel in live}
+            self._access = merged
+        tmp = f"{self.access_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(merged, f)
+        os.replace(tmp, self.access_path)
+
+    # ------------------------------------------------------------ inventory
+
+    def scan(self) -> List[StoredFile]:
+        files = []
+        with self._lock:
+            access = dict(self._access)
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                category = rel.split("/", 1)[0] if "/" in rel else "(root)"
+                files.append(StoredFile(rel, path, category, st.st_size, st.st_mtime,
+                                        max(access.get(rel, 0.0), st.st_mtime)))
+        return files
+
+    def owners(self) -> Dict[str, tuple]:
+        """owner -> (record path, rel_paths it references) for every web lecture and render manifest."""
+        owners: Dict[str, tuple] = {}
+        for name in self._json_files(self.lectures_dir):
+            path = os.path.join(self.lectures_dir, name)
+            rels = {self._rel_from_url(value) for value in self._strings(self._read_json(path))}
+            owners[name[:-5]] = (path, rels - {None})
+        for name in self._json_files(self.manifests_dir):
+            path = os.path.join(self.manifests_dir, name)
+            rels = set()
+            for scope in (self._read_json(path) or {}).values():
+                for entry in scope.values() if isinstance(scope, dict) else ():
+                    if isinstance(entry, dict) and entry.get("path"):
+                        rels.add(self._rel(entry["path"]))
+            owners[f"render:{name[:-5]}"] = (path, rels - {None})
+        return owners
+
+    def references(self, owners: Dict[str, tuple] = None) -> Dict[str, Set[str]]:
+        """rel_path -> ids of the lectures that reference it."""
+        refs: Dict[str, Set[str]] = {}
+        for owner, (_, rels) in (self.owners() if owners is None else owners).items():
+            for rel in rels:
+                refs.setdefault(rel, set()).add(owner)
+        return refs
+
+    def lectures(self, files: List[StoredFile], owners: Dict[str, tuple] = None) -> List[StoredLecture]:
+        """Every lecture with its files and when it was last used."""
+        by_rel = {f.rel_path: f for f in files}
+        with self._lock:
+            access = dict(self._access)
+        try:
+            indexed = lecture_index.last_used()
+        except Exception as e:
+            print(f"⚠️ Storage: could not read the lecture index: {e}")
+            indexed = {}
+        lectures = []
+        for owner, (record_path, rels) in (self.owners() if owners is None else owners).items():
+            try:
+                mtime = os.stat(record_path).st_mtime
+            except FileNotFoundError:
+                continue
+            last_used = max([mtime, access.get(f"lecture:{owner}", 0.0), indexed.get(owner, 0.0)]
+                            + [by_rel[rel].last_access for rel in rels if rel in by_rel])
+            lectures.append(StoredLecture(owner, record_path, rels, mtime, last_used))
+        return lectures
+
+    @staticmethod
+    def _json_files(directory: str) -> List[str]:
+        try:
+            return [n for n in os.listdir(directory) if n.endswith(".json")]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _read_json(path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _strings(self, value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for v in value.values():
+                yield from self._strings(v)
+        elif isinstance(value, list):
+            for v in value:
+                yield from self._strings(v)
+
+    @staticmethod
+    def _rel_from_url(value: str) -> Optional[str]:
+        # /files/a/<digest>/<rel> (immutable) or /files/<rel>
+        if value.startswith("/files/a/"):
+            parts = value[len("/files/a/"):].split("/", 1)
+            return parts[1] if len(parts) == 2 else None
+        if value.startswith("/files/"):
+            return value[len("/files/"):]
+        return None
+
+    # ------------------------------------------------------------ compaction
+
+    def compact(self, dry_run: bool = False) -> dict:
+        """
+        Applies the age and size quotas to unreferenced files, then to render
+        caches (and web lectures if enabled); returns what was (or would be) evicted.
+        Only the compactor process deletes; elsewhere a real run is refused.
+        """
+        if not dry_run and not self.try_acquire_compactor():
+            raise RuntimeError("Compaction runs in another worker process")
+        with self._compact_lock:
+            started = time.perf_counter()
+            now = time.time()
+            files = self.scan()
+            owners = self.owners()
+            refs = self.references(owners)
+            lectures = self.lectures(files, owners)
+            by_rel = {f.rel_path: f for f in files}
+            total = sum(f.size for f in files)
+
+            candidates = [f for f in files if f.rel_path not in refs and now - f.mtime >= self.grace]
+            evict: Dict[str, tuple] = {}
+            for f in candidates:
+                max_age = self.scripts_max_age if f.category == "scripts" else self.max_age
+                if max_age > 0 and now - f.last_access > max_age:
+                    evict[f.rel_path] = (f, "age")
+            remaining = total - sum(f.size for f, _ in evict.values())
+            target = self.max_bytes * self.low_watermark
+            if remaining > self.max_bytes:
+                for f in sorted(candidates, key=lambda f: f.last_access):
+                    if remaining <= target:
+                        break
+                    if f.rel_path not in evict:
+                        evict[f.rel_path] = (f, "size")
+                        remaining -= f.size
+
+            # Whole lectures: a file goes once no surviving lecture references it
+            evict_lectures: Dict[str, tuple] = {}
+            live_owners = {rel: set(owned_by) for rel, owned_by in refs.items()}
+
+            def evict_lecture(lecture: StoredLecture, reason: str) -> int:
+                evict_lectures[lecture.owner] = (lecture, reason)
+                freed = 0
+                for rel in lecture.files:
+                    live_owners[rel].discard(lecture.owner)
+                    f = by_rel.get(rel)
+                    if f is not None and not live_owners[rel] and now - f.mtime >= self.grace:
+                        evict[rel] = (f, f"lecture_{reason}")
+                        freed += f.size
+                return freed
+
+            lecture_candidates = sorted((l for l in lectures if now - l.mtime >= self.grace
+                                         and (self.evict_lectures or l.owner.startswith("render:"))),
+                                        key=lambda l: l.last_used)
+            for lecture in lecture_candidates:
+                if self.lecture_max_age > 0 and now - lecture.last_used > self.lecture_max_age:
+                    remaining -= evict_lecture(lecture, "age")
+            if remaining > self.max_bytes:
+                for lecture in lecture_candidates:
+                    if remaining <= target:
+                        break
+                    if lecture.owner not in evict_lectures:
+                        remaining -= evict_lecture(lecture, "size")
+                if remaining > self.max_bytes:
+                    print(f"⚠️ Storage: {remaining / 1024 ** 3:.2f} GB still in use after eviction; "
+                          f"the rest is referenced by lectures or within the grace period.")
+
+            if not dry_run:
+                for lecture, reason in evict_lectures.values():
+                    self._delete_lecture(lecture)
+                    inc("storage_evicted_lectures_total", reason=reason)
+
+            freed = 0
+            for f, reason in evict.values():
+                if not dry_run:
+                    try:
+                        os.remove(f.path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        print(f"⚠️ Storage: could not evict {f.rel_path}: {e}")
+                        continue
+                    asset_service.forget(f.path)
+                    inc("storage_evicted_bytes_total", f.size, reason=reason)
+                freed += f.size
+
+            by_category: Dict[str, int] = {}
+            for f in files:
+                if dry_run or f.rel_path not in evict:
+                    by_category[f.category] = by_category.get(f.category, 0) + f.size
+            self._category_bytes = by_category
+            if not dry_run:
+                self._save_access(live=({f.rel_path for f in files} - set(evict))
+                                  | {f"lecture:{owner}" for owner in owners if owner not in evict_lectures})
+
+            report = {
+                "dry_run": dry_run,
+                "finished_at": now,
+                "duration_s": round(time.perf_counter() - started, 3),
+                "files_scanned": len(files),
+                "bytes_before": total,
+                "evicted_files": len(evict),
+                "evicted_bytes": freed,
+                "evicted_by_reason": {r: sum(1 for _, why in evict.values() if why == r)
+                                      for r in ("age", "size", "lecture_age", "lecture_size")},
+                "evicted_lectures": {r: sorted(owner for owner, (_, why) in evict_lectures.items() if why == r)
+                                     for r in ("age", "size")},
+                "bytes_after": total if dry_run else total - freed,
+            }
+            if not dry_run:
+                self.last_compaction = report
+                if evict or evict_lectures:
+                    print(f"🧹 Storage compaction evicted {len(evict_lectures)} lecture(s) and "
+                          f"{len(evict)} file(s), {freed / 1024 ** 2:.1f} MB.")
+            return report
+
+    def _delete_lecture(self, lecture: StoredLecture):
+        # Unlist it first so nothing serves a lecture whose files are about to go
+        if not lecture.owner.startswith("render:"):
+            lecture_index.invalidate(lecture_id=lecture.owner)
+            lecture_store.invalidate(lecture.owner)
+        try:
+            os.remove(lecture.record_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ Storage: could not evict {lecture.record_path}: {e}")
+
+    def stats(self) -> dict:
+        """`du`-style breakdown by category and by lecture."""
+        now = time.time()
+        files = self.scan()
+        stored = self.lectures(files)
+        refs = self.references({l.owner: (l.record_path, l.files) for l in stored})
+        last_used = {l.owner: l.last_used for l in stored}
+
+        categories: Dict[str, dict] = {}
+        lectures: Dict[str, dict] = {}
+        for f in files:
+            c = categories.setdefault(f.category, {"files": 0, "bytes": 0, "referenced_bytes": 0,
+                                                   "evictable_bytes": 0, "oldest_access_age_s": 0})
+            c["files"] += 1
+            c["bytes"] += f.size
+            c["oldest_access_age_s"] = max(c["oldest_access_age_s"], int(now - f.last_access))
+            owners = refs.get(f.rel_path)
+            if owners:
+                c["referenced_bytes"] += f.size
+                for owner in owners:
+                    entry = lectures.setdefault(owner, {"files": 0, "bytes": 0,
+                                                        "last_used_age_s": int(now - last_used.get(owner, now))})
+                    entry["files"] += 1
+                    entry["bytes"] += f.size
+            elif now - f.mtime >= self.grace:
+                c["evictable_bytes"] += f.size
+        self._category_bytes = {name: c["bytes"] for name, c in categories.items()}
+
+        total = sum(c["bytes"] for c in categories.values())
+        top = sorted(lectures.items(), key=lambda item: item[1]["bytes"], reverse=True)[:20]
+        return {
+            "root": self.root,
+            "total_files": len(files),
+            "total_bytes": total,
+            "quota": {"max_bytes": self.max_bytes, "used_fraction": round(total / self.max_bytes, 4) if self.max_bytes else None,
+                      "max_age_days": self.max_age / 86400, "scripts_max_age_days": self.scripts_max_age / 86400,
+                      "lecture_max_age_days": self.lecture_max_age / 86400, "evict_lectures": self.evict_lectures,
+                      "grace_seconds": self.grace},
+            "categories": dict(sorted(categories.items(), key=lambda item: item[1]["bytes"], reverse=True)),
+            "lectures": {"count": len(stored), "top_by_bytes": dict(top)},
+            "last_compaction": self.last_compaction,
+        }
+
+    # ------------------------------------------------------------ lifecycle
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="storage-compactor", daemon=True)
+            self._thread.start()
+
+    def try_acquire_compactor(self) -> bool:
+        """Non-blocking; True if this process is (now) the compactor. Released when the process exits."""
+        if self._lock_file is not None:
+            return True
+        f = open(os.path.join(self.state_dir, "compactor.lock"), "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._lock_file = f
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.try_acquire_compactor():
+                    self.compact()
+                else:
+                    # The compactor merges these when it next runs (and takes over if it dies)
+                    self._save_access()
+            except Exception as e:
+                print(f"⚠️ Storage compaction failed: {e}")
+            self._stop.wait(self.interval)
+
+    def shutdown(self):
+        self._stop.set()
+        try:
+            self._save_access()
+        except OSError as e:
+            print(f"⚠️ Could not save storage access times: {e}")
+
+
+storage_service = StorageService()
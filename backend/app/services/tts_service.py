@@ -2,6 +2,13 @@ import os
 import contextlib
 import wave
 import math
+import time
+import shlex
+import subprocess
+
+from app.core.circuit_breaker import CircuitBreaker, order_by_health
+from app.core.metrics import timed, inc
+from app.core.admission import limited
 
 class TTSService:
     def __init__(self):
@@ -23,76 +30,147 @@ class TTSService:
             # print(f"⚠️ Coqui TTS skipped: {e}")
             self.tts = None
 
+        # Optional: Warm pool of local TTS worker processes (offline, CPU-only).
+        # Enabled with LOCAL_TTS_WORKERS > 0. Workers start lazily on first use so
+        # importing this module stays cheap. LOCAL_TTS_MODEL=stub uses the pure-Python stand-in.
+        self.local_pool = None
+        self.local_timeout = float(os.getenv("LOCAL_TTS_TIMEOUT", "120"))
+        local_workers = int(os.getenv("LOCAL_TTS_WORKERS", "0"))
+        if local_workers > 0:
+            from app.services.tts_worker_pool import TTSWorkerPool, DEFAULT_MODEL_SPEC
+            self.local_pool = TTSWorkerPool(
+                num_workers=local_workers,
+                threads_per_worker=int(os.getenv("LOCAL_TTS_THREADS_PER_WORKER", "1")),
+                model_spec=os.getenv("LOCAL_TTS_MODEL", DEFAULT_MODEL_SPEC),
+            )
+
+        self.voice = "en-US-JennyNeural"
+        # Command prefix for the edge-tts CLI (override to use a stand-in, see loadtest/)
+        self.edge_tts_command = shlex.split(os.getenv("EDGE_TTS_COMMAND", "edge-tts"))
+        self.remote_timeout = float(os.getenv("TTS_REMOTE_TIMEOUT", "30"))
+
+        # Provider cascade in order of preference (quality), each behind a circuit breaker.
+        self.providers = {"edge-tts": self._edge_tts}
+        if self.local_pool:
+            self.providers["local-pool"] = self._local_pool_tts
+        elif self.tts:
+            self.providers["coqui"] = self._coqui_tts
+        self.providers["gtts"] = self._gtts
+
+        failure_threshold = int(os.getenv("TTS_BREAKER_FAILURES", "2"))
+        reset_timeout = float(os.getenv("TTS_BREAKER_RESET_SECONDS", "60"))
+        self.breakers = {
+            name: CircuitBreaker(name, failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+            for name in self.providers
+        }
+
     def generate_audio(self, text: str, output_filename: str) -> tuple[str, float]:
+        """Generates audio for `text`; returns (path, duration_seconds). See `synthesize`."""
+        path, duration, _ = self.synthesize(text, output_filename)
+        return path, duration
+
+    @limited("tts")
+    @timed("tts.synthesize")
+    def synthesize(self, text: str, output_filename: str) -> tuple[str, float, str]:
         """
         Generates audio Robustly using Multi-Provider Strategy (Cascade):
         1. Edge TTS (Microsoft Neural - Best Free Quality)
-        2. Coqui TTS (Local Fallback)
+        2. Local TTS (Warm worker pool, or in-process Coqui)
         3. gTTS (Google Cloud Fallback)
         4. Silent/Mock (Ultimate failsafe)
+
+        Each provider sits behind a circuit breaker: providers that keep failing are
+        skipped until a periodic half-open probe succeeds, and the cascade starts at
+        the provider most likely to succeed.
+
+        Returns (path, duration_seconds, provider_name); provider is "silent" for the failsafe.
         """
         # Ensure filename ends in mp3
         if not output_filename.endswith(".mp3"):
             output_filename = output_filename.rsplit('.', 1)[0] + ".mp3"
             
         file_path = os.path.join(self.output_dir, output_filename)
-        
-        # --- ATTEMPT 1: Edge TTS (High Quality, Online) ---
-        try:
-            # print(f"🎙️ Generating with Edge TTS for {output_filename}...")
-            import subprocess
-            voice = "en-US-JennyNeural" 
-            
-            cmd = ["edge-tts", "--text", text, "--write-media", file_path, "--voice", voice]
-            
-            # Run blocking
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                 print(f"✅ [Slide TTS] Generated with EdgeTTS (Microsoft Neural): {output_filename}")
-                 return self._get_mp3_duration(file_path)
-            else:
-                 raise Exception("File not created by edge-tts")
-                 
-        except Exception as e:
-            print(f"⚠️ [Slide TTS] Edge TTS Failed: {e}. Switching to Coqui...")
 
-        # --- ATTEMPT 2: Coqui TTS ---
-        if self.tts:
+        attempts = 0
+        for breaker in order_by_health(list(self.breakers.values())):
+            if not breaker.allow_request():
+                inc("tts_provider_skipped_total", provider=breaker.name)
+                continue
+            attempts += 1
+            provider = self.providers[breaker.name]
+            started = time.perf_counter()
             try:
-                # Coqui usually outputs wav by default
-                wav_path = file_path.replace(".mp3", ".wav")
-                self.tts.tts_to_file(text=text, file_path=wav_path)
-                
-                # Convert to MP3
-                from pydub import AudioSegment
-                sound = AudioSegment.from_wav(wav_path)
-                sound.export(file_path, format="mp3")
-                
-                if os.path.exists(wav_path):
-                    os.remove(wav_path)
-                    
-                return self._get_mp3_duration(file_path)
+                path, duration = provider(text, file_path)
+                breaker.record_success(time.perf_counter() - started)
+                inc("tts_requests_total", provider=breaker.name, outcome="ok", fallback=str(attempts > 1).lower())
+                print(f"✅ [Slide TTS] Generated with {breaker.name}: {output_filename}")
+                return path, duration, breaker.name
             except Exception as e:
-                print(f"⚠️ Coqui TTS Failed: {e}. Switching to gTTS...")
-        
-        # --- ATTEMPT 3: gTTS (Google TTS) ---
-        try:
-            from gtts import gTTS
-            tts = gTTS(text=text, lang='en')
-            tts.save(file_path) 
-            return self._get_mp3_duration(file_path)
+                breaker.record_failure(time.perf_counter() - started, e)
+                inc("tts_requests_total", provider=breaker.name, outcome="error", fallback=str(attempts > 1).lower())
+                print(f"⚠️ [Slide TTS] {breaker.name} Failed: {e}. Trying next provider...")
 
-        except Exception as e:
-            print(f"⚠️ gTTS Failed: {e}. Switching to Silent Mode...")
-
-        # --- ATTEMPT 4: Silent Fallback ---
+        # --- LAST RESORT: Silent Fallback ---
         print(f"🔇 Using Silent Fallback for {output_filename}")
+        inc("tts_requests_total", provider="silent", outcome="ok", fallback="true")
         word_count = len(text.split())
         approx_duration = max(2.0, word_count / 2.5) 
-        self._create_silent_mp3(file_path, duration_sec=approx_duration)
-        return file_path, approx_duration
-        
+        # Never under the requested name: callers key caches on it and must not mistake silence for speech
+        silent_path = file_path[:-len(".mp3")] + ".silent.mp3"
+        self._create_silent_mp3(silent_path, duration_sec=approx_duration)
+        return silent_path, approx_duration, "silent"
+
+    def get_provider_stats(self) -> dict:
+        """Per-provider circuit state and latency stats."""
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+    def _edge_tts(self, text: str, file_path: str) -> tuple[str, float]:
+        """Edge TTS (High Quality, Online)."""
+        cmd = [*self.edge_tts_command, "--text", text, "--write-media", file_path, "--voice", self.voice]
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       timeout=self.remote_timeout)
+
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            return self._get_mp3_duration(file_path)
+        raise Exception("File not created by edge-tts")
+
+    def _local_pool_tts(self, text: str, file_path: str) -> tuple[str, float]:
+        """Warm local worker pool (Offline)."""
+        wav_path = file_path.replace(".mp3", ".wav")
+        try:
+            self.local_pool.synthesize(text, wav_path, timeout=self.local_timeout)
+
+            from pydub import AudioSegment
+            sound = AudioSegment.from_wav(wav_path)
+            sound.export(file_path, format="mp3")
+            return self._get_mp3_duration(file_path)
+        finally:
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+
+    def _coqui_tts(self, text: str, file_path: str) -> tuple[str, float]:
+        """Coqui TTS (In-Process)."""
+        # Coqui usually outputs wav by default
+        wav_path = file_path.replace(".mp3", ".wav")
+        self.tts.tts_to_file(text=text, file_path=wav_path)
+
+        # Convert to MP3
+        from pydub import AudioSegment
+        sound = AudioSegment.from_wav(wav_path)
+        sound.export(file_path, format="mp3")
+
+        if os.path.exists(wav_path):
+            os.remove(wav_path)
+
+        return self._get_mp3_duration(file_path)
+
+    def _gtts(self, text: str, file_path: str) -> tuple[str, float]:
+        """gTTS (Google TTS)."""
+        from gtts import gTTS
+        tts = gTTS(text=text, lang='en', timeout=self.remote_timeout)
+        tts.save(file_path)
+        return self._get_mp3_duration(file_path)
+
     def _get_mp3_duration(self, file_path: str) -> tuple[str, float]:
         from pydub import AudioSegment
         audio = AudioSegment.from_mp3(file_path)
@@ -0,0 +1,340 @@
+import os
+import queue
+import re
+import math
+import wave
+import array
+import atexit
+import time
+import itertools
+import threading
+import multiprocessing
+import multiprocessing.connection
+import concurrent.futures
+from typing import List, Optional
+
+# Model specs understood by the workers. The spec is a plain string so it can be
+# pickled across the process boundary and resolved inside each worker.
+STUB_MODEL_SPEC = "stub"
+DEFAULT_MODEL_SPEC = "coqui:tts_models/en/ljspeech/glow-tts"
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Splits a slide script into sentences so a worker can synthesize them as one batch."""
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text or "") if s.strip()]
+
+
+class StubTTSModel:
+    """
+    Pure-Python stand-in for a local TTS model.
+    Emits a short tone burst per word (and a gap between words) so durations
+    and audio energy roughly track a real voice. Used for tests and benchmarks.
+    """
+    sample_rate = 16000
+
+    def __init__(self, word_seconds: float = 0.3, gap_seconds: float = 0.1):
+        n_word = int(self.sample_rate * word_seconds)
+        burst = array.array("h", (
+            int(8000 * math.sin(2 * math.pi * 220 * i / self.sample_rate) * math.sin(math.pi * i / n_word))
+            for i in range(n_word)
+        ))
+        self._word = burst.tobytes()
+        self._gap = b"\x00\x00" * int(self.sample_rate * gap_seconds)
+
+    def synthesize(self, text: str) -> bytes:
+        words = len(text.split())
+        return (self._word + self._gap) * words
+
+
+class CoquiTTSModel:
+    """Adapter around Coqui `TTS.api.TTS`, loaded once per worker on CPU."""
+
+    def __init__(self, model_name: str):
+        from TTS.api import TTS
+        self.tts = TTS(model_name).to("cpu")
+        self.sample_rate = self.tts.synthesizer.output_sample_rate
+
+    def synthesize(self, text: str) -> bytes:
+        import numpy as np
+        samples = np.asarray(self.tts.tts(text=text), dtype=np.float32)
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def load_model(model_spec: str):
+    if model_spec == STUB_MODEL_SPEC:
+        return StubTTSModel()
+    if model_spec.startswith("coqui:"):
+        return CoquiTTSModel(model_spec.split(":", 1)[1])
+    raise ValueError(f"Unknown local TTS model spec: {model_spec}")
+
+
+def _limit_threads(num_threads: int):
+    """Caps BLAS/OpenMP/torch threads. Must run before the model is imported."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS"):
+        os.environ[var] = str(num_threads)
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        torch.set_num_interop_threads(1)
+    except Exception:
+        pass
+
+
+def _worker_main(model_spec: str, num_threads: int, task_queue, result_queue):
+    """
+    Worker loop: load the model once, then synthesize batches until a None sentinel.
+    Each task is (job_id, [sentences], wav_path); the sentences are written as one WAV
+    to a temp name next to `wav_path`, which the parent renames only if the caller
+    is still waiting for it.
+    """
+    _limit_threads(num_threads)
+    try:
+        model = load_model(model_spec)
+    except Exception as e:
+        result_queue.put(("__init__", False, f"{type(e).__name__}: {e}"))
+        return
+    result_queue.put(("__init__", True, os.getpid()))
+
+    pause = b"\x00\x00" * int(model.sample_rate * 0.15)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        job_id, sentences, wav_path = task
+        tmp_path = _temp_path(wav_path, os.getpid())
+        try:
+            frames = 0
+            with wave.open(tmp_path, "wb") as out:
+                out.setnchannels(1)
+                out.setsampwidth(2)
+                out.setframerate(model.sample_rate)
+                for sentence in sentences:
+                    pcm = model.synthesize(sentence) + pause
+                    out.writeframes(pcm)
+                    frames += len(pcm) // 2
+            result_queue.put((job_id, True, (tmp_path, frames / float(model.sample_rate))))
+        except Exception as e:
+            _remove_quietly(tmp_path)
+            result_queue.put((job_id, False, f"{type(e).__name__}: {e}"))
+
+
+def _temp_path(wav_path: str, worker_pid: int) -> str:
+    return f"{wav_path}.{worker_pid}.tmp"
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _Worker:
+    """One worker process, its own task queue, and the jobs sent to it that have not finished."""
+
+    def __init__(self, process, task_queue):
+        self.process = process
+        self.task_queue = task_queue
+        self.jobs = set()
+        self.spawned_at = time.monotonic()
+
+
+class TTSWorkerPool:
+    """
+    Pool of long-lived local TTS worker processes.
+    Each worker loads its model once and is sent sentence batches on its own
+    queue (to the worker with the fewest outstanding jobs), so the model load
+    cost is paid once per worker instead of once per slide, and the pool
+    always knows which jobs a worker holds. A watcher thread notices a worker
+    dying, fails its jobs right away instead of leaving callers to time out,
+    and starts a replacement.
+    """
+
+    def __init__(self,
+                 num_workers: int = 2,
+                 threads_per_worker: int = 1,
+                 model_spec: str = DEFAULT_MODEL_SPEC,
+                 startup_timeout: float = 300.0,
+                 respawn_interval: float = 5.0):
+        self.num_workers = max(1, num_workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.model_spec = model_spec
+        self.startup_timeout = startup_timeout
+        self.respawn_interval = respawn_interval
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._result_queue = None
+        self._workers: List[_Worker] = []
+        self._pending = {}  # job_id -> (future, wav_path, worker)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._collector = None
+        self._watcher = None
+        self._started = False
+
+    def start(self):
+        """Starts the workers and blocks until every model has loaded."""
+        with self._lock:
+            if self._started:
+                return
+            self._result_queue = self._ctx.Queue()
+            ready = 0
+            errors = []
+            try:
+                for _ in range(self.num_workers):
+                    self._workers.append(self._spawn())
+
+                for _ in range(self.num_workers):
+                    try:
+                        job_id, ok, payload = self._result_queue.get(timeout=self.startup_timeout)
+                    except queue.Empty:
+                        raise RuntimeError(f"Local TTS workers did not load '{self.model_spec}' "
+                                           f"within {self.startup_timeout:.0f}s")
+                    if ok:
+                        ready += 1
+                    else:
+                        errors.append(payload)
+                if not ready:
+                    raise RuntimeError(f"No local TTS worker could load '{self.model_spec}': {errors}")
+            except BaseException:
+                # Not started: a retry would spawn a whole new set next to these
+                self._terminate()
+                raise
+            # Workers whose model failed to load have exited; the watcher replaces them
+            self._started = True
+            self._collector = threading.Thread(target=self._collect, name="tts-pool-collector", daemon=True)
+            self._collector.start()
+            self._watcher = threading.Thread(target=self._watch, name="tts-pool-watcher", daemon=True)
+            self._watcher.start()
+            atexit.register(self.shutdown)
+            print(f"✅ Local TTS pool ready ({ready}x '{self.model_spec}', {self.threads_per_worker} thread(s) each)")
+
+    def _spawn(self) -> _Worker:
+        task_queue = self._ctx.Queue()
+        p = self._ctx.Process(
+            target=_worker_main,
+            args=(self.model_spec, self.threads_per_worker, task_queue, self._result_queue),
+            daemon=True,
+        )
+        p.start()
+        return _Worker(p, task_queue)
+
+    def _collect(self):
+        """Routes worker results back to the futures of waiting callers."""
+        while True:
+            item = self._result_queue.get()
+            if item is None:
+                break
+            job_id, ok, payload = item
+            if job_id == "__init__":
+                if not ok:
+                    print(f"⚠️ Local TTS worker could not load '{self.model_spec}': {payload}")
+                continue
+            with self._lock:
+                future, wav_path, worker = self._pending.pop(job_id, (None, None, None))
+                if worker is not None:
+                    worker.jobs.discard(job_id)
+            # A caller that gave up has cancelled its future; its audio is not wanted
+            if future is None or not future.set_running_or_notify_cancel():
+                if ok:
+                    _remove_quietly(payload[0])
+                continue
+            if not ok:
+                future.set_exception(RuntimeError(payload))
+                continue
+            tmp_path, duration = payload
+            try:
+                os.replace(tmp_path, wav_path)
+                future.set_result((wav_path, duration))
+            except OSError as e:
+                _remove_quietly(tmp_path)
+                future.set_exception(e)
+
+    def _watch(self):
+        """Fails the jobs of workers that die and replaces them (at most once per respawn_interval each)."""
+        while self._started:
+            with self._lock:
+                sentinels = [w.process.sentinel for w in self._workers]
+            multiprocessing.connection.wait(sentinels, timeout=1.0)
+            failed = []
+            with self._lock:
+                if not self._started:
+                    return
+                for i, worker in enumerate(self._workers):
+                    if worker.process.is_alive():
+                        continue
+                    for job_id in worker.jobs:
+                        future, wav_path, _ = self._pending.pop(job_id)
+                        failed.append((future, wav_path, worker))
+                    worker.jobs.clear()
+                    if time.monotonic() - worker.spawned_at >= self.respawn_interval:
+                        print(f"⚠️ Local TTS worker {worker.process.pid} died "
+                              f"(exit code {worker.process.exitcode}); starting a replacement.")
+                        self._workers[i] = self._spawn()
+            for future, wav_path, worker in failed:
+                _remove_quietly(_temp_path(wav_path, worker.process.pid))
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(RuntimeError(
+                        f"Local TTS worker {worker.process.pid} died (exit code {worker.process.exitcode})"))
+            if not all(w.process.is_alive() for w in self._workers):
+                # A dead worker waiting for its respawn slot keeps its sentinel ready
+                time.sleep(min(1.0, self.respawn_interval))
+
+    def submit(self, sentences: List[str], wav_path: str) -> concurrent.futures.Future:
+        """Queues one batch of sentences to be synthesized into `wav_path`."""
+        if not self._started:
+            self.start()
+        future = concurrent.futures.Future()
+        job_id = next(self._ids)
+        with self._lock:
+            alive = [w for w in self._workers if w.process.is_alive()]
+            if not alive:
+                raise RuntimeError("No local TTS worker is running")
+            worker = min(alive, key=lambda w: len(w.jobs))
+            worker.jobs.add(job_id)
+            self._pending[job_id] = (future, wav_path, worker)
+        worker.task_queue.put((job_id, sentences, wav_path))
+        return future
+
+    def synthesize(self, text: str, wav_path: str, timeout: Optional[float] = None) -> tuple[str, float]:
+        """Blocking helper: synthesizes a script into a WAV and returns (path, duration)."""
+        sentences = split_sentences(text) or [text]
+        future = self.submit(sentences, wav_path)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            # Cancelled: the worker's output is discarded, never renamed to wav_path later.
+            # If the result is already being delivered, take it instead.
+            if not future.cancel():
+                return future.result()
+            raise
+
+    def alive_workers(self) -> int:
+        return sum(1 for w in self._workers if w.process.is_alive())
+
+    def _terminate(self):
+        for w in self._workers:
+            if w.process.is_alive():
+                w.process.terminate()
+        self._workers = []
+
+    def shutdown(self):
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            pending = [future for future, _, _ in self._pending.values()]
+            self._pending.clear()
+            workers = list(self._workers)
+        for w in workers:
+            w.task_queue.put(None)
+        for w in workers:
+            w.process.join(timeout=5)
+        with self._lock:
+            self._terminate()
+        self._result_queue.put(None)
+        for future in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Local TTS pool shut down"))
@@ -0,0 +1,80 @@
+import os
+
+# Mouth-openness levels shipped to the avatar. The frontend maps each level to a
+# viseme morph target with a fixed lookup table (see VISEME_TABLE in Ziva.jsx).
+NUM_LEVELS = 6
+
+
+class VisemeService:
+    """
+    Precomputes a compact mouth-openness timeline per slide from TTS audio energy,
+    so the avatar plays it back with a table lookup instead of analysing audio live.
+    """
+
+    def __init__(self):
+        self.fps = int(os.getenv("VISEME_FPS", "30"))
+        self.levels = NUM_LEVELS
+
+    def compute_timeline(self, audio_path: str) -> dict:
+        """
+        Returns {"fps", "levels", "encoding": "delta", "data": [...]}, where `data` is the
+        delta-encoded sequence of openness levels (first value absolute).
+        """
+        from pydub import AudioSegment
+        audio = AudioSegment.from_file(audio_path).set_channels(1)
+
+        step_ms = 1000.0 / self.fps
+        frames = int(len(audio) / step_ms)
+        energy = [audio[int(i * step_ms):int((i + 1) * step_ms)].rms for i in range(frames)]
+
+        return {
+            "fps": self.fps,
+            "levels": self.levels,
+            "encoding": "delta",
+            "data": self.delta_encode(self.quantize(energy)),
+        }
+
+    def quantize(self, energy: list) -> list:
+        """Maps per-frame RMS energy to openness levels 0..levels-1 with a noise gate and soft release."""
+        voiced = sorted(e for e in energy if e > 0)
+        if not voiced:
+            return [0] * len(energy)
+
+        # Normalise against the loud end of the clip rather than the single peak.
+        ref = voiced[max(0, int(len(voiced) * 0.95) - 1)]
+        floor = ref * 0.12
+        span = max(ref - floor, 1)
+
+        levels = []
+        prev = 0
+        for e in energy:
+            if e <= floor:
+                level = 0
+            else:
+                level = min(self.levels - 1, 1 + int((e - floor) / span * (self.levels - 1)))
+            # Close the mouth one level per frame instead of snapping shut.
+            level = max(level, prev - 1)
+            levels.append(level)
+            prev = level
+        return levels
+
+    @staticmethod
+    def delta_encode(values: list) -> list:
+        out = []
+        prev = 0
+        for v in values:
+            out.append(v - prev)
+            prev = v
+        return out
+
+    @staticmethod
+    def delta_decode(deltas: list) -> list:
+        out = []
+        acc = 0
+        for d in deltas:
+            acc += d
+            out.append(acc)
+        return out
+
+
+viseme_service = VisemeService()
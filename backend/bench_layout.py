@@ -0,0 +1,67 @@
+"""
+Benchmark: slide text wrapping on long scripts.
+
+Compares the old character-count heuristic (re-joins the whole line after every
+word, quadratic per line) with the measured TextLayout (cached glyph advances,
+single linear pass), and reports how many lines each produces that actually
+overflow the slide width when measured.
+
+Usage: python bench_layout.py [--words 5000] [--repeat 20]
+"""
+import argparse
+import random
+import time
+
+from app.services.slide_layout import TextLayout
+from app.services.slide_service import resolve_font
+
+MAX_WIDTH = 1720  # slide content width (1920 - 2 * 100 margin)
+
+VOCAB = ("gradient descent optimisation learning rate convergence parameter loss function "
+         "backpropagation regularisation overfitting mini-batch stochastic momentum adaptive "
+         "a of the to in is we and this that so").split()
+
+
+def heuristic_wrap(text, char_width=20, max_width=MAX_WIDTH):
+    """The pre-TextLayout SlideService._draw_text_wrapped line breaking, without drawing."""
+    lines = []
+    current_line = []
+    for word in text.split():
+        current_line.append(word)
+        if len(" ".join(current_line)) * char_width * 0.5 > max_width:
+            current_line.pop()
+            lines.append(" ".join(current_line))
+            current_line = [word]
+    lines.append(" ".join(current_line))
+    return lines
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    text = " ".join(random.choice(VOCAB) for _ in range(args.words))
+    font = resolve_font("body")
+    layout = TextLayout()
+
+    old_t, old_lines = timed(lambda: heuristic_wrap(text), args.repeat)
+    layout.wrap(text, font, MAX_WIDTH)  # warm the width cache, as a long-running server would be
+    new_t, new_lines = timed(lambda: layout.wrap(text, font, MAX_WIDTH), args.repeat)
+
+    def overflowing(lines):
+        return sum(1 for line in lines if font.getlength(line) > MAX_WIDTH)
+
+    print(f"📏 Wrapping {args.words} words to {MAX_WIDTH}px")
+    print(f"Heuristic wrap : {old_t * 1000:8.2f} ms, {len(old_lines):4d} lines, {overflowing(old_lines)} overflow")
+    print(f"TextLayout wrap: {new_t * 1000:8.2f} ms, {len(new_lines):4d} lines, {overflowing(new_lines)} overflow")
+    print(f"Speedup: {old_t / new_t:.2f}x")
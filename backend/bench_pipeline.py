@@ -0,0 +1,291 @@
+"""
+Offline microbenchmark suite for the lecture pipeline stages.
+
+Runs without network access: embeddings use the hashing stand-in backend (pass
+--real-embeddings to load the SentenceTransformer), lecture content comes from a
+fixed stub lecture instead of the LLM, narration MP3s are synthesized locally
+with ffmpeg, and PDFs are generated on the fly.
+
+Stages covered: PDF text extraction, chunking, embedding + index build and search
+at several corpus sizes (FAISS and the shared snapshot index), slide image and
+PPTX generation, MP3 duration probing, and scene compositing with ffmpeg.
+Stages whose dependency is missing are reported as skipped.
+
+Usage:
+    python bench_pipeline.py --out bench_baseline.json           # record a baseline
+    python bench_pipeline.py --compare bench_baseline.json       # exit 1 on regression
+    python bench_pipeline.py --quick --only search               # subset, smaller sizes
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+if "--real-embeddings" not in sys.argv:
+    os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("EMBEDDING_MODE", "local")
+os.environ.setdefault("RAG_INDEX_MODE", "memory")
+
+from loadtest.synthetic import synthetic_mp3, synthetic_pdf, synthetic_text, stub_lecture
+
+
+# ---------------------------------------------------------------- cases
+# Each case yields (name, fn, items): fn runs the measured work once and
+# `items` is what it processes per run (for the throughput column).
+
+def case_pdf(ctx):
+    from app.services.rag_service import rag_service
+    for pages in ctx.sizes([10, 100], [5, 20]):
+        path = os.path.join(ctx.workdir, f"synthetic_{pages}.pdf")
+        synthetic_pdf(path, pages)
+        yield f"rag.extract_text_from_pdf[pages={pages}]", lambda path=path: rag_service.extract_text_from_pdf(path), pages
+
+
+def case_chunks(ctx):
+    from app.services.rag_service import rag_service
+    for words in ctx.sizes([100_000, 1_000_000], [20_000, 100_000]):
+        text = synthetic_text(words)
+        yield f"rag.create_chunks[words={words}]", lambda text=text: rag_service.create_chunks(text), words
+
+
+def case_search(ctx):
+    from app.services.rag_service import rag_service
+
+    queries = [synthetic_text(8, 1000 + i) for i in range(50)]
+    for n_chunks in ctx.sizes([1_000, 10_000, 50_000], [500, 5_000]):
+        chunks = [synthetic_text(60, i) for i in range(n_chunks)]
+
+        def build(chunks=chunks):
+            rag_service.clear_index()
+            rag_service.add_to_index(chunks)
+        yield f"rag.embed_and_index[chunks={n_chunks}]", build, n_chunks
+
+        build()
+        yield f"rag.search[chunks={n_chunks}]", lambda: [rag_service.search(q, k=10) for q in queries], len(queries)
+
+
+def case_snapshot(ctx):
+    import numpy as np
+    from app.services.embedding_service import create_embedder
+    from app.services.index_store import IndexSnapshot
+
+    embedder = create_embedder("all-MiniLM-L6-v2")
+    queries = np.asarray(embedder.encode([synthetic_text(8, 1000 + i) for i in range(50)]), dtype=np.float32)
+    for n_chunks in ctx.sizes([1_000, 10_000, 50_000], [500, 5_000]):
+        chunks = [synthetic_text(60, i) for i in range(n_chunks)]
+        embeddings = np.asarray(embedder.encode(chunks), dtype=np.float32)
+        snapshot = IndexSnapshot(0, embeddings, (embeddings * embeddings).sum(axis=1), chunks, {})
+        yield (f"index.snapshot_search[chunks={n_chunks}]",
+               lambda snapshot=snapshot: [snapshot.search(q, 10) for q in queries], len(queries))
+
+
+def case_slides(ctx):
+    from app.services.slide_service import slide_service
+    slide_service.output_dir = ctx.workdir
+    lecture = stub_lecture(ctx.pick(20, 5))
+    slides = lecture["slides"]
+
+    def images():
+        for i, slide in enumerate(slides):
+            slide_service.generate_slide_image(slide, i + 1, filename=f"bench_slide_{i}.png")
+    yield f"slides.generate_slide_image[slides={len(slides)}]", images, len(slides)
+
+    try:
+        import pptx  # noqa: F401
+    except ImportError:
+        ctx.skip("slides.generate_presentation", "python-pptx not installed")
+        return
+    yield (f"slides.generate_presentation[slides={len(slides)}]",
+           lambda: slide_service.generate_presentation(lecture["lecture_title"], slides, filename="bench_deck.pptx"),
+           len(slides))
+
+
+def case_audio(ctx):
+    from app.services.tts_service import tts_service
+    for seconds in ctx.sizes([10, 120], [5, 30]):
+        path = os.path.join(ctx.workdir, f"narration_{seconds}.mp3")
+        synthetic_mp3(path, seconds)
+        yield f"tts.mp3_duration[seconds={seconds}]", lambda path=path: tts_service._get_mp3_duration(path), 1
+
+
+def case_composite(ctx):
+    from app.services.orchestrator_service import orchestrator_service
+    from app.services.slide_service import slide_service
+
+    slide_service.output_dir = ctx.workdir
+    slide = stub_lecture(1)["slides"][0]
+    image = slide_service.generate_slide_image(slide, 1, filename="bench_composite.png")
+    seconds = ctx.pick(20, 5)
+    audio = os.path.join(ctx.workdir, "composite.mp3")
+    synthetic_mp3(audio, seconds)
+    out = os.path.join(ctx.workdir, "composite.mp4")
+    yield (f"ffmpeg.composite_scene[seconds={seconds}]",
+           lambda: orchestrator_service._composite_scene(image, None, audio, out), 1)
+
+
+CASES = [
+    ("pdf", case_pdf, ["fitz"]),
+    ("chunks", case_chunks, []),
+    ("search", case_search, ["faiss"]),
+    ("snapshot", case_snapshot, []),
+    ("slides", case_slides, ["PIL"]),
+    ("audio", case_audio, ["pydub", "ffmpeg", "ffprobe"]),
+    ("composite", case_composite, ["PIL", "ffmpeg"]),
+]
+
+
+# ---------------------------------------------------------------- harness
+
+class Context:
+    def __init__(self, workdir: str, quick: bool):
+        self.workdir = workdir
+        self.quick = quick
+        self.skipped = {}
+
+    def pick(self, full, quick):
+        return quick if self.quick else full
+
+    def sizes(self, full: list, quick: list) -> list:
+        return quick if self.quick else full
+
+    def skip(self, name: str, reason: str):
+        self.skipped[name] = reason
+        print(f"{name:<46} skipped ({reason})")
+
+
+def missing_dependency(names: list):
+    for name in names:
+        if name in ("ffmpeg", "ffprobe"):
+            if not shutil.which(name):
+                return f"{name} not in PATH"
+            continue
+        try:
+            __import__(name)
+        except ImportError:
+            return f"{name} not installed"
+    return None
+
+
+def measure(fn, repeat: int, warmup: int = 1) -> list:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run_suite(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    ctx = Context(workdir, args.quick)
+    results = {}
+    print(f"{'benchmark':<46} {'median':>10} {'min':>10} {'items/s':>12}")
+    try:
+        for case, fn, deps in CASES:
+            if args.only and not any(o in case for o in args.only):
+                continue
+            reason = missing_dependency(deps)
+            if reason:
+                ctx.skip(case, reason)
+                continue
+            try:
+                for name, run, items in fn(ctx):
+                    if args.only and not any(o in case or o in name for o in args.only):
+                        continue
+                    times = measure(run, args.repeat)
+                    median = statistics.median(times)
+                    results[name] = {
+                        "median_ms": round(median * 1000, 3),
+                        "min_ms": round(min(times) * 1000, 3),
+                        "mean_ms": round(statistics.fmean(times) * 1000, 3),
+                        "runs": len(times),
+                        "items": items,
+                        "items_per_s": round(items / median, 2) if median else None,
+                    }
+                    print(f"{name:<46} {median * 1000:9.1f}ms {min(times) * 1000:9.1f}ms "
+                          f"{results[name]['items_per_s'] or 0:12.1f}")
+            except Exception as e:
+                ctx.skip(case, f"{type(e).__name__}: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": time.time(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+            "repeat": args.repeat,
+            "only": args.only or [],
+            "embedding_backend": os.environ.get("EMBEDDING_BACKEND", "sentence-transformers"),
+        },
+        "results": results,
+        "skipped": ctx.skipped,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> int:
+    """Prints median ratios against the baseline; returns the number of regressions."""
+    regressions = 0
+    print(f"\n{'benchmark':<46} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<46} {'-':>10} {result['median_ms']:9.1f}ms {'new':>7}")
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  ❌ regression"
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            flag = "  ✅ faster"
+        print(f"{name:<46} {base['median_ms']:9.1f}ms {result['median_ms']:9.1f}ms {ratio:6.2f}x{flag}")
+    for name in baseline.get("results", {}):
+        if name not in current["results"] and not current["meta"]["only"]:
+            print(f"{name:<46} missing from this run")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed median slowdown (0.15 = 15%%)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Smaller corpus/deck sizes")
+    parser.add_argument("--only", nargs="*", help="Run cases/benchmarks whose name contains any of these")
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the SentenceTransformer model")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Results written to {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {regressions} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions.")
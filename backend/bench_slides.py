@@ -0,0 +1,75 @@
+"""
+Microbenchmark: slide image rendering throughput (slides/second).
+
+Compares a cold renderer per slide (fonts + template rebuilt every time, like the
+old generate_slide_image) against the shared cached SlideRenderer.
+
+With --deck N it also times a whole N-slide deck rasterized in SlideService's
+process pool (PNG bytes out) against the same deck rendered serially.
+
+Usage: python bench_slides.py [--slides 50] [--save] [--deck 20]
+"""
+import argparse
+import io
+import time
+
+from app.services.slide_service import SlideRenderer, resolve_font, slide_service
+
+SAMPLE_SLIDE = {
+    "heading": "Gradient Descent Explained",
+    "summary": "Gradient descent iteratively moves parameters against the gradient of the loss "
+               "to find a local minimum, with the learning rate controlling the step size.",
+    "important_points": [
+        "The gradient points towards steepest ascent",
+        "Too large a learning rate diverges",
+        "Mini-batches trade noise for speed",
+    ],
+    "code": "for epoch in range(epochs):\n    w -= lr * grad(loss, w)",
+}
+
+
+def run(label, render_one, n, save):
+    start = time.perf_counter()
+    for i in range(n):
+        img = render_one(i)
+        if save:
+            img.save(io.BytesIO(), format="PNG")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n / elapsed:8.1f} slides/s   ({elapsed * 1000 / n:.1f} ms/slide)")
+    return n / elapsed
+
+
+def cold_render(i):
+    resolve_font.cache_clear()
+    return SlideRenderer().render(SAMPLE_SLIDE, i)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slides", type=int, default=50)
+    parser.add_argument("--save", action="store_true", help="Include PNG encoding in the timing")
+    parser.add_argument("--deck", type=int, default=0, help="Also time process-pool rendering of an N-slide deck")
+    args = parser.parse_args()
+
+    print(f"⏱️  Rendering {args.slides} slides (PNG encode {'on' if args.save else 'off'})")
+    cold = run("Cold (no caching)", cold_render, args.slides, args.save)
+
+    renderer = SlideRenderer()
+    warm = run("Cached SlideRenderer", lambda i: renderer.render(SAMPLE_SLIDE, i), args.slides, args.save)
+    print(f"Speedup: {warm / cold:.2f}x")
+
+    if args.deck:
+        deck = [dict(SAMPLE_SLIDE, scene_id=i + 1) for i in range(args.deck)]
+        start = time.perf_counter()
+        for scene in deck:
+            renderer.render(scene, scene["scene_id"]).save(io.BytesIO(), format="PNG")
+        serial = time.perf_counter() - start
+
+        slide_service.render_slides_parallel(deck[:slide_service.render_workers], as_bytes=True)  # warm up workers
+        start = time.perf_counter()
+        slide_service.render_slides_parallel(deck, as_bytes=True)
+        parallel = time.perf_counter() - start
+        slide_service.shutdown()
+
+        print(f"Deck of {args.deck}: serial {serial:.2f}s, process pool ({slide_service.render_workers} workers) "
+              f"{parallel:.2f}s -> {serial / parallel:.2f}x")
@@ -0,0 +1,276 @@
+"""
+Batch course builder: pre-builds lectures for a directory or manifest of PDFs.
+
+Each PDF runs ingest -> script (LLM) -> PPTX -> narration (TTS) in its own
+worker process, using the service classes directly (no server needed). A
+lecture is already sequential inside one document, so throughput comes from
+running many documents side by side; --workers defaults to the CPU count.
+
+Input is a directory (searched recursively for *.pdf) or a manifest: a .json
+list of paths or {"path": ..., "target_minutes": ...} objects, or a text file
+with one path per line (# comments allowed). Relative paths are resolved
+against the manifest's directory.
+
+Results go to --out (default data/batches/<input name>):
+    <document_id>_<N>min.json   per-document result: status, lecture_id, stage timings, error,
+                                and the document record (batch ingests never touch the
+                                server's data/documents or its RAG index)
+    summary.json                totals for the run
+
+Re-running with the same --out resumes: documents already "done" (with their
+lecture still on disk) are skipped and everything else is retried. Documents
+lectured before with the same settings come straight from the lecture index
+unless --force is given. Lectures appear under data/lectures/ like ones made
+through the API, and are viewable at /show/<lecture_id>.
+
+Run from backend/ (the services resolve data/ against the working directory):
+    python build_course.py course_pdfs/
+    python build_course.py physics101.json --workers 16 --target-minutes 15
+    python build_course.py course_pdfs/ --out data/batches/retry --force
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+# Each process indexes its own document; shared mode would search the server's published index
+os.environ["RAG_INDEX_MODE"] = "memory"
+
+
+# ---------------------------------------------------------------- inputs
+
+def collect_inputs(source: str, target_minutes: int) -> list:
+    """[(absolute pdf path, target_minutes)] from a directory or manifest."""
+    if os.path.isdir(source):
+        paths = []
+        for dirpath, _, filenames in os.walk(source):
+            paths += [os.path.join(dirpath, n) for n in filenames if n.lower().endswith(".pdf")]
+        return [(os.path.abspath(p), target_minutes) for p in sorted(paths)]
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        if source.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    inputs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        inputs.append((os.path.abspath(os.path.join(base, entry["path"])),
+                       int(entry.get("target_minutes", target_minutes))))
+    return inputs
+
+
+def document_id_for(path: str) -> str:
+    # Same content address DocumentService uses
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()[:16]
+
+
+def result_path(out_dir: str, document_id: str, target_minutes: int) -> str:
+    return os.path.join(out_dir, f"{document_id}_{target_minutes}min.json")
+
+
+def read_result(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_result(path: str, result: dict):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------- worker
+
+def init_worker(threads: int):
+    # Split the cores between processes instead of every torch/BLAS pool claiming all of them
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(name, str(threads))
+    # Load the embedding model, LLM clients etc. once per process, not per document
+    import app.services.lecture_service  # noqa: F401
+
+
+def build_document(task: dict) -> dict:
+    from app.services.document_service import document_service
+    from app.services.lecture_service import lecture_service
+    from app.services.lecture_index import lecture_index, has_placeholder_audio
+
+    result = {
+        "source": task["source"],
+        "document_id": task["document_id"],
+        "target_minutes": task["target_minutes"],
+        "status": "running",
+        "lecture_id": None,
+        "cached": False,
+        "error": None,
+        "timings": {},
+        "worker_pid": os.getpid(),
+        "started_at": time.time(),
+    }
+    write_result(task["result_path"], result)
+    started = time.perf_counter()
+    try:
+        # Indexed privately in this process; the document's state lives only in this result file
+        doc = document_service.ingest_file(task["source"])
+        result["timings"]["ingest"] = round(time.perf_counter() - started, 3)
+        result["document"] = doc
+        if doc["status"] != "indexed":
+            raise RuntimeError(f"Ingest failed: {doc['error']}")
+        result["chunks"] = doc["chunks_count"]
+
+        key = lecture_index.key(doc["sha256"], task["target_minutes"])
+        lecture_id = None if task["force"] else lecture_index.lookup(key)
+        if lecture_id:
+            result.update(lecture_id=lecture_id, cached=True)
+        else:
+            lecture_id = str(uuid.uuid4())
+            stage = {"name": None, "at": time.perf_counter()}
+
+            def progress(event: str, **data):
+                # Time between stage events = time spent in the previous stage
+                if event == "stage":
+                    now = time.perf_counter()
+                    if stage["name"]:
+                        result["timings"][stage["name"]] = round(now - stage["at"], 3)
+                    stage.update(name=data["stage"], at=now)
+
+            lecture = lecture_service.generate(lecture_id, task["target_minutes"], progress)
+            result["timings"][stage["name"]] = round(time.perf_counter() - stage["at"], 3)
+            if lecture.get("document_id") == doc["document_id"]:
+                lecture_index.record(key, lecture_id, lecture)
+            slides = lecture.get("slides", [])
+            result.update(lecture_id=lecture_id, slides=len(slides),
+                          tts_failures=sum(1 for s in slides if has_placeholder_audio({"slides": [s]})))
+        result["status"] = "done"
+    except Exception as e:
+        result.update(status="failed", error=str(e))
+    result["timings"]["total"] = round(time.perf_counter() - started, 3)
+    result["finished_at"] = time.time()
+    write_result(task["result_path"], result)
+    return result
+
+
+# ---------------------------------------------------------------- driver
+
+def plan(inputs: list, out_dir: str, force: bool):
+    from app.services.lecture_store import lecture_store
+
+    tasks, skipped = [], []
+    seen = set()
+    for source, target_minutes in inputs:
+        if not os.path.exists(source):
+            print(f"⚠️ Missing: {source}")
+            continue
+        document_id = document_id_for(source)
+        if (document_id, target_minutes) in seen:
+            print(f"⚠️ Duplicate content, skipping: {source}")
+            continue
+        seen.add((document_id, target_minutes))
+        path = result_path(out_dir, document_id, target_minutes)
+        previous = read_result(path)
+        if (not force and previous and previous["status"] == "done"
+                and os.path.exists(lecture_store.path(previous["lecture_id"]))):
+            skipped.append(previous)
+            continue
+        tasks.append({"source": source, "document_id": document_id, "target_minutes": target_minutes,
+                      "result_path": path, "force": force})
+    return tasks, skipped
+
+
+def run(tasks: list, workers: int) -> list:
+    results = []
+    if not tasks:
+        return results
+    started = time.perf_counter()
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # spawn: workers load their own models instead of inheriting a forked copy of the parent
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(build_document, task): task for task in tasks}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                task = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker died (crash, OOM kill) before it could record anything useful
+                    result = {"source": task["source"], "document_id": task["document_id"],
+                              "target_minutes": task["target_minutes"], "status": "failed",
+                              "lecture_id": None, "error": f"Worker failed: {e!r}", "timings": {}}
+                    write_result(task["result_path"], result)
+                results.append(result)
+
+                elapsed = time.perf_counter() - started
+                remaining = len(tasks) - len(results)
+                eta = elapsed / len(results) * remaining
+                name = os.path.basename(result["source"])
+                if result["status"] == "done":
+                    how = "from lecture index" if result.get("cached") else f"{result['timings']['total']:.1f}s"
+                    line = f"✅ {name} -> {result['lecture_id']} ({how})"
+                else:
+                    line = f"❌ {name}: {result['error']}"
+                print(f"[{len(results)}/{len(tasks)}] {line}  (eta {eta / 60:.1f} min)", flush=True)
+        except KeyboardInterrupt:
+            print("\n⏹ Interrupted; finished documents are saved. Re-run with the same --out to resume.")
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-build lectures for a course's PDFs")
+    parser.add_argument("source", help="Directory of PDFs, or a .json / .txt manifest")
+    parser.add_argument("--out", default=None, help="Result directory (default data/batches/<source name>)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--target-minutes", type=int, default=10, help="Default lecture length")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate everything, ignoring earlier results and the lecture index")
+    args = parser.parse_args()
+
+    out_dir = args.out or os.path.join("data", "batches", os.path.splitext(os.path.basename(os.path.normpath(args.source)))[0])
+    os.makedirs(out_dir, exist_ok=True)
+
+    inputs = collect_inputs(args.source, args.target_minutes)
+    tasks, skipped = plan(inputs, out_dir, args.force)
+    workers = max(1, min(args.workers, len(tasks) or 1))
+    print(f"📚 {len(inputs)} document(s): {len(skipped)} already done, {len(tasks)} to build "
+          f"with {workers} worker process(es). Results in {out_dir}")
+
+    wall = time.perf_counter()
+    results = run(tasks, workers)
+    wall = time.perf_counter() - wall
+
+    done = [r for r in results if r["status"] == "done"]
+    failed = [r for r in results if r["status"] != "done"]
+    summary = {
+        "source": os.path.abspath(args.source),
+        "finished_at": time.time(),
+        "wall_seconds": round(wall, 3),
+        "workers": workers,
+        "documents": len(inputs),
+        "skipped": len(skipped),
+        "built": len(done),
+        "from_index": sum(1 for r in done if r.get("cached")),
+        "failed": len(failed),
+        "documents_per_hour": round(len(done) / wall * 3600, 2) if done and wall else None,
+        "results": sorted(skipped + results, key=lambda r: r["source"]),
+    }
+    write_result(os.path.join(out_dir, "summary.json"), summary)
+    print(f"🏁 {len(done)} built ({summary['from_index']} from the lecture index), {len(failed)} failed, "
+          f"{len(skipped)} skipped in {wall / 60:.1f} min.")
+    sys.exit(1 if failed else 0)
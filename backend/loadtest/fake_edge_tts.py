@@ -0,0 +1,33 @@
+"""
+Drop-in for the `edge-tts` CLI that fetches narration from stub_providers.py.
+
+    EDGE_TTS_COMMAND="python -m loadtest.fake_edge_tts"
+
+Accepts the flags TTSService passes (--text, --write-media, --voice) and exits
+non-zero on failure, like the real CLI.
+"""
+import os
+import sys
+import json
+import argparse
+import urllib.error
+import urllib.request
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="edge-tts stand-in")
+    parser.add_argument("--text", required=True)
+    parser.add_argument("--write-media", required=True)
+    parser.add_argument("--voice", default="")
+    args = parser.parse_args()
+
+    url = os.getenv("STUB_PROVIDERS_URL", "http://127.0.0.1:8801").rstrip("/") + "/tts"
+    request = urllib.request.Request(url, data=json.dumps({"text": args.text, "voice": args.voice}).encode(),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            audio = response.read()
+    except (urllib.error.URLError, OSError) as e:
+        print(f"fake edge-tts: {e}", file=sys.stderr)
+        sys.exit(1)
+    with open(args.write_media, "wb") as f:
+        f.write(audio)
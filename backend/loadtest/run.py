@@ -0,0 +1,311 @@
+"""
+Closed-loop load generator for the API: N virtual users run a weighted mix of
+scenarios for a fixed time and the run is summarised per endpoint.
+
+Scenarios:
+    upload    POST /api/upload-pdf (unique synthetic PDF), then poll the document until indexed
+    generate  POST /api/generate-lecture, then poll /api/jobs/{id} until done
+    read      GET /api/lecture/{id} for a finished lecture (or /api/documents/latest before one exists)
+
+Reported: requests, errors, throughput, p50/p95/p99/max latency per endpoint
+(including the end-to-end "ingest" and "lecture job" times), HTTP status counts,
+and the server's event-loop lag over the run (from /metrics).
+
+Start the stand-ins and the API first, e.g.:
+
+    python -m loadtest.stub_providers &
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8801/v1 \\
+    EDGE_TTS_COMMAND="python -m loadtest.fake_edge_tts" EMBEDDING_BACKEND=hashing \\
+    uvicorn app.main:app --port 8000 &
+
+Usage:
+    python -m loadtest.run --users 16 --duration 120 --mix upload=1,generate=2,read=8 --out load.json
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+from loadtest.synthetic import synthetic_pdf_bytes
+
+TERMINAL_DOCUMENT_STATUSES = ("indexed", "failed", "superseded")
+TERMINAL_JOB_STATUSES = ("done", "failed")
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, seconds: float, status, ok: bool):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            codes = self.statuses.setdefault(name, {})
+            codes[str(status)] = codes.get(str(status), 0) + 1
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        with self._lock:
+            out = {}
+            for name, samples in sorted(self.latencies.items()):
+                samples = sorted(samples)
+                out[name] = {
+                    "requests": len(samples),
+                    "errors": self.errors.get(name, 0),
+                    "throughput_per_s": round(len(samples) / elapsed, 3),
+                    "p50_ms": round(percentile(samples, 50) * 1000, 1),
+                    "p95_ms": round(percentile(samples, 95) * 1000, 1),
+                    "p99_ms": round(percentile(samples, 99) * 1000, 1),
+                    "max_ms": round(samples[-1] * 1000, 1),
+                    "statuses": self.statuses.get(name, {}),
+                }
+            return out
+
+
+def percentile(sorted_samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(round(p / 100.0 * len(sorted_samples) + 0.4999)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+# ---------------------------------------------------------------- HTTP
+
+class Client:
+    def __init__(self, base_url: str, recorder: Recorder, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.timeout = timeout
+
+    def request(self, name: str, method: str, path: str, body: bytes = None, headers: dict = None,
+                ok_statuses=(200, 202)):
+        """Timed request; returns (status, parsed JSON or None). Network errors are status 0."""
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        started = time.perf_counter()
+        status, payload = 0, None
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                status, raw = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, raw = e.code, e.read()
+        except OSError:
+            raw = b""
+        elapsed = time.perf_counter() - started
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            payload = None
+        if name:
+            self.recorder.record(name, elapsed, status, status in ok_statuses)
+        return status, payload
+
+    def get_text(self, path: str) -> str:
+        with urllib.request.urlopen(self.base_url + path, timeout=self.timeout) as response:
+            return response.read().decode("utf-8")
+
+
+def multipart_pdf(data: bytes, filename: str):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+# ---------------------------------------------------------------- scenarios
+
+class Scenarios:
+    def __init__(self, client: Client, args, stop: threading.Event):
+        self.client = client
+        self.args = args
+        self.stop = stop
+        self.lectures: List[str] = []
+        self._lock = threading.Lock()
+        self._upload_seq = 0
+
+    def _poll(self, path: str, field: str, terminal: tuple, timeout: float, interval: float) -> Optional[dict]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status, payload = self.client.request(None, "GET", path)
+            if status == 200 and payload and payload.get(field) in terminal:
+                return payload
+            time.sleep(interval)
+        return None
+
+    def upload(self):
+        with self._lock:
+            self._upload_seq += 1
+            seq = self._upload_seq
+        body, headers = multipart_pdf(synthetic_pdf_bytes(self.args.pages, seed=seq * 7919 + random.getrandbits(16)),
+                                      f"load_{seq}.pdf")
+        started = time.perf_counter()
+        status, doc = self.client.request("POST /api/upload-pdf", "POST", "/api/upload-pdf", body, headers)
+        if status != 202 or not doc:
+            return
+        final = self._poll(doc["status_url"], "status", TERMINAL_DOCUMENT_STATUSES, self.args.job_timeout, 0.25)
+        ok = bool(final) and final["status"] != "failed"
+        self.client.recorder.record("ingest (end-to-end)", time.perf_counter() - started,
+                                    final["status"] if final else "timeout", ok)
+
+    def generate(self):
+        body = json.dumps({"document_id": "latest", "target_minutes": self.args.target_minutes}).encode()
+        started = time.perf_counter()
+        status, job = self.client.request("POST /api/generate-lecture", "POST", "/api/generate-lecture", body,
+                                          {"Content-Type": "application/json"})
+        if status != 202 or not job:
+            return
+        final = self._poll(f"/api/jobs/{job['job_id']}", "status", TERMINAL_JOB_STATUSES, self.args.job_timeout, 0.5)
+        ok = bool(final) and final["status"] == "done"
+        self.client.recorder.record("lecture job (end-to-end)", time.perf_counter() - started,
+                                    final["status"] if final else "timeout", ok)
+        if ok:
+            with self._lock:
+                self.lectures.append(job["lecture_id"])
+
+    def read(self):
+        with self._lock:
+            lecture_id = random.choice(self.lectures) if self.lectures else None
+        if lecture_id:
+            self.client.request("GET /api/lecture/{id}", "GET", f"/api/lecture/{lecture_id}",
+                                headers={"Accept-Encoding": "gzip"})
+        else:
+            self.client.request("GET /api/documents/latest", "GET", "/api/documents/latest")
+
+    def user(self, mix: List[tuple]):
+        names, weights = zip(*mix)
+        while not self.stop.is_set():
+            getattr(self, random.choices(names, weights)[0])()
+            if self.args.think_ms:
+                time.sleep(random.expovariate(1000.0 / self.args.think_ms))
+
+
+# ---------------------------------------------------------------- event-loop lag
+
+def scrape_histogram(text: str, name: str) -> Dict[float, float]:
+    """Cumulative bucket counts {le: count} of one unlabelled Prometheus histogram."""
+    buckets = {}
+    prefix = f"{name}_bucket{{le=\""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            le, value = line[len(prefix):].split("\"}", 1)
+            buckets[float("inf") if le == "+Inf" else float(le)] = float(value)
+    return buckets
+
+
+def histogram_quantile(q: float, buckets: Dict[float, float]) -> Optional[float]:
+    """Prometheus-style quantile estimate with linear interpolation inside the bucket."""
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] == 0:
+        return None
+    target = q * buckets[bounds[-1]]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= target:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (target - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def event_loop_lag(before: str, after: str) -> dict:
+    name = "aiguruji_event_loop_lag_seconds"
+    start, end = scrape_histogram(before, name), scrape_histogram(after, name)
+    if not end:
+        return {"available": False}
+    delta = {le: end[le] - start.get(le, 0.0) for le in end}
+    quantiles = {f"p{int(q * 100)}_ms": histogram_quantile(q, delta) for q in (0.5, 0.95, 0.99)}
+    total = delta.get(float("inf"), 0.0)
+    return {
+        "available": True,
+        "samples": int(total),
+        **{k: round(v * 1000, 2) if v is not None else None for k, v in quantiles.items()},
+        "samples_over_100ms": int(total - delta.get(0.1, total)),
+    }
+
+
+# ---------------------------------------------------------------- main
+
+def parse_mix(spec: str) -> List[tuple]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("upload", "generate", "read"):
+            raise SystemExit(f"Unknown scenario '{name}' in --mix")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<30} {'reqs':>6} {'err':>5} {'rps':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, r in report["endpoints"].items():
+        print(f"{name:<30} {r['requests']:>6} {r['errors']:>5} {r['throughput_per_s']:>7.2f} "
+              f"{r['p50_ms']:>7.0f}ms {r['p95_ms']:>7.0f}ms {r['p99_ms']:>7.0f}ms {r['max_ms']:>7.0f}ms")
+    lag = report["event_loop_lag"]
+    if lag.get("available"):
+        print(f"\nEvent-loop lag: p50 {lag['p50_ms']}ms, p95 {lag['p95_ms']}ms, p99 {lag['p99_ms']}ms "
+              f"({lag['samples_over_100ms']} of {lag['samples']} samples over 100ms)")
+    else:
+        print("\nEvent-loop lag: not exposed by the server (EVENT_LOOP_LAG_INTERVAL_MS=0?)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mixed-traffic load test for the lecture API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to generate load")
+    parser.add_argument("--mix", default="upload=1,generate=2,read=8", help="Scenario weights")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a user's requests")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per uploaded PDF")
+    parser.add_argument("--target-minutes", type=int, default=2)
+    parser.add_argument("--job-timeout", type=float, default=900)
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--out", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    client = Client(args.base_url, recorder, args.request_timeout)
+    stop = threading.Event()
+    scenarios = Scenarios(client, args, stop)
+
+    # Generation needs an indexed document; seed one outside the measured window
+    print("⏳ Seeding one indexed document...")
+    scenarios.upload()
+    recorder = client.recorder = Recorder()
+
+    metrics_before = client.get_text("/metrics")
+    mix = parse_mix(args.mix)
+    print(f"🚀 {args.users} users, {args.duration:.0f}s, mix {args.mix}")
+    started = time.perf_counter()
+    users = [threading.Thread(target=scenarios.user, args=(mix,), daemon=True) for _ in range(args.users)]
+    for t in users:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    print("⏳ Waiting for in-flight scenarios to finish...")
+    for t in users:
+        t.join(timeout=args.job_timeout)
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "config": vars(args),
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": recorder.summary(elapsed),
+        "event_loop_lag": event_loop_lag(metrics_before, client.get_text("/metrics")),
+    }
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Report written to {args.out}")
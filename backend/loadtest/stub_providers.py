@@ -0,0 +1,172 @@
+"""
+Local stand-ins for the external providers, with configurable latency, jitter
+and failure rate, so load tests measure this service and not the network.
+
+    POST /v1/chat/completions                      OpenAI-compatible chat completion
+    POST /v1beta/models/<model>:generateContent    Gemini REST generateContent
+    POST /tts                                      MP3 narration (used by fake_edge_tts.py)
+    GET  /stats                                    request/failure counts per provider
+
+Point the backend at it with:
+
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8801/v1
+    GEMINI_API_KEY=stub GEMINI_API_ENDPOINT=http://127.0.0.1:8801
+    EDGE_TTS_COMMAND="python -m loadtest.fake_edge_tts"   (STUB_PROVIDERS_URL if not the default)
+
+Usage:
+    python -m loadtest.stub_providers --llm-latency-ms 3000 --llm-jitter-ms 1000 --tts-failure-rate 0.05
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loadtest.synthetic import stub_lecture, synthetic_mp3
+
+
+class ProviderProfile:
+    def __init__(self, latency_ms: float, jitter_ms: float, failure_rate: float):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.failure_rate = failure_rate
+
+    def wait(self) -> bool:
+        """Sleeps for one simulated call; False if this call should fail."""
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)) if self.jitter else self.latency)
+        return random.random() >= self.failure_rate
+
+
+class StubState:
+    def __init__(self, args):
+        self.profiles = {
+            "openai": ProviderProfile(args.llm_latency_ms, args.llm_jitter_ms, args.llm_failure_rate),
+            "gemini": ProviderProfile(args.llm_latency_ms, args.llm_jitter_ms, args.llm_failure_rate),
+            "tts": ProviderProfile(args.tts_latency_ms, args.tts_jitter_ms, args.tts_failure_rate),
+        }
+        self.lecture = json.dumps(stub_lecture(args.slides))
+        self.audio_dir = tempfile.mkdtemp(prefix="stub_tts_")
+        self._audio_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.counts = {name: {"requests": 0, "failures": 0} for name in self.profiles}
+
+    def record(self, provider: str, ok: bool):
+        with self._lock:
+            self.counts[provider]["requests"] += 1
+            if not ok:
+                self.counts[provider]["failures"] += 1
+
+    def narration(self, text: str) -> bytes:
+        # ~150 words per minute, rounded to half seconds so a handful of files cover every request
+        seconds = max(1.0, round(len(text.split()) / 2.5 * 2) / 2)
+        path = os.path.join(self.audio_dir, f"{seconds:.1f}.mp3")
+        with self._audio_lock:
+            if not os.path.exists(path):
+                synthetic_mp3(path, seconds)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: StubState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: dict):
+        self._send(status, json.dumps(data).encode("utf-8"))
+
+    def _read_json(self) -> dict:
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        return json.loads(raw or b"{}")
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.state.counts)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self._read_json()
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/chat/completions"):
+            self._openai(body)
+        elif path.endswith(":generateContent"):
+            self._gemini(path)
+        elif path == "/tts":
+            self._tts(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _openai(self, body: dict):
+        ok = self.state.profiles["openai"].wait()
+        self.state.record("openai", ok)
+        if not ok:
+            self._send_json(503, {"error": {"message": "stub: injected failure", "type": "server_error"}})
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": self.state.lecture}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _gemini(self, path: str):
+        ok = self.state.profiles["gemini"].wait()
+        self.state.record("gemini", ok)
+        if not ok:
+            self._send_json(503, {"error": {"code": 503, "message": "stub: injected failure", "status": "UNAVAILABLE"}})
+            return
+        self._send_json(200, {
+            "candidates": [{"index": 0, "finishReason": "STOP",
+                            "content": {"role": "model", "parts": [{"text": self.state.lecture}]}}],
+            "modelVersion": path.rsplit("/", 1)[-1].split(":", 1)[0],
+        })
+
+    def _tts(self, body: dict):
+        ok = self.state.profiles["tts"].wait()
+        self.state.record("tts", ok)
+        if not ok:
+            self._send_json(503, {"error": "stub: injected failure"})
+            return
+        self._send(200, self.state.narration(body.get("text", "")), "audio/mpeg")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local LLM/TTS stand-ins for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--slides", type=int, default=6, help="Slides per generated lecture")
+    parser.add_argument("--llm-latency-ms", type=float, default=2000)
+    parser.add_argument("--llm-jitter-ms", type=float, default=500)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=300)
+    parser.add_argument("--tts-jitter-ms", type=float, default=100)
+    parser.add_argument("--tts-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    StubHandler.state = StubState(args)
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    print(f"✅ Stub providers listening on http://{args.host}:{args.port} "
+          f"(LLM {args.llm_latency_ms:.0f}±{args.llm_jitter_ms:.0f}ms, TTS {args.tts_latency_ms:.0f}±{args.tts_jitter_ms:.0f}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
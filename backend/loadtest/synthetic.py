@@ -0,0 +1,61 @@
+"""Synthetic inputs shared by bench_pipeline.py and the load test: text, lectures, PDFs, MP3s."""
+import subprocess
+
+WORDS = ("gradient descent optimizes the loss function by stepping against the gradient while "
+         "the learning rate controls step size and momentum smooths noisy mini batch updates "
+         "regularization limits model capacity and validation data guides early stopping").split()
+
+
+def synthetic_text(n_words: int, seed: int = 0) -> str:
+    return " ".join(WORDS[(i * 7 + seed) % len(WORDS)] for i in range(n_words))
+
+
+def stub_lecture(n_slides: int) -> dict:
+    """Stands in for LLMService.generate_lecture_content."""
+    return {
+        "lecture_title": "Benchmark Lecture",
+        "slides": [{
+            "heading": f"Topic {i + 1}: Optimisation",
+            "summary": synthetic_text(40, i),
+            "important_points": [synthetic_text(9, i + k) for k in range(4)],
+            "script": synthetic_text(150, i),
+            "code": "for step in range(n):\n    w -= lr * grad(w)" if i % 2 else "",
+        } for i in range(n_slides)],
+    }
+
+
+def synthetic_pdf_bytes(pages: int, lines_per_page: int = 45, seed: int = 0) -> bytes:
+    """Minimal multi-page PDF (Helvetica text) written by hand; no PDF library needed."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = [synthetic_text(12, seed + p * lines_per_page + i) for i in range(lines_per_page)]
+        text = "BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(text)} >>\nstream\n{text}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def synthetic_pdf(path: str, pages: int, lines_per_page: int = 45):
+    with open(path, "wb") as f:
+        f.write(synthetic_pdf_bytes(pages, lines_per_page))
+
+
+def synthetic_mp3(path: str, seconds: float):
+    subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+                    "-ar", "24000", "-b:a", "48k", path],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
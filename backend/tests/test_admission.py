@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from app.core.admission import AdmissionQueue, OverloadedError, StageLimiter
+
+
+def test_queue_refuses_past_capacity_with_429():
+    queue = AdmissionQueue("test", capacity=2, workers=1, initial_duration=10)
+    queue.try_enter()
+    queue.try_enter()
+    with pytest.raises(OverloadedError) as excinfo:
+        queue.try_enter()
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retry_after == 20
+    queue.leave(duration=1.0)
+    queue.try_enter()
+    assert queue.outstanding == 2
+
+
+def test_queue_force_admits_recovered_work():
+    queue = AdmissionQueue("test", capacity=1)
+    queue.try_enter()
+    queue.try_enter(force=True)
+    assert queue.outstanding == 2
+
+
+def test_stage_rejects_when_wait_queue_is_full():
+    limiter = StageLimiter("test", limit=1, max_queue=0, timeout=5)
+    limiter.acquire()
+    with pytest.raises(OverloadedError) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.status_code == 503
+    limiter.release()
+    assert limiter.in_use == 0
+
+
+def test_stage_wait_times_out():
+    limiter = StageLimiter("test", limit=1, max_queue=1, timeout=0.05)
+    limiter.acquire()
+    with pytest.raises(OverloadedError):
+        limiter.acquire()
+    assert limiter.waiting == 0
+
+
+def test_stage_waiter_gets_released_slot():
+    limiter = StageLimiter("test", limit=1, max_queue=1, timeout=5)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def waiter():
+        with limiter.slot():
+            acquired.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    assert not acquired.wait(0.05)
+    limiter.release()
+    thread.join(timeout=5)
+    assert acquired.is_set()
+    assert limiter.in_use == 0
@@ -0,0 +1,59 @@
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, order_by_health
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("p", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure(0.1)
+    assert breaker.state == CLOSED
+    breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+    assert breaker.skipped == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("p", failure_threshold=2)
+    breaker.record_failure(0.1)
+    breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure(0.1)
+    assert breaker.allow_request() is True
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request() is False
+    assert breaker.skipped == 1
+
+
+def test_probe_success_closes():
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure(0.1)
+    assert breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_probe_failure_reopens():
+    breaker = CircuitBreaker("p", failure_threshold=3, reset_timeout=0)
+    for _ in range(3):
+        breaker.record_failure(0.1)
+    assert breaker.allow_request()
+    breaker.record_failure(0.1, RuntimeError("still down"))
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["last_error"] == "still down"
+
+
+def test_order_by_health_demotes_unhealthy_and_keeps_open():
+    first, second, third = CircuitBreaker("a", failure_threshold=1), CircuitBreaker("b"), CircuitBreaker("c")
+    for _ in range(5):
+        first.record_failure(0.1)
+    assert first.state == OPEN
+    ordered = order_by_health([first, second, third])
+    assert ordered == [second, third, first]
+    # The open breaker is still offered; allow_request skips it and counts the skip
+    assert [b.name for b in ordered if b.allow_request()] == ["b", "c"]
+    assert first.skipped == 1
@@ -0,0 +1,58 @@
+import pytest
+
+from app.core.http_cache import RangeNotSatisfiable, etag_matches, parse_range, pick_encoding
+
+
+def test_pick_encoding_follows_server_preference():
+    assert pick_encoding("gzip, br", ["br", "gzip", "identity"]) == "br"
+    assert pick_encoding("gzip", ["br", "gzip", "identity"]) == "gzip"
+
+
+def test_pick_encoding_honours_q_zero_and_wildcard():
+    assert pick_encoding("br;q=0, gzip", ["br", "gzip"]) == "gzip"
+    assert pick_encoding("*", ["br", "gzip"]) == "br"
+    assert pick_encoding("*, br;q=0", ["br", "gzip"]) == "gzip"
+
+
+def test_pick_encoding_defaults_to_identity():
+    assert pick_encoding(None, ["gzip"]) == "identity"
+    assert pick_encoding("deflate", ["br", "gzip"]) == "identity"
+
+
+def test_etag_matches_uses_weak_comparison():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", "abc"', 'W/"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_parse_range_whole_representation():
+    assert parse_range(None, 100) is None
+    assert parse_range("items=0-5", 100) is None
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("bytes=a-b", 100) is None
+
+
+def test_parse_range_bounded_and_open_ended():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=90-500", 100) == (90, 99)
+
+
+def test_parse_range_suffix():
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),
+    ("bytes=5-2", 100),
+    ("bytes=-0", 100),
+    ("bytes=0-", 0),
+    ("bytes=-5", 0),
+])
+def test_parse_range_unsatisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    # The module builds its singleton under ./data/jobs on import
+    monkeypatch.chdir(tmp_path)
+    from app.services.job_service import JobService
+
+    service = JobService()
+    yield service
+    service.shutdown()
+
+
+def _wait(service, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = service.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_identical_inflight_requests_share_one_job(service):
+    release = threading.Event()
+    calls = []
+
+    def runner(params, progress):
+        calls.append(params)
+        release.wait(5)
+        return {"ok": True}
+
+    service.register("lecture", runner)
+    first = service.submit("lecture", {"n": 1}, dedupe_key="doc-a")
+    second = service.submit("lecture", {"n": 1}, dedupe_key="doc-a")
+    other = service.submit("lecture", {"n": 2}, dedupe_key="doc-b")
+    assert first["coalesced"] is False
+    assert second["coalesced"] is True
+    assert second["job_id"] == first["job_id"]
+    assert other["job_id"] != first["job_id"]
+
+    release.set()
+    assert _wait(service, first["job_id"])["result"] == {"ok": True}
+    _wait(service, other["job_id"])
+    assert len(calls) == 2
+
+
+def test_finished_job_is_reused_within_ttl(service):
+    service.register("lecture", lambda params, progress: {"ok": True})
+    first = service.submit("lecture", {}, dedupe_key="doc-a")
+    _wait(service, first["job_id"])
+
+    again = service.submit("lecture", {}, dedupe_key="doc-a")
+    assert again["coalesced"] is True
+    assert again["job_id"] == first["job_id"]
+
+    service.coalesce_ttl = -1
+    fresh = service.submit("lecture", {}, dedupe_key="doc-a")
+    assert fresh["coalesced"] is False
+    assert fresh["job_id"] != first["job_id"]
+    _wait(service, fresh["job_id"])
+
+
+def test_failed_job_is_not_reused(service):
+    attempts = []
+
+    def runner(params, progress):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("provider down")
+        return {"ok": True}
+
+    service.register("lecture", runner)
+    first = service.submit("lecture", {}, dedupe_key="doc-a")
+    assert _wait(service, first["job_id"])["status"] == "failed"
+
+    retry = service.submit("lecture", {}, dedupe_key="doc-a")
+    assert retry["coalesced"] is False
+    assert _wait(service, retry["job_id"])["status"] == "done"
+
+
+def test_forget_key_stops_reuse(service):
+    service.register("lecture", lambda params, progress: {"ok": True})
+    first = service.submit("lecture", {}, dedupe_key="doc-a")
+    _wait(service, first["job_id"])
+    service.forget_key("doc-a")
+    fresh = service.submit("lecture", {}, dedupe_key="doc-a")
+    assert fresh["coalesced"] is False
+    _wait(service, fresh["job_id"])
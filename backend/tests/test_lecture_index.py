@@ -0,0 +1,70 @@
+import pytest
+
+KEY = "ab" * 32 + "|10|gemini-2.5-flash|v1|en-US-AriaNeural"
+LECTURE = {"slides": [{"audio_url": "/outputs/slide_0.mp3"}]}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # The service modules build their singletons under ./data on import
+    monkeypatch.chdir(tmp_path)
+    from app.services.lecture_store import LectureStore
+
+    return LectureStore(lectures_dir=str(tmp_path / "lectures"))
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch, store):
+    from app.services import lecture_index as module
+
+    monkeypatch.setattr(module, "lecture_store", store)
+    return module.LectureIndex(path=str(tmp_path / "lecture_index.json"))
+
+
+def test_record_then_lookup(index, store):
+    store.save("lec-1", LECTURE)
+    assert index.lookup(KEY) is None
+    index.record(KEY, "lec-1", LECTURE)
+    assert index.lookup(KEY) == "lec-1"
+    assert index.lookup(KEY.replace("|10|", "|20|")) is None
+
+
+def test_hits_are_flushed(index, store):
+    store.save("lec-1", LECTURE)
+    index.record(KEY, "lec-1", LECTURE)
+    index.lookup(KEY)
+    index.lookup(KEY)
+    assert index.stats()["hits"] == 2
+
+
+def test_entries_survive_a_new_instance(index, store):
+    from app.services.lecture_index import LectureIndex
+
+    store.save("lec-1", LECTURE)
+    index.record(KEY, "lec-1", LECTURE)
+    assert LectureIndex(path=index.path).lookup(KEY) == "lec-1"
+
+
+@pytest.mark.parametrize("slide", [
+    {"audio_url": "/outputs/sample.mp3", "tts_error": "provider down"},
+    {"audio_url": "/outputs/slide_0.mp3", "tts_provider": "silent"},
+    {"audio_url": "/outputs/slide_0.silent.wav"},
+])
+def test_placeholder_audio_is_not_recorded(index, store, slide):
+    store.save("lec-1", LECTURE)
+    index.record(KEY, "lec-1", {"slides": [LECTURE["slides"][0], slide]})
+    assert index.lookup(KEY) is None
+
+
+def test_stale_entry_is_dropped(index):
+    index.record(KEY, "lec-gone", LECTURE)
+    assert index.lookup(KEY) is None
+    assert index.stats()["entries"] == 0
+
+
+def test_invalidate_by_document(index):
+    other = "cd" * 32 + KEY[64:]
+    index.record(KEY, "lec-1", LECTURE)
+    index.record(other, "lec-2", LECTURE)
+    assert index.invalidate(document_id="abab") == [KEY]
+    assert index.stats()["entries"] == 1
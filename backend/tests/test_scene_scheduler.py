@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.scene_scheduler import SceneScheduler
+
+
+def _fail(results):
+    raise RuntimeError("boom")
+
+
+def test_dependencies_see_upstream_results():
+    scheduler = SceneScheduler({"cpu": 2})
+    scheduler.add("a", "slides", "cpu", lambda r: 1)
+    scheduler.add("b", "slides", "cpu", lambda r: r["a"] + 1, deps=["a"])
+    results = asyncio.run(scheduler.run())
+    assert results == {"a": 1, "b": 2}
+    assert [t.name for t in scheduler.critical_path()] == ["a", "b"]
+
+
+def test_failure_skips_dependents():
+    scheduler = SceneScheduler({"cpu": 1})
+    scheduler.add("tts", "tts", "cpu", _fail)
+    scheduler.add("segment", "encode", "cpu", lambda r: "ok", deps=["tts"])
+    scheduler.add("final", "encode", "cpu", lambda r: "ok", deps=["segment"])
+    results = asyncio.run(scheduler.run())
+    assert results == {"tts": None}
+    assert scheduler.tasks["tts"].status == "failed"
+    assert scheduler.tasks["segment"].status == "skipped"
+    assert scheduler.tasks["final"].status == "skipped"
+
+
+def test_allow_failure_lets_dependents_run():
+    scheduler = SceneScheduler({"cpu": 1})
+    scheduler.add("avatar", "avatar", "cpu", _fail, allow_failure=True)
+    scheduler.add("segment", "encode", "cpu", lambda r: r["avatar"] or "static", deps=["avatar"])
+    results = asyncio.run(scheduler.run())
+    assert results == {"avatar": None, "segment": "static"}
+    assert scheduler.tasks["avatar"].status == "failed"
+    assert scheduler.tasks["segment"].status == "done"
+
+
+def test_resource_limit_bounds_concurrency():
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def work(results):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        threading.Event().wait(0.02)
+        with lock:
+            state["running"] -= 1
+
+    scheduler = SceneScheduler({"tts": 2})
+    for i in range(6):
+        scheduler.add(f"t{i}", "tts", "tts", work)
+    asyncio.run(scheduler.run())
+    assert state["peak"] == 2
+
+
+def test_rejects_duplicate_and_unknown_tasks():
+    scheduler = SceneScheduler({})
+    scheduler.add("a", "slides", "cpu", lambda r: 1)
+    with pytest.raises(ValueError):
+        scheduler.add("a", "slides", "cpu", lambda r: 1)
+    scheduler.add("b", "slides", "cpu", lambda r: 1, deps=["missing"])
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.run())
@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.slide_layout import TextLayout
+
+
+class FixedFont:
+    """Every character is 10px wide; lines are 20px tall before spacing."""
+
+    def getlength(self, text):
+        return 10 * len(text)
+
+    def getmetrics(self):
+        return 16, 4
+
+
+@pytest.fixture
+def layout():
+    return TextLayout()
+
+
+def test_wrap_fills_lines_greedily(layout):
+    assert layout.wrap("aaa bbb ccc ddd", FixedFont(), 70) == ["aaa bbb", "ccc ddd"]
+
+
+def test_wrap_keeps_paragraph_breaks(layout):
+    assert layout.wrap("one\n\ntwo", FixedFont(), 100) == ["one", "", "two"]
+
+
+def test_long_word_is_hard_broken(layout):
+    lines = layout.wrap("ab abcdefghijkl cd", FixedFont(), 50)
+    assert lines == ["ab", "abcde", "fghij", "kl cd"]
+    assert all(len(line) * 10 <= 50 for line in lines)
+
+
+def test_max_lines_ellipsizes_at_word_boundary(layout):
+    block = layout.layout("hello world again and more words", FixedFont(), 140, max_lines=1)
+    assert block.lines == ["hello world …"]
+    assert block.line_height == 25
+    assert block.height == 25
+
+
+def test_ellipsis_inside_first_word_fits(layout):
+    line = layout._ellipsize("abcdefghijkl mn", FixedFont(), 80)
+    assert line == "abcdef …"
+    assert len(line) * 10 <= 80
+
+
+def test_preserve_whitespace_keeps_indentation(layout):
+    block = layout.layout("def f():\n\treturn 1", FixedFont(), 400, preserve_whitespace=True)
+    assert block.lines == ["def f():", "    return 1"]
+
+
+def test_preserve_whitespace_breaks_overlong_lines(layout):
+    block = layout.layout("x = 1234567890", FixedFont(), 50, preserve_whitespace=True)
+    assert block.lines == ["x = 1", "23456", "7890"]
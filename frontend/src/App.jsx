@@ -35,7 +35,15 @@ function App() {
                     "Content-Type": "multipart/form-data",
                 },
             });
-            setIngestionData(response.data);
+            // The upload returns once the PDF is stored; indexing continues server-side
+            let doc = response.data;
+            while (doc.status === "stored" || doc.status === "indexing") {
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                doc = (await axios.get(`http://127.0.0.1:8000${response.data.status_url}`)).data;
+            }
+            if (doc.status !== "indexed") throw new Error(doc.error || "Indexing failed");
+
+            setIngestionData(doc);
             setUploadStatus("success");
         } catch (error) {
             console.error(error);
@@ -45,43 +53,77 @@ function App() {
 
     const handleGenerate = async () => {
         setIsGenerating(true);
-        setProgress(10); // Start
+        setProgress(5); // Start
 
-        // Simulate progress while waiting
-        const progressInterval = setInterval(() => {
-            setProgress((prev) => {
-                if (prev >= 90) return 90;
-                return prev + 5;
-            });
-        }, 1000);
+        const fail = (error) => {
+            console.error("Generation failed:", error);
+            setIsGenerating(false);
+            setProgress(0);
+            // 429/503 from admission control: the server is busy, not broken
+            const retryAfter = error?.response?.headers?.["retry-after"] ?? error?.response?.data?.retry_after_seconds;
+            if (retryAfter) {
+                alert(`The server is busy generating other lectures. Please try again in about ${retryAfter} seconds.`);
+                return;
+            }
+            alert("Failed to generate lecture. Please try again.");
+        };
 
         try {
-            // New Endpoint
+            // Generation runs as a background job; the request returns right away
             const response = await axios.post("http://127.0.0.1:8000/api/generate-lecture", {
                 document_id: "latest", // Backend handles retrieval
                 target_minutes: 10
-            }, {
-                timeout: 300000 // 5 minutes timeout
             });
 
-            clearInterval(progressInterval);
-            setProgress(100);
-
-            console.log("Lecture Generated:", response.data);
-            const lectureId = response.data.lecture_id;
+            const { job_id: jobId, lecture_id: lectureId, cached } = response.data;
+            console.log("Lecture job queued:", response.data);
 
-            // Navigate to Show with ID
-            setTimeout(() => {
+            // Already generated for this document and settings: nothing to wait for
+            if (cached) {
+                setProgress(100);
                 setIsGenerating(false);
                 navigate(`/show/${lectureId}`);
-            }, 500); // Brief pause to show 100%
+                return;
+            }
+
+            // Per-stage progress and per-slide readiness over Server-Sent Events
+            const stageProgress = { retrieve: 10, script: 20, pptx: 40, audio: 45, save: 95 };
+            const events = new EventSource(`http://127.0.0.1:8000/api/jobs/${jobId}/events`);
+
+            events.addEventListener("stage", (e) => {
+                const data = JSON.parse(e.data);
+                if (stageProgress[data.stage]) setProgress(stageProgress[data.stage]);
+            });
+
+            events.addEventListener("slide_ready", (e) => {
+                const data = JSON.parse(e.data);
+                setProgress(45 + Math.round(((data.index + 1) / data.slides_total) * 50));
+            });
+
+            events.addEventListener("status", (e) => {
+                const data = JSON.parse(e.data);
+                if (data.status === "done") {
+                    events.close();
+                    setProgress(100);
+                    // Navigate to Show with ID
+                    setTimeout(() => {
+                        setIsGenerating(false);
+                        navigate(`/show/${lectureId}`);
+                    }, 500); // Brief pause to show 100%
+                } else if (data.status === "failed") {
+                    events.close();
+                    fail(data.error);
+                }
+            });
+
+            events.onerror = () => {
+                // EventSource reconnects on its own (resuming from Last-Event-ID);
+                // give up only if the stream was closed for good
+                if (events.readyState === EventSource.CLOSED) fail("Progress stream closed");
+            };
 
         } catch (error) {
-            console.error("Generation failed:", error);
-            clearInterval(progressInterval);
-            setIsGenerating(false);
-            setProgress(0);
-            alert("Failed to generate lecture. Please try again.");
+            fail(error);
         }
     };
 
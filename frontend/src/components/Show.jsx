@@ -278,6 +278,7 @@ function Show() {
                                     scale={1.8}
                                     audio={audioRef.current}
                                     playTick={playTick}
+                                    visemeTimeline={currentSlide.viseme_timeline}
                                 />
                                 <Environment preset="city" />
                             </Suspense>
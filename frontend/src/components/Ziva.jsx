@@ -5,7 +5,29 @@ import { useGLTF, useAnimations } from '@react-three/drei'
 import { SkeletonUtils } from 'three-stdlib'
 import { Lipsync } from 'wawa-lipsync'
 
-export function Ziva({ audio, playTick, ...props }) {
+// Mouth-openness level (from the backend viseme timeline) -> morph target weights
+const VISEME_TABLE = [
+  {},
+  { viseme_PP: 0.6 },
+  { viseme_E: 0.5, viseme_PP: 0.2 },
+  { viseme_I: 0.7 },
+  { viseme_O: 0.8 },
+  { viseme_aa: 1.0 },
+]
+
+// Decodes the delta-encoded timeline shipped with each slide into absolute levels
+function decodeTimeline(timeline) {
+  if (!timeline || timeline.encoding !== 'delta' || !Array.isArray(timeline.data)) return null
+  const levels = new Uint8Array(timeline.data.length)
+  let acc = 0
+  for (let i = 0; i < timeline.data.length; i++) {
+    acc += timeline.data[i]
+    levels[i] = acc
+  }
+  return { fps: timeline.fps, levels }
+}
+
+export function Ziva({ audio, playTick, visemeTimeline, ...props }) {
   const group = useRef(null)
 
   // Avatar model
@@ -59,6 +81,9 @@ export function Ziva({ audio, playTick, ...props }) {
   // Lipsync setup using shared Audio element from Show
   const lipsyncRef = useRef(null)
 
+  // Precomputed timeline (if the backend shipped one) replaces live audio analysis
+  const timeline = useMemo(() => decodeTimeline(visemeTimeline), [visemeTimeline])
+
 
   useEffect(() => {
     if (!audio) return
@@ -117,7 +142,11 @@ export function Ziva({ audio, playTick, ...props }) {
 
     const audioPlaying = !audio.paused && !audio.ended
 
-    if (audioPlaying) {
+    let visemeWeights = null
+    if (audioPlaying && timeline) {
+      const frame = Math.min(timeline.levels.length - 1, Math.floor(audio.currentTime * timeline.fps))
+      visemeWeights = VISEME_TABLE[timeline.levels[frame]] || VISEME_TABLE[0]
+    } else if (audioPlaying) {
       lipsync.processAudio()
     }
 
@@ -137,7 +166,9 @@ export function Ziva({ audio, playTick, ...props }) {
 
       // Viseme-based mouth shapes while audio is playing
       if (audioPlaying && key.startsWith('viseme_')) {
-        if (key === currentViseme) {
+        if (visemeWeights) {
+          targetValue = visemeWeights[key] || 0
+        } else if (key === currentViseme) {
           targetValue = 1.0
         }
       }